@@ -0,0 +1,112 @@
+"""
+Benchmark the extent library engines: files/sec of the native numpy path against the
+gdal_calc + gdal_translate path, on the same depth TIFs.
+
+Each engine runs serially in this process, so the numbers are the per-file cost of an engine,
+not pool throughput. With --verify the extent values of both engines are compared.
+
+Sample Usage:
+    pixi run python benchmarks/extent_library.py --library C:\\collections\\mip_02020008\\library --limit 200
+    pixi run python benchmarks/extent_library.py --synthetic 100 --size 1024 --verify
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from osgeo import gdal
+from synthetic_collection import write_synthetic_depth_tifs
+
+from ripple1d_pipeline.process.extent_library import (
+    EXTENT_ENGINES,
+    create_extent_tif,
+    create_extent_tif_native,
+    get_all_tif_paths,
+)
+
+gdal.UseExceptions()
+
+
+def run_engine(engine: str, tif_paths: list[Path], out_dir: Path) -> float:
+    """Create extents for all TIFs with one engine and return the elapsed seconds."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    t_start = time.perf_counter()
+    for i, tif_path in enumerate(tif_paths):
+        # One folder per TIF, the extent keeps the depth TIF stem
+        dest_dir = out_dir / str(i)
+        dest_dir.mkdir()
+        if engine == "native":
+            create_extent_tif_native(tif_path, dest_dir)
+        else:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                create_extent_tif(tif_path, Path(tmp_dir), dest_dir)
+    return time.perf_counter() - t_start
+
+
+def verify_outputs(out_dirs: dict[str, Path], tif_paths: list[Path]) -> int:
+    """Count TIFs whose extent values differ between engines."""
+    engines = list(out_dirs)
+    mismatches = 0
+    for i, tif_path in enumerate(tif_paths):
+        arrays = []
+        for engine in engines:
+            ds = gdal.Open(str(out_dirs[engine] / str(i) / f"{tif_path.stem}.tif"))
+            arrays.append(ds.GetRasterBand(1).ReadAsArray())
+        if any(not np.array_equal(arrays[0], a) for a in arrays[1:]):
+            mismatches += 1
+            print(f"Mismatch: {tif_path}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extent library engines (files/sec)")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--library", help="Existing depth library (or reach folder) to read TIFs from")
+    source.add_argument("--synthetic", type=int, help="Number of synthetic depth TIFs to generate")
+    parser.add_argument("--size", type=int, default=1024, help="Width and height of synthetic TIFs")
+    parser.add_argument("--limit", type=int, default=None, help="Use at most this many TIFs from --library")
+    parser.add_argument("--engines", nargs="+", default=list(EXTENT_ENGINES), choices=EXTENT_ENGINES)
+    parser.add_argument("--verify", action="store_true", help="Compare extent values between engines")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="extent_bench_") as work_dir:
+        work_dir = Path(work_dir)
+        if args.synthetic:
+            input_dir = work_dir / "depth"
+            input_dir.mkdir()
+            tif_paths = write_synthetic_depth_tifs(input_dir, args.synthetic, args.size)
+        else:
+            tif_paths = get_all_tif_paths(Path(args.library))[: args.limit]
+        print(f"Benchmarking {len(tif_paths)} TIFs")
+
+        results = {}
+        out_dirs = {}
+        for engine in args.engines:
+            out_dirs[engine] = work_dir / f"extent_{engine}"
+            elapsed = run_engine(engine, tif_paths, out_dirs[engine])
+            results[engine] = {
+                "files": len(tif_paths),
+                "seconds": round(elapsed, 3),
+                "files_per_sec": round(len(tif_paths) / elapsed, 2) if elapsed else None,
+            }
+            print(f"{engine:>10}: {elapsed:8.2f}s  {results[engine]['files_per_sec']:8.2f} files/sec")
+
+        if "native" in results and "gdal_cli" in results:
+            speedup = results["gdal_cli"]["seconds"] / results["native"]["seconds"]
+            print(f"native speedup: x{speedup:.1f}")
+
+        if args.verify and len(out_dirs) > 1:
+            mismatches = verify_outputs(out_dirs, tif_paths)
+            print(f"Verify: {mismatches} of {len(tif_paths)} TIFs differ between engines")
+            results["mismatches"] = mismatches
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Time the imports paid by CLI startup and by raster worker processes, each in a fresh interpreter.
+
+Targets are the subpackages (lazy, PEP 562), the same with all their names loaded (what a star import or
+the former eager __init__ cost), the modules raster workers import for their task, and run_collection.py
+re-imported the way a spawned worker re-imports the main module. Each target runs --repeat times and the
+median is reported. Imports that fail (a dependency missing from the environment) are reported as such.
+
+Sample Usage:
+    pixi run python benchmarks/import_time.py
+    pixi run python benchmarks/import_time.py --repeat 10 --output import_time.json
+    pixi run python benchmarks/import_time.py --top 15 --targets worker:extent_library
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+RUN_COLLECTION = REPO_DIR / "entrypoints" / "run_collection.py"
+
+# Target name -> code timed in a fresh interpreter
+TARGETS = {
+    "ripple1d_pipeline": "import ripple1d_pipeline",
+    "process": "import ripple1d_pipeline.process",
+    "setup": "import ripple1d_pipeline.setup",
+    "qc": "import ripple1d_pipeline.qc",
+    "process:all": "from ripple1d_pipeline.process import *",
+    "setup:all": "from ripple1d_pipeline.setup import *",
+    "qc:all": "from ripple1d_pipeline.qc import *",
+    "worker:raster_pool": "import ripple1d_pipeline.process.raster_pool",
+    "worker:bridge_processor": "import ripple1d_pipeline.process.bridge_processor",
+    "worker:extent_library": "import ripple1d_pipeline.process.extent_library",
+    "worker:fused_raster_stage": "import ripple1d_pipeline.process.fused_raster_stage",
+    "worker:extent_footprints": "import ripple1d_pipeline.process.extent_footprints",
+    # A spawned worker runs the main module as __mp_main__, the __main__ block excluded
+    "run_collection:spawn": f"import runpy; runpy.run_path({str(RUN_COLLECTION)!r}, run_name='__mp_main__')",
+    "run_collection:help": (
+        f"import runpy, sys; sys.argv = [{str(RUN_COLLECTION)!r}, '--help']\n"
+        "try:\n"
+        f"    runpy.run_path({str(RUN_COLLECTION)!r}, run_name='__main__')\n"
+        "except SystemExit:\n"
+        "    pass"
+    ),
+}
+
+TIMER = """
+import contextlib, io, time
+t_start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+{code}
+print(time.perf_counter() - t_start)
+"""
+
+
+def time_target(code: str) -> tuple[float | None, str | None]:
+    """
+    Seconds taken by code in a fresh interpreter.
+
+    Returns:
+        (seconds, None), or (None, last line of the error) if the code failed
+    """
+    timer = TIMER.format(code="\n".join(f"    {line}" for line in code.splitlines()))
+    process = subprocess.run([sys.executable, "-c", timer], capture_output=True, text=True, cwd=REPO_DIR)
+    if process.returncode != 0:
+        lines = process.stderr.strip().splitlines()
+        return None, lines[-1] if lines else f"exit code {process.returncode}"
+    return float(process.stdout.strip().splitlines()[-1]), None
+
+
+def slowest_imports(code: str, top: int) -> list[tuple[float, str]]:
+    """
+    Modules with the highest cumulative import time for code, from python -X importtime.
+
+    Returns:
+        Up to top (cumulative seconds, module) pairs, slowest first
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, cwd=REPO_DIR
+    )
+    modules = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:") :].split("|")
+        modules.append((int(cumulative) / 1e6, module.rstrip()))
+    return sorted(modules, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time CLI startup and raster worker imports")
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS), help="Targets to time")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per target, median reported")
+    parser.add_argument("--top", type=int, default=0, help="Also list the N slowest imports of each target")
+    parser.add_argument("--output", default=None, help="Write the results to this JSON path")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'target':<28}{'median s':>10}{'min s':>10}")
+    for target in args.targets:
+        times, error = [], None
+        for _ in range(args.repeat):
+            seconds, error = time_target(TARGETS[target])
+            if error:
+                break
+            times.append(seconds)
+        if error:
+            results[target] = {"error": error}
+            print(f"{target:<28}{'-':>10}{'-':>10}  ERROR {error}")
+            continue
+        results[target] = {"median_s": round(statistics.median(times), 4), "min_s": round(min(times), 4)}
+        print(f"{target:<28}{results[target]['median_s']:>10}{results[target]['min_s']:>10}")
+        if args.top:
+            results[target]["slowest_imports"] = slowest_imports(TARGETS[target], args.top)
+            for cumulative, module in results[target]["slowest_imports"]:
+                print(f"    {cumulative:>8.3f}  {module}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
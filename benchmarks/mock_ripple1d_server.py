@@ -0,0 +1,432 @@
+"""
+Local stand-in for the Ripple1d API, to benchmark JobClient and the step processors without HEC-RAS.
+
+Implements the endpoints the pipeline uses, with the response fields it reads:
+    POST   /processes/<name>/execution   201 {"jobID"}, 503 while the queue is full
+    GET    /jobs/<id>                    {"status", "updated"}, with ?tb=true {"result": {"err", "tb"}}
+    GET    /jobs/<id>/metadata           {<id>: {"accept_time", "start_time", ..., "func_kwargs"}}
+    DELETE /jobs/<id>                    dismisses the job, freeing its worker
+    GET    /ping
+
+Jobs queue for a fixed number of workers, like the Ripple1d huey consumer. Each job runs for a duration
+drawn from the distribution of its process and fails with the failure rate of its process. Every request
+is delayed by the configured latency. Only the standard library is used, so it runs anywhere.
+
+Sample Usage:
+    python benchmarks/mock_ripple1d_server.py --port 8001 --workers 8 --duration lognormal:2:0.5
+    python benchmarks/mock_ripple1d_server.py --port 8001 --queue-capacity 200 --failure-rate 0.05 --latency-ms 20
+    python benchmarks/mock_ripple1d_server.py --profile benchmarks/profile.json
+
+A profile is JSON with server settings and per-process overrides, e.g.
+    {"workers": 8, "duration": "lognormal:2:0.5", "failure_rate": 0.01,
+     "processes": {"run_known_wse": {"duration": "uniform:10:30", "failure_rate": 0.1}}}
+"""
+
+import argparse
+import heapq
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+# Distributions of job durations, "<kind>:<param>:<param>" in seconds
+DURATION_KINDS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+def _utc_str(epoch: float | None) -> str | None:
+    # Format of Ripple1d "updated", parsed by JobClient.datetime_to_epoch_utc
+    return None if epoch is None else datetime.fromtimestamp(epoch, UTC).strftime("%Y-%m-%d %H:%M:%S")
+
+
+@dataclass(frozen=True)
+class Duration:
+    """
+    Job duration distribution in seconds.
+
+    fixed:<s>, uniform:<low>:<high>, exponential:<mean>, lognormal:<median>:<sigma>
+    """
+
+    kind: str = "fixed"
+    params: tuple[float, ...] = (1.0,)
+
+    @classmethod
+    def parse(cls, spec: str) -> "Duration":
+        kind, *params = spec.split(":")
+        if kind not in DURATION_KINDS:
+            raise ValueError(f"Unknown duration distribution {kind!r}, expected one of {DURATION_KINDS}")
+        expected = {"fixed": 1, "uniform": 2, "exponential": 1, "lognormal": 2}[kind]
+        if len(params) != expected:
+            raise ValueError(f"Duration {spec!r}: {kind} takes {expected} parameters")
+        return cls(kind, tuple(float(p) for p in params))
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(*self.params)
+        if self.kind == "exponential":
+            return rng.expovariate(1 / self.params[0])
+        median, sigma = self.params
+        return rng.lognormvariate(0, sigma) * median
+
+
+@dataclass
+class ProcessProfile:
+    """Behavior of the jobs of one process."""
+
+    duration: Duration = field(default_factory=Duration)
+    failure_rate: float = 0.0
+
+
+@dataclass
+class MockJob:
+    id: str
+    process: str
+    func_kwargs: dict
+    duration: float
+    fails: bool
+    status: str = "accepted"
+    accept_time: float = field(default_factory=time.time)
+    start_time: float | None = None
+    finish_time: float | None = None
+    dismiss_time: float | None = None
+
+    @property
+    def updated(self) -> float:
+        return self.dismiss_time or self.finish_time or self.start_time or self.accept_time
+
+    def metadata(self) -> dict:
+        return {
+            "func_name": self.process,
+            "func_kwargs": self.func_kwargs,
+            "accept_time": _utc_str(self.accept_time),
+            "start_time": _utc_str(self.start_time),
+            "dismiss_time": _utc_str(self.dismiss_time),
+            "finish_duration_minutes": (
+                round((self.finish_time - self.start_time) / 60, 4) if self.finish_time and self.start_time else None
+            ),
+            "ogc_status": self.status,
+            "status_time": _utc_str(self.updated),
+        }
+
+
+class MockRipple1d:
+    """
+    Job queue and workers of the mock server. Jobs are started and finished by a scheduler thread.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        queue_capacity: int = 0,
+        default: ProcessProfile | None = None,
+        processes: dict[str, ProcessProfile] | None = None,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            workers: Jobs running at once
+            queue_capacity: Jobs accepted and running at once before submissions get 503, 0 for no cap
+            default: Behavior of processes without their own profile
+            processes: Process name -> behavior
+            seed: Seed of the durations and failures drawn
+        """
+        self.workers = workers
+        self.queue_capacity = queue_capacity
+        self.default = default or ProcessProfile()
+        self.processes = processes or {}
+        self.rng = random.Random(seed)
+        self.jobs: dict[str, MockJob] = {}
+        self.queued: list[str] = []
+        self.running: list[tuple[float, str]] = []  # heap of (finish epoch, job id)
+        self.counters = {"submitted": 0, "rejected": 0, "succeeded": 0, "failed": 0, "dismissed": 0, "requests": 0}
+        self.max_in_system = 0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._schedule, name="mock-ripple1d-scheduler", daemon=True)
+        self._thread.start()
+
+    def profile(self, process: str) -> ProcessProfile:
+        return self.processes.get(process, self.default)
+
+    def _in_system(self) -> int:
+        return len(self.queued) + len(self.running)
+
+    def submit(self, process: str, func_kwargs: dict) -> MockJob | None:
+        """Accept a job, None when the queue is full."""
+        with self._cond:
+            if self.queue_capacity and self._in_system() >= self.queue_capacity:
+                self.counters["rejected"] += 1
+                return None
+            profile = self.profile(process)
+            job = MockJob(
+                id=str(uuid.uuid4()),
+                process=process,
+                func_kwargs=func_kwargs,
+                duration=max(0.0, profile.duration.sample(self.rng)),
+                fails=self.rng.random() < profile.failure_rate,
+            )
+            self.jobs[job.id] = job
+            self.queued.append(job.id)
+            self.counters["submitted"] += 1
+            self.max_in_system = max(self.max_in_system, self._in_system())
+            self._cond.notify()
+            return job
+
+    def get(self, job_id: str) -> MockJob | None:
+        with self._cond:
+            return self.jobs.get(job_id)
+
+    def dismiss(self, job_id: str) -> MockJob | None:
+        """Dismiss a job, removing it from the queue or freeing its worker."""
+        with self._cond:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status in ("accepted", "running"):
+                if job.id in self.queued:
+                    self.queued.remove(job.id)
+                self.running = [(t, j) for t, j in self.running if j != job.id]
+                heapq.heapify(self.running)
+                self.counters["dismissed"] += 1
+                self._cond.notify()
+            job.status = "dismissed"
+            job.dismiss_time = time.time()
+            return job
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                **self.counters,
+                "queued": len(self.queued),
+                "running": len(self.running),
+                "max_in_system": self.max_in_system,
+            }
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _schedule(self) -> None:
+        with self._cond:
+            while not self._stopped:
+                now = time.time()
+                while self.running and self.running[0][0] <= now:
+                    _, job_id = heapq.heappop(self.running)
+                    job = self.jobs[job_id]
+                    job.finish_time = now
+                    job.status = "failed" if job.fails else "successful"
+                    self.counters["failed" if job.fails else "succeeded"] += 1
+                while self.queued and len(self.running) < self.workers:
+                    job = self.jobs[self.queued.pop(0)]
+                    job.status = "running"
+                    job.start_time = now
+                    heapq.heappush(self.running, (now + job.duration, job.id))
+                self._cond.wait(timeout=self.running[0][0] - now if self.running else None)
+
+
+class MockRipple1dHandler(BaseHTTPRequestHandler):
+    """HTTP front of MockRipple1d, set as server.mock."""
+
+    server_version = "MockRipple1d/1.0"
+
+    def log_message(self, format, *args):
+        # Quiet by default, benchmarks send many requests
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _delay(self) -> None:
+        latency, jitter = self.server.latency_s, self.server.latency_jitter_s
+        if latency or jitter:
+            time.sleep(max(0.0, random.gauss(latency, jitter)))
+
+    def _send(self, code: int, body) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self) -> tuple[list[str], dict]:
+        url = urlparse(self.path)
+        with self.server.mock._cond:
+            self.server.mock.counters["requests"] += 1
+        self._delay()
+        return [part for part in url.path.split("/") if part], parse_qs(url.query)
+
+    def do_POST(self):
+        parts, _ = self._route()
+        if len(parts) != 3 or parts[0] != "processes" or parts[2] != "execution":
+            return self._send(404, {"detail": "Not found"})
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            func_kwargs = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return self._send(400, {"detail": "Invalid JSON payload"})
+        job = self.server.mock.submit(parts[1], func_kwargs)
+        if job is None:
+            return self._send(503, {"detail": "Job queue is full"})
+        self._send(201, {"jobID": job.id, "processID": parts[1], "status": job.status, "type": "process"})
+
+    def do_GET(self):
+        parts, query = self._route()
+        if parts == ["ping"]:
+            return self._send(200, {"status": "healthy"})
+        if len(parts) not in (2, 3) or parts[0] != "jobs" or (len(parts) == 3 and parts[2] != "metadata"):
+            return self._send(404, {"detail": "Not found"})
+        job = self.server.mock.get(parts[1])
+        if job is None:
+            return self._send(404, {"detail": f"Job {parts[1]} not found"})
+        if len(parts) == 3:
+            return self._send(200, {job.id: job.metadata()})
+        body = {
+            "jobID": job.id,
+            "processID": job.process,
+            "status": job.status,
+            "updated": _utc_str(job.updated),
+            "type": "process",
+        }
+        if query.get("tb", ["false"])[0].lower() == "true":
+            body["result"] = (
+                {"err": f"Simulated failure of {job.process}", "tb": "Traceback (most recent call last): simulated"}
+                if job.status == "failed"
+                else None
+            )
+        self._send(200, body)
+
+    def do_DELETE(self):
+        parts, _ = self._route()
+        if len(parts) != 2 or parts[0] != "jobs":
+            return self._send(404, {"detail": "Not found"})
+        job = self.server.mock.dismiss(parts[1])
+        if job is None:
+            return self._send(404, {"detail": f"Job {parts[1]} not found"})
+        self._send(200, {"jobID": job.id, "status": job.status})
+
+
+class MockRipple1dServer(ThreadingHTTPServer):
+    """
+    Mock Ripple1d API server, started in a background thread.
+
+    Usage:
+        with MockRipple1dServer(port=0, mock=MockRipple1d(workers=8)) as server:
+            ...  # RIPPLE1D_API_URL = server.url
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        mock: MockRipple1d | None = None,
+        latency_s: float = 0.0,
+        latency_jitter_s: float = 0.0,
+        verbose: bool = False,
+    ):
+        super().__init__((host, port), MockRipple1dHandler)
+        self.mock = mock or MockRipple1d()
+        self.latency_s = latency_s
+        self.latency_jitter_s = latency_jitter_s
+        self.verbose = verbose
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockRipple1dServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-ripple1d-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        self.mock.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def mock_from_settings(settings: dict) -> tuple[MockRipple1d, dict]:
+    """
+    Build the job queue from profile settings (keys of the CLI options, underscored).
+
+    Returns:
+        MockRipple1d, and the HTTP settings (latency_s, latency_jitter_s)
+    """
+    default = ProcessProfile(Duration.parse(settings.get("duration", "fixed:1")), settings.get("failure_rate", 0.0))
+    processes = {
+        name: ProcessProfile(
+            Duration.parse(overrides["duration"]) if "duration" in overrides else default.duration,
+            overrides.get("failure_rate", default.failure_rate),
+        )
+        for name, overrides in settings.get("processes", {}).items()
+    }
+    mock = MockRipple1d(
+        workers=settings.get("workers", 4),
+        queue_capacity=settings.get("queue_capacity", 0),
+        default=default,
+        processes=processes,
+        seed=settings.get("seed", 0),
+    )
+    http = {
+        "latency_s": settings.get("latency_ms", 0) / 1000,
+        "latency_jitter_s": settings.get("latency_jitter_ms", 0) / 1000,
+    }
+    return mock, http
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Ripple1d API server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--profile", default=None, help="JSON profile, the options below override it")
+    parser.add_argument("--workers", type=int, default=None, help="Jobs running at once (default 4)")
+    parser.add_argument(
+        "--queue-capacity", type=int, default=None, help="Jobs in the system before submissions get 503, 0 for no cap"
+    )
+    parser.add_argument(
+        "--duration", default=None, help=f"Job duration in seconds, <kind>:<params>, kinds {DURATION_KINDS}"
+    )
+    parser.add_argument("--failure-rate", type=float, default=None, help="Fraction of jobs that fail")
+    parser.add_argument("--latency-ms", type=float, default=None, help="Mean delay of every request")
+    parser.add_argument("--latency-jitter-ms", type=float, default=None, help="Standard deviation of the delay")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = vars(parser.parse_args())
+
+    profile = args.pop("profile")
+    settings = json.loads(Path(profile).read_text()) if profile else {}
+    host, port, verbose = args.pop("host"), args.pop("port"), args.pop("verbose")
+    settings.update({key: value for key, value in args.items() if value is not None})
+    mock, http = mock_from_settings(settings)
+
+    server = MockRipple1dServer(host, port, mock, verbose=verbose, **http)
+    print(f"Mock Ripple1d API on {server.url} ({mock.workers} workers), Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        mock.stop()
+        print(json.dumps(mock.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,452 @@
+"""
+Time every stage of run_collection.process on a synthetic collection, against the mock Ripple1d API,
+and flag regressions against a stored baseline.
+
+For each stage the results record the seconds, throughput (models, reaches, rating curve rows or files
+per second), the peak RSS reached so far, the SQLite write statements and commits issued by this process,
+and the Ripple1d API requests sent. Raster worker processes are not traced, their database writes go
+through this process anyway. Peak RSS covers this process, and on POSIX also its reaped children.
+
+Sample Usage:
+    pixi run bench
+    pixi run bench --reaches 2000 --library-reaches 100 --output results.json
+    pixi run bench --baseline benchmarks/baseline.json --threshold 0.15
+    pixi run bench --stages library_scan create_extent_lib --save-baseline benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from mock_ripple1d_server import MockRipple1dServer, mock_from_settings
+from synthetic_collection import SyntheticCollection, generate_collection
+
+from ripple1d_pipeline.process import (
+    ConflateModelStepProcessor,
+    GenericReachStepProcessor,
+    JobClient,
+    KWSEStepProcessor,
+    Model,
+    RasterWorkerPool,
+    Reach,
+    create_extent_lib,
+    create_f2f_start_file,
+    create_footprint_index,
+    create_library_mosaics,
+    execute_ikwse_for_network,
+    load_all_rating_curves,
+    load_conflation,
+    process_bridges,
+    process_library_rasters,
+    scan_library,
+    update_network,
+)
+from ripple1d_pipeline.setup.database import Database
+
+logger = logging.getLogger("run_benchmarks")
+
+# Ripple1d steps submitted to the mock API, in run_collection.process order
+REACH_API_STEPS = (
+    "extract_submodel",
+    "create_ras_terrain",
+    "create_model_run_normal_depth",
+    "run_incremental_normal_depth",
+    "nd_create_rating_curves_db",
+)
+STAGES = (
+    "conflate_model",
+    "load_conflation",
+    "update_network",
+    *REACH_API_STEPS,
+    "ikwse",
+    "run_known_wse",
+    "kwse_create_rating_curves_db",
+    "load_all_rating_curves",
+    "create_fim_lib",
+    "library_scan",
+    "process_bridges",
+    "create_extent_lib",
+    "process_library_rasters",
+    "footprint_index",
+    "library_mosaics",
+    "f2f_start_file",
+)
+# Metrics compared against the baseline, and whether higher is better
+COMPARED_METRICS = {"per_sec": True, "peak_rss_mb": False, "sqlite_writes": False}
+
+
+class SQLiteWriteCounter:
+    """
+    Counts write statements and commits on every SQLite connection opened while installed.
+    """
+
+    WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+    def __init__(self):
+        self.writes = 0
+        self.commits = 0
+        self._lock = threading.Lock()
+        self._connect = None
+
+    def _trace(self, statement: str) -> None:
+        keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        with self._lock:
+            if keyword in self.WRITE_PREFIXES:
+                self.writes += 1
+            elif keyword in ("COMMIT", "END"):
+                self.commits += 1
+
+    def install(self) -> None:
+        """Wrap sqlite3.connect, so connections opened by the pipeline report their statements."""
+        self._connect = connect = sqlite3.connect
+
+        def traced_connect(*args, **kwargs):
+            conn = connect(*args, **kwargs)
+            conn.set_trace_callback(self._trace)
+            return conn
+
+        sqlite3.connect = traced_connect
+
+    def uninstall(self) -> None:
+        sqlite3.connect = self._connect
+
+    def snapshot(self) -> tuple[int, int]:
+        with self._lock:
+            return self.writes, self.commits
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident set size of this process (and reaped children on POSIX) in MB."""
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return None
+        return round(counters.PeakWorkingSetSize / 1024**2, 1)
+
+    import resource
+
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    )
+    return round(peak * unit / 1024**2, 1)
+
+
+class StageRunner:
+    """Runs stages in order, recording their metrics."""
+
+    def __init__(self, selected: set[str], sqlite_counter: SQLiteWriteCounter, server: MockRipple1dServer):
+        self.selected = selected
+        self.sqlite_counter = sqlite_counter
+        self.server = server
+        self.results = {}
+
+    def run(self, name: str, unit: str, func) -> None:
+        """
+        Run a stage if selected. func runs the stage and returns the number of items (in unit) it handled.
+        """
+        if name not in self.selected:
+            return
+        writes, commits = self.sqlite_counter.snapshot()
+        requests = self.server.mock.stats()["requests"]
+        logger.info(f"Stage {name} >>>>>>")
+        t_start = time.perf_counter()
+        error = None
+        items = None
+        try:
+            items = func()
+        except Exception as e:
+            logger.exception(f"Stage {name} failed")
+            error = str(e)
+        seconds = time.perf_counter() - t_start
+        writes_after, commits_after = self.sqlite_counter.snapshot()
+        self.results[name] = {
+            "seconds": round(seconds, 3),
+            "items": items,
+            "unit": unit,
+            "per_sec": round(items / seconds, 2) if items and seconds else None,
+            "peak_rss_mb": peak_rss_mb(),
+            "sqlite_writes": writes_after - writes,
+            "sqlite_commits": commits_after - commits,
+            "api_requests": self.server.mock.stats()["requests"] - requests,
+            "error": error,
+        }
+        per_sec = self.results[name]["per_sec"]
+        logger.info(f"<<<<<< {name}: {seconds:.2f}s, {items} {unit}" + (f", {per_sec} {unit}/s" if per_sec else ""))
+
+
+def run_stages(collection: SyntheticCollection, runner: StageRunner, timeout: int) -> None:
+    """Run the process stages on the synthetic collection, as run_collection.process does."""
+    database = Database(collection)
+    jobclient = JobClient(collection)
+    state = {}
+
+    models = [Model(*model) for model in collection.get_models()]
+    conflate = ConflateModelStepProcessor(collection, models)
+
+    def conflate_model():
+        conflate.execute_step(jobclient, database, timeout=timeout)
+        return len(models)
+
+    runner.run("conflate_model", "models", conflate_model)
+    valid_models = conflate.valid_entities if "conflate_model" in runner.selected else models
+
+    def run_load_conflation():
+        load_conflation(valid_models, database)
+        return len(valid_models)
+
+    runner.run("load_conflation", "models", run_load_conflation)
+
+    def run_update_network():
+        update_network(database)
+        return len(database.get_valid_reaches())
+
+    runner.run("update_network", "reaches", run_update_network)
+
+    reaches = [
+        Reach(row[0], row[1], Model(row[2], row[3]))
+        for row in database.get_reaches_by_models([model.id for model in valid_models])
+    ]
+    outlet_reaches = [reach for reach in reaches if reach.to_id is None]
+    state["valid"] = reaches
+
+    def api_step(process_name: str, processor_class=GenericReachStepProcessor):
+        def run_step():
+            if processor_class is KWSEStepProcessor:
+                processor = KWSEStepProcessor(collection, state["nd_valid"])
+            else:
+                processor = processor_class(collection, state["valid"], process_name)
+            processor.execute_step(jobclient, database, timeout=timeout)
+            processor.dismiss_timedout_jobs(jobclient)
+            state["valid"] = processor.valid_entities
+            return len(processor.reaches)
+
+        return run_step
+
+    for process_name in REACH_API_STEPS:
+        runner.run(process_name, "reaches", api_step(process_name))
+    state["nd_valid"] = state["valid"]
+
+    def ikwse():
+        execute_ikwse_for_network(outlet_reaches, collection, database, jobclient, state["nd_valid"], timeout=timeout)
+        return len(state["nd_valid"])
+
+    runner.run("ikwse", "reaches", ikwse)
+    runner.run("run_known_wse", "reaches", api_step("run_known_wse", KWSEStepProcessor))
+    runner.run("kwse_create_rating_curves_db", "reaches", api_step("kwse_create_rating_curves_db"))
+
+    def run_load_all_rating_curves():
+        load_all_rating_curves(database)
+        return sum(
+            database.execute_select_query(f"SELECT COUNT(*) FROM {table}")[0][0]
+            for table in ("rating_curves", "rating_curves_no_map")
+        )
+
+    runner.run("load_all_rating_curves", "rows", run_load_all_rating_curves)
+
+    state["valid"] = state["nd_valid"]
+    runner.run("create_fim_lib", "reaches", api_step("create_fim_lib"))
+
+    # One raster worker pool and library scan for the raster stages, as in process(). Footprints and mosaics
+    # are timed even when the config leaves them off
+    with RasterWorkerPool.from_config(collection.config) as raster_pool:
+
+        def run_library_scan():
+            state["library_scan"] = scan_library(collection.library_dir)
+            return len(state["library_scan"])
+
+        runner.run("library_scan", "files", run_library_scan)
+        if "library_scan" not in state:
+            state["library_scan"] = scan_library(collection.library_dir)
+        library_files = len(state["library_scan"])
+
+        def raster_stage(func, *args):
+            def run_raster_stage():
+                func(collection, *args, pool=raster_pool, library_scan=state["library_scan"])
+                return library_files
+
+            return run_raster_stage
+
+        def run_footprints():
+            mode = collection.config["extent_library"].get("FOOTPRINT_INDEX") or "max_flow"
+            return create_footprint_index(collection, mode, pool=raster_pool)
+
+        if collection.config["extent_library"].get("FUSED_BRIDGE_MASKING", False):
+            runner.run("process_library_rasters", "files", raster_stage(process_library_rasters))
+        else:
+            runner.run("process_bridges", "files", raster_stage(process_bridges))
+            runner.run("create_extent_lib", "files", raster_stage(create_extent_lib))
+        runner.run("footprint_index", "files", run_footprints)
+
+    def run_mosaics():
+        create_library_mosaics(collection, library_scan=state["library_scan"])
+        return library_files
+
+    runner.run("library_mosaics", "files", run_mosaics)
+
+    def run_f2f_start_file():
+        create_f2f_start_file([reach.id for reach in outlet_reaches], collection.f2f_start_file)
+        return len(outlet_reaches)
+
+    runner.run("f2f_start_file", "reaches", run_f2f_start_file)
+
+
+def compare_to_baseline(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Compare stage metrics against a baseline.
+
+    Returns:
+        Descriptions of the metrics worse than the baseline by more than threshold (a fraction)
+    """
+    regressions = []
+    for stage, metrics in results["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base:
+            continue
+        if metrics.get("error") and not base.get("error"):
+            regressions.append(f"{stage}: failed ({metrics['error']})")
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            value, base_value = metrics.get(metric), base.get(metric)
+            if not value or not base_value:
+                continue
+            change = (value - base_value) / base_value
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(f"{stage}: {metric} {base_value} -> {value} ({change:+.0%})")
+    return regressions
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the process stages on synthetic data and a mock API")
+    parser.add_argument("--reaches", type=int, default=500)
+    parser.add_argument("--depth", type=int, default=10, help="Network depth, outlet to farthest headwater")
+    parser.add_argument("--library-reaches", type=int, default=50, help="Reaches with a depth library")
+    parser.add_argument("--flows", type=int, default=10)
+    parser.add_argument("--kwse-stages", type=int, default=3)
+    parser.add_argument("--grid-size", type=int, default=64)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="Stages to time")
+    parser.add_argument("--mock-profile", default=None, help="Mock API JSON profile (see mock_ripple1d_server.py)")
+    parser.add_argument("--poll-wait", type=float, default=0.2, help="polling.DEFAULT_POLL_WAIT during the run")
+    parser.add_argument("--timeout", type=int, default=10, help="Job timeout in minutes of the API stages")
+    parser.add_argument("--work-dir", default=None, help="Where to generate the collection (default temp dir)")
+    parser.add_argument("--output", default=None, help="Results JSON (default benchmarks/results/<time>.json)")
+    parser.add_argument("--baseline", default=None, help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Regression threshold, fraction of baseline")
+    parser.add_argument("--save-baseline", default=None, help="Also write the results to this baseline path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    mock_settings = json.loads(Path(args.mock_profile).read_text()) if args.mock_profile else {}
+    mock_settings.setdefault("workers", 16)
+    mock_settings.setdefault("duration", "uniform:0.05:0.2")
+    mock, http = mock_from_settings(mock_settings)
+
+    sqlite_counter = SQLiteWriteCounter()
+    with tempfile.TemporaryDirectory(prefix="ripple1d_bench_", dir=args.work_dir) as work_dir:
+        with MockRipple1dServer(mock=mock, **http) as server:
+            collection = SyntheticCollection(work_dir, "bench", ripple1d_api_url=server.url)
+            collection.config["polling"]["DEFAULT_POLL_WAIT"] = args.poll_wait
+            collection.config["polling"]["API_LAUNCH_JOBS_RETRY_WAIT"] = min(
+                args.poll_wait, collection.config["polling"]["API_LAUNCH_JOBS_RETRY_WAIT"]
+            )
+            logger.info(f"Generating synthetic collection in {collection.root_dir}")
+            generation = generate_collection(
+                collection,
+                args.reaches,
+                args.depth,
+                flows=args.flows,
+                kwse_stages=args.kwse_stages,
+                library_reaches=args.library_reaches,
+                grid_size=args.grid_size,
+            )
+            logger.info(f"Generated {generation}")
+
+            runner = StageRunner(set(args.stages), sqlite_counter, server)
+            sqlite_counter.install()
+            try:
+                run_stages(collection, runner, args.timeout)
+            finally:
+                sqlite_counter.uninstall()
+            mock_stats = mock.stats()
+
+    results = {
+        "meta": {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("baseline", "save_baseline")},
+            "collection": generation,
+            "mock_api": {**mock_settings, **mock_stats},
+        },
+        "stages": runner.results,
+    }
+
+    output = Path(args.output or Path(__file__).parent / "results" / f"{datetime.now():%Y%m%d_%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(results, indent=2))
+
+    print(f"\n{'stage':<32}{'seconds':>10}{'items':>10}{'per sec':>12}{'rss MB':>10}{'writes':>10}{'requests':>10}")
+    for stage, m in runner.results.items():
+        print(
+            f"{stage:<32}{m['seconds']:>10}{m['items'] or '-':>10}{m['per_sec'] or '-':>12}"
+            f"{m['peak_rss_mb'] or '-':>10}{m['sqlite_writes']:>10}{m['api_requests']:>10}"
+            + (f"  ERROR {m['error']}" if m["error"] else "")
+        )
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, json.loads(Path(args.baseline).read_text()), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressions beyond {args.threshold:.0%} of {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
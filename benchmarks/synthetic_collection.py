@@ -0,0 +1,469 @@
+"""
+Fabricate a collection directory, laid out like CollectionData.assign_paths, to benchmark pipeline
+stages at scale without S3, the Ripple1d API or HEC-RAS.
+
+The collection is in the state the process stage finds it in after setup and the Ripple1d steps:
+    ripple.gpkg           reaches layer (a branching NWM-like network), models, network and processing tables
+    source_models/        per model a River geopackage and a .conflation.json, a few reaches of each eclipsed
+    submodels/<reach>/    <reach>.db rating curves (nd and kwse plans), and for library reaches the
+                          XS_concave_hull geopackage and the Terrain DEM used by bridge masking
+    library/<reach>/      depth grids z_<stage>/f_<flow>.tif, for the first library_reaches reaches
+    bridges/              bridge elevation tiles over some library reaches, indexed by bridge_index.gpkg
+
+load_conflation, update_network, load_all_rating_curves, process_bridges and create_extent_lib run on
+it as they would on a real collection. Use SyntheticCollection in place of CollectionData: it needs no
+.env, and its BRIDGE_TILE_INDEX_PATH points at the synthetic bridge index.
+
+Sample Usage:
+    pixi run python benchmarks/synthetic_collection.py --root C:\\bench --reaches 1000 --depth 12
+    pixi run python benchmarks/synthetic_collection.py --root C:\\bench --reaches 100000 --depth 40 \\
+        --library-reaches 500
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+import yaml
+from osgeo import gdal, ogr, osr
+
+from ripple1d_pipeline.config import DEFAULTS_PATH
+from ripple1d_pipeline.setup.collection_data import CollectionData
+from ripple1d_pipeline.setup.database import Database
+
+gdal.UseExceptions()
+ogr.UseExceptions()
+
+EPSG = 5070
+# Depth grid resolution in meters, as RESOLUTION in ripple_settings
+RESOLUTION = 3.0
+NODATA = -9999
+# First synthetic NWM reach id
+FIRST_REACH_ID = 1_000_001
+
+
+class SyntheticCollection(CollectionData):
+    """
+    CollectionData of a synthetic collection under root_dir, configured from default_config.yaml alone.
+    """
+
+    def __init__(
+        self, root_dir: str | Path, collection_id: str = "synthetic", ripple1d_api_url: str = "http://127.0.0.1"
+    ):
+        """
+        Args:
+            root_dir: Collections root, the collection is root_dir/collection_id
+            collection_id: Collection id
+            ripple1d_api_url: Ripple1d API, e.g. a mock server, for stages that submit jobs
+        """
+        self.stac_collection_id = collection_id
+        root_dir = Path(root_dir)
+        self.config = yaml.safe_load(DEFAULTS_PATH.read_text())
+        self.config["RIPPLE1D_VERSION"] = "synthetic"
+        self.config["endpoints"] = {"RIPPLE1D_API_URL": ripple1d_api_url, "STAC_URL": ""}
+        self.config.setdefault("paths", {}).update(
+            {
+                "COLLECTIONS_ROOT_DIR": str(root_dir),
+                "BRIDGE_TILE_INDEX_PATH": str(root_dir / collection_id / "bridges" / "bridge_index.gpkg"),
+                "S3_UPLOAD_PREFIX": "",
+                "S3_UPLOAD_FAILED_PREFIX": "",
+                # Only passed through to Ripple1d job payloads
+                "SOURCE_NETWORK": "synthetic_network.parquet",
+                "TERRAIN_SOURCE_URL": "synthetic_dem.vrt",
+            }
+        )
+        self.config.setdefault("execution", {}).update({"OPTIMUM_PARALLEL_PROCESS_COUNT": os.cpu_count() // 2 or 1})
+        self.RIPPLE1D_API_URL = ripple1d_api_url
+        self.STAC_URL = ""
+        self.assign_paths()
+        self.bridges_dir = os.path.join(self.root_dir, "bridges")
+
+
+def build_network(n_reaches: int, max_depth: int, seed: int = 0) -> list[tuple[int, int | None, int]]:
+    """
+    Build a branching network of n_reaches, at most max_depth reaches from outlet to headwater.
+
+    Returns:
+        (reach_id, nwm_to_id, depth) per reach, outlet first, nwm_to_id None for the outlet
+    """
+    max_depth = max(1, min(max_depth, n_reaches))
+    if n_reaches > 1 and max_depth < 2:
+        raise ValueError("A network of more than one reach needs a depth of at least 2")
+    # Smallest branching factor that fits all reaches within max_depth levels
+    branching = 1
+    while sum(branching**level for level in range(max_depth)) < n_reaches:
+        branching += 1
+    rng = random.Random(seed)
+
+    reaches = [(FIRST_REACH_ID, None, 0)]
+    level, depth = [FIRST_REACH_ID], 0
+    # Level by level, each reach gets up to branching tributaries. One reach per level below the next is
+    # held back, and the first reach of a level always gets a tributary, so the network reaches max_depth.
+    while len(reaches) < n_reaches and depth + 1 < max_depth:
+        next_level = []
+        reserve = max_depth - depth - 2
+        for i, parent in enumerate(level):
+            children = min(rng.randint(1, branching), n_reaches - len(reaches) - reserve)
+            for _ in range(max(children, 1 if i == 0 else 0)):
+                reaches.append((FIRST_REACH_ID + len(reaches), parent, depth + 1))
+                next_level.append(reaches[-1][0])
+        level, depth = next_level, depth + 1
+
+    # Reaches left over by the random branching join as tributaries of random reaches above the last level
+    parents = [(reach_id, d) for reach_id, _, d in reaches if d + 1 < max_depth]
+    while len(reaches) < n_reaches:
+        parent, parent_depth = rng.choice(parents)
+        reaches.append((FIRST_REACH_ID + len(reaches), parent, parent_depth + 1))
+        if parent_depth + 2 < max_depth:
+            parents.append((reaches[-1][0], parent_depth + 1))
+    return reaches
+
+
+def reach_geotransform(index: int, size: int) -> tuple[float, ...]:
+    """Grid of the reach at position index, reach tiles side by side in rows of 1000."""
+    tile = size * RESOLUTION
+    return (1_000_000.0 + index % 1000 * tile, RESOLUTION, 0.0, 2_000_000.0 - index // 1000 * tile, 0.0, -RESOLUTION)
+
+
+def _srs_wkt() -> str:
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(EPSG)
+    return srs.ExportToWkt()
+
+
+def depth_array(
+    size: int, phase: float, half_width_frac: float, rng: np.random.Generator, scale: float = 10
+) -> np.ndarray:
+    """Depth grid with a wet band of the given relative half width around a meandering centerline."""
+    cols = np.arange(size)[None, :]
+    center = size / 2 + size / 6 * np.sin(np.arange(size) / size * 6 + phase)[:, None]
+    half_width = size * half_width_frac
+    depth = (half_width - np.abs(cols - center)) / half_width * scale
+    depth += rng.normal(0, 0.2, (size, size))
+    return np.where(depth > -1, depth, NODATA).astype(np.float32)
+
+
+def write_cog(path: Path, array: np.ndarray, geotransform: tuple, nodata: float | None = NODATA) -> None:
+    """Write a single band COG in EPSG:5070."""
+    height, width = array.shape
+    dtype = gdal.GDT_Float32 if array.dtype == np.float32 else gdal.GDT_Byte
+    mem_ds = gdal.GetDriverByName("MEM").Create("", width, height, 1, dtype)
+    mem_ds.SetGeoTransform(geotransform)
+    mem_ds.SetProjection(_srs_wkt())
+    band = mem_ds.GetRasterBand(1)
+    if nodata is not None:
+        band.SetNoDataValue(nodata)
+    band.WriteArray(array)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    gdal.GetDriverByName("COG").CreateCopy(str(path), mem_ds, options=["COMPRESS=LZW"])
+
+
+def write_synthetic_depth_tifs(out_dir: Path, count: int, size: int, seed: int = 0) -> list[Path]:
+    """Write depth COGs with a wet band across a nodata floodplain, similar to Ripple1d depth grids."""
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(count):
+        path = out_dir / f"f_{1000 + i}.tif"
+        write_cog(path, depth_array(size, i, 1 / 8 + i % 7 / 64, rng), reach_geotransform(0, size))
+        paths.append(path)
+    return paths
+
+
+def stage_dir_name(stage: float | None) -> str:
+    """Library stage folder, z_nd for normal depth, e.g. z_12_5 for a downstream stage of 12.5."""
+    return "z_nd" if stage is None else f"z_{stage:.1f}".replace(".", "_")
+
+
+def write_reaches_layer(db_path: str, network: list[tuple[int, int | None, int]], size: int) -> None:
+    """Write the reaches layer of ripple.gpkg, one line across each reach grid."""
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(EPSG)
+    ds = ogr.GetDriverByName("GPKG").CreateDataSource(db_path)
+    layer = ds.CreateLayer("reaches", srs, ogr.wkbLineString, options=["GEOMETRY_NAME=geom"])
+    layer.CreateField(ogr.FieldDefn("reach_id", ogr.OFTInteger64))
+    layer.CreateField(ogr.FieldDefn("nwm_to_id", ogr.OFTInteger64))
+    layer_defn = layer.GetLayerDefn()
+
+    layer.StartTransaction()
+    for index, (reach_id, to_id, _) in enumerate(network):
+        x0, _, _, y0, _, _ = reach_geotransform(index, size)
+        line = ogr.Geometry(ogr.wkbLineString)
+        line.AddPoint_2D(x0 + size * RESOLUTION / 2, y0)
+        line.AddPoint_2D(x0 + size * RESOLUTION / 2, y0 - size * RESOLUTION)
+        feature = ogr.Feature(layer_defn)
+        feature.SetGeometry(line)
+        feature.SetField("reach_id", reach_id)
+        if to_id is not None:
+            feature.SetField("nwm_to_id", to_id)
+        layer.CreateFeature(feature)
+    layer.CommitTransaction()
+    ds = None
+
+
+def write_submodel_db(
+    db_path: Path, reach_id: int, bed: float, ds_bed: float, flows: list[int], stages: list[float]
+) -> int:
+    """
+    Write the rating curves of a reach as Ripple1d leaves them: nd and kwse plans, a few without maps.
+
+    Returns:
+        Number of rating curve rows
+    """
+    rows = []
+    for i, flow in enumerate(flows):
+        depth = 1 + 9 * i / max(1, len(flows) - 1)
+        ds_depth = depth * 0.9
+        # Every 11th nd and 13th kwse curve has no map, for rating_curves_no_map
+        rows.append(
+            (reach_id, flow, depth, bed + depth, ds_depth, ds_bed + ds_depth, "nd", i % 5 == 0, "nd", i % 11 != 0)
+        )
+        for stage in stages:
+            us_depth = max(depth, stage - bed + 0.5)
+            rows.append(
+                (reach_id, flow, us_depth, bed + us_depth, stage - ds_bed, stage, "kwse", False, "kwse", i % 13 != 0)
+            )
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute(
+            """
+            CREATE TABLE rating_curves (
+                reach_id INTEGER,
+                us_flow INTEGER,
+                us_depth REAL,
+                us_wse REAL,
+                ds_depth REAL,
+                ds_wse REAL,
+                boundary_condition TEXT,
+                xs_overtopped BOOL,
+                plan_suffix TEXT,
+                map_exist BOOL
+            );
+            """
+        )
+        conn.executemany("INSERT INTO rating_curves VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.commit()
+    finally:
+        conn.close()
+    return len(rows)
+
+
+def write_model_gpkg(gpkg_path: Path, geotransforms: list[tuple], size: int) -> None:
+    """Write the River layer of a source model, by which CollectionData.get_models finds the model."""
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(EPSG)
+    ds = ogr.GetDriverByName("GPKG").CreateDataSource(str(gpkg_path))
+    layer = ds.CreateLayer("River", srs, ogr.wkbLineString)
+    line = ogr.Geometry(ogr.wkbLineString)
+    for x0, _, _, y0, _, _ in geotransforms:
+        line.AddPoint_2D(x0 + size * RESOLUTION / 2, y0)
+        line.AddPoint_2D(x0 + size * RESOLUTION / 2, y0 - size * RESOLUTION)
+    feature = ogr.Feature(layer.GetLayerDefn())
+    feature.SetGeometry(line)
+    layer.CreateFeature(feature)
+    ds = None
+
+
+def write_xs_gpkg(gpkg_path: Path, geotransform: tuple, size: int) -> None:
+    """Write the XS_concave_hull layer, a polygon over the middle of the reach grid."""
+    x0, _, _, y0, _, _ = geotransform
+    extent = size * RESOLUTION
+    ring = ogr.Geometry(ogr.wkbLinearRing)
+    for fx, fy in ((0.15, 0), (0.85, 0), (0.85, 1), (0.15, 1), (0.15, 0)):
+        ring.AddPoint_2D(x0 + fx * extent, y0 - fy * extent)
+    polygon = ogr.Geometry(ogr.wkbPolygon)
+    polygon.AddGeometry(ring)
+
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(EPSG)
+    ds = ogr.GetDriverByName("GPKG").CreateDataSource(str(gpkg_path))
+    layer = ds.CreateLayer("XS_concave_hull", srs, ogr.wkbPolygon)
+    feature = ogr.Feature(layer.GetLayerDefn())
+    feature.SetGeometry(polygon)
+    layer.CreateFeature(feature)
+    ds = None
+
+
+def write_bridge_index(index_path: Path, tiles: list[tuple[str, tuple[float, float, float, float]]]) -> None:
+    """Write the bridge tile index, tile footprints with their raster location."""
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(EPSG)
+    ds = ogr.GetDriverByName("GPKG").CreateDataSource(str(index_path))
+    layer = ds.CreateLayer("bridge_index", srs, ogr.wkbPolygon)
+    layer.CreateField(ogr.FieldDefn("location", ogr.OFTString))
+    layer.StartTransaction()
+    for location, (xmin, ymin, xmax, ymax) in tiles:
+        ring = ogr.Geometry(ogr.wkbLinearRing)
+        for x, y in ((xmin, ymin), (xmax, ymin), (xmax, ymax), (xmin, ymax), (xmin, ymin)):
+            ring.AddPoint_2D(x, y)
+        polygon = ogr.Geometry(ogr.wkbPolygon)
+        polygon.AddGeometry(ring)
+        feature = ogr.Feature(layer.GetLayerDefn())
+        feature.SetGeometry(polygon)
+        feature.SetField("location", location)
+        layer.CreateFeature(feature)
+    layer.CommitTransaction()
+    ds = None
+
+
+def generate_collection(
+    collection: SyntheticCollection,
+    n_reaches: int,
+    max_depth: int,
+    reaches_per_model: int = 20,
+    flows: int = 10,
+    kwse_stages: int = 3,
+    eclipsed_rate: float = 0.05,
+    library_reaches: int | None = None,
+    grid_size: int = 64,
+    bridge_rate: float = 0.3,
+    seed: int = 0,
+) -> dict:
+    """
+    Write a synthetic collection into collection.root_dir, which must not exist yet.
+
+    Args:
+        collection: Synthetic collection to write
+        n_reaches: Number of reaches
+        max_depth: Reaches from the outlet to the farthest headwater
+        reaches_per_model: Reaches conflated to each source model
+        flows: Flows per rating curve and per library stage
+        kwse_stages: Downstream stages of the kwse rating curves and library, besides normal depth
+        eclipsed_rate: Fraction of reaches eclipsed in the conflation files
+        library_reaches: Reaches, from the outlet up, with a depth library, DEM and XS geopackage. All when None.
+        grid_size: Width and height in pixels of the depth grids
+        bridge_rate: Fraction of library reaches under a bridge tile
+        seed: Random seed
+
+    Returns:
+        Counts of what was written, and the seconds spent
+    """
+    t_start = time.perf_counter()
+    if os.path.exists(collection.root_dir):
+        raise FileExistsError(f"{collection.root_dir} exists, remove it or pick another collection id")
+    collection.create_folders()
+    os.makedirs(collection.bridges_dir)
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+
+    network = build_network(n_reaches, max_depth, seed)
+    write_reaches_layer(collection.db_path, network, grid_size)
+
+    # Models: consecutive reaches of the breadth-first order, as conflation covers neighbouring reaches
+    models_data = {}
+    for start in range(0, len(network), reaches_per_model):
+        model_id = f"model_{start // reaches_per_model:05d}"
+        model_name = f"synthetic_{start // reaches_per_model:05d}"
+        models_data[model_id] = {"model_name": model_name}
+        reaches = {}
+        for reach_id, _, _ in network[start : start + reaches_per_model]:
+            # The outlet stays valid, so update_network has a network to walk
+            eclipsed = reach_id != FIRST_REACH_ID and rng.random() < eclipsed_rate
+            reaches[str(reach_id)] = {
+                "eclipsed": eclipsed,
+                "metrics": {"lengths": {"ras": round(rng.uniform(500, 5000), 1)}},
+            }
+        model_dir = Path(collection.source_models_dir) / model_id
+        model_dir.mkdir(parents=True)
+        (model_dir / f"{model_name}.conflation.json").write_text(json.dumps({"reaches": reaches}))
+        geotransforms = [reach_geotransform(i, grid_size) for i in range(start, start + len(reaches))]
+        write_model_gpkg(model_dir / f"{model_name}.gpkg", geotransforms, grid_size)
+
+    Database.init_db(collection)
+    Database.insert_models(models_data, collection)
+
+    flow_values = [100 * (i + 1) for i in range(flows)]
+    beds = {reach_id: 100.0 + depth * 2 for reach_id, _, depth in network}
+    library_count = len(network) if library_reaches is None else min(library_reaches, len(network))
+    rating_curve_rows = 0
+    depth_grids = 0
+    bridge_tiles = []
+    for index, (reach_id, to_id, _) in enumerate(network):
+        bed = beds[reach_id]
+        ds_bed = beds[to_id] if to_id is not None else bed - 2
+        stages = [round(ds_bed + 2 + 2 * s, 1) for s in range(kwse_stages)]
+        reach_dir = Path(collection.submodels_dir) / str(reach_id)
+        reach_dir.mkdir()
+        rating_curve_rows += write_submodel_db(reach_dir / f"{reach_id}.db", reach_id, bed, ds_bed, flow_values, stages)
+
+        if index >= library_count:
+            continue
+        geotransform = reach_geotransform(index, grid_size)
+        library_dir = Path(collection.library_dir) / str(reach_id)
+        for stage in [None] + stages:
+            for i, flow in enumerate(flow_values):
+                half_width = 1 / 10 + i / max(1, flows - 1) / 6
+                depth = depth_array(grid_size, index + (stage or 0), half_width, np_rng)
+                write_cog(library_dir / stage_dir_name(stage) / f"f_{flow}.tif", depth, geotransform)
+                depth_grids += 1
+
+        # DEM in feet, as the terrain Ripple1d clips for the submodel
+        dem = (bed + np_rng.normal(0, 0.5, (grid_size, grid_size))).astype(np.float32)
+        write_cog(reach_dir / "Terrain" / f"{reach_id}.seamless_3dep_dem_3m_5070.tif", dem, geotransform)
+        write_xs_gpkg(reach_dir / f"{reach_id}.gpkg", geotransform, grid_size)
+
+        if rng.random() < bridge_rate:
+            # Deck across the channel, in meters, a few feet above the bed so deep grids reach it
+            deck = np.full((grid_size, grid_size), NODATA, dtype=np.float32)
+            row = rng.randrange(grid_size // 4, 3 * grid_size // 4)
+            conv_factor = collection.config["bridge_processing"]["BRIDGE_ELEV_CONV_FACTOR"]
+            deck[row : row + max(2, grid_size // 16), :] = (bed + 6) / conv_factor
+            tile_path = Path(collection.bridges_dir) / f"bridge_{reach_id}.tif"
+            write_cog(tile_path, deck, geotransform)
+            x0, _, _, y0, _, _ = geotransform
+            extent = grid_size * RESOLUTION
+            bridge_tiles.append((str(tile_path), (x0, y0 - extent, x0 + extent, y0)))
+
+    write_bridge_index(Path(collection.bridge_tile_index_path), bridge_tiles)
+
+    return {
+        "reaches": len(network),
+        "network_depth": max(depth for _, _, depth in network) + 1,
+        "models": len(models_data),
+        "rating_curve_rows": rating_curve_rows,
+        "library_reaches": library_count,
+        "depth_grids": depth_grids,
+        "bridge_tiles": len(bridge_tiles),
+        "seconds": round(time.perf_counter() - t_start, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic collection for benchmarks")
+    parser.add_argument("--root", required=True, help="Collections root to write the collection in")
+    parser.add_argument("--collection", default="synthetic", help="Collection id, the folder under --root")
+    parser.add_argument("--reaches", type=int, default=1000)
+    parser.add_argument("--depth", type=int, default=12, help="Reaches from the outlet to the farthest headwater")
+    parser.add_argument("--reaches-per-model", type=int, default=20)
+    parser.add_argument("--flows", type=int, default=10, help="Flows per rating curve and library stage")
+    parser.add_argument("--kwse-stages", type=int, default=3, help="Downstream stages besides normal depth")
+    parser.add_argument("--eclipsed-rate", type=float, default=0.05)
+    parser.add_argument("--library-reaches", type=int, default=None, help="Reaches with a depth library (default all)")
+    parser.add_argument("--grid-size", type=int, default=64, help="Depth grid width and height in pixels")
+    parser.add_argument("--bridge-rate", type=float, default=0.3, help="Fraction of library reaches under a bridge")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    collection = SyntheticCollection(args.root, args.collection)
+    summary = generate_collection(
+        collection,
+        args.reaches,
+        args.depth,
+        reaches_per_model=args.reaches_per_model,
+        flows=args.flows,
+        kwse_stages=args.kwse_stages,
+        eclipsed_rate=args.eclipsed_rate,
+        library_reaches=args.library_reaches,
+        grid_size=args.grid_size,
+        bridge_rate=args.bridge_rate,
+        seed=args.seed,
+    )
+    print(json.dumps({"root_dir": collection.root_dir, **summary}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -86,6 +86,25 @@ class MonitoringDatabase:
                 );
                 """
             )
+            # Create uploads table to store S3 upload status of each collection
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS uploads (
+                    ip_address TEXT,
+                    collection_id TEXT,
+                    destination TEXT,
+                    upload_status TEXT,
+                    files_total INTEGER,
+                    files_uploaded INTEGER,
+                    bytes_uploaded INTEGER,
+                    upload_start_time TIMESTAMP,
+                    upload_finish_time TIMESTAMP,
+                    error_message TEXT,
+                    PRIMARY KEY (ip_address, collection_id),
+                    FOREIGN KEY (ip_address) REFERENCES instances(ip_address)
+                );
+                """
+            )
 
             connection.commit()
             logger.info(f"Database initialized successfully at {self.db_path}")
@@ -184,3 +203,57 @@ class MonitoringDatabase:
             logger.info(f"Collections Table record inserted in {self.db_path}")
         finally:
             conn.close()
+
+    def update_uploads_table(
+        self,
+        collection_id,
+        destination,
+        upload_status,
+        files_total,
+        files_uploaded,
+        bytes_uploaded,
+        upload_start_time,
+        upload_finish_time,
+        error_message,
+    ) -> None:
+        """
+        Enter record to uploads table in monitoring database.
+        """
+
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout)
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT OR REPLACE INTO uploads (
+                    ip_address,
+                    collection_id,
+                    destination,
+                    upload_status,
+                    files_total,
+                    files_uploaded,
+                    bytes_uploaded,
+                    upload_start_time,
+                    upload_finish_time,
+                    error_message
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    self.ip_address,
+                    collection_id,
+                    destination,
+                    upload_status,
+                    files_total,
+                    files_uploaded,
+                    bytes_uploaded,
+                    upload_start_time,
+                    upload_finish_time,
+                    error_message,
+                ),
+            )
+            conn.commit()
+            logger.info(f"Uploads Table record inserted in {self.db_path}")
+        finally:
+            conn.close()
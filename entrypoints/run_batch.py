@@ -6,69 +6,253 @@ import os
 import pathlib
 import socket
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from datetime import datetime
 
 from monitoring_database import MonitoringDatabase
+from s3_upload_manager import S3UploadManager
+from setup_prefetcher import SetupPrefetcher
+from work_queue import WorkQueue
 
 from ripple1d_pipeline import configure_logging
 from ripple1d_pipeline.config import load_config
+from ripple1d_pipeline.process.shared_budget import SharedBudget
 
 logger = logging.getLogger("run_batch")
 
 
-def s3_move(
+@contextmanager
+def exception_handler(table):
+    try:
+        yield
+    except Exception as e:
+        logger.exception(f"Monitoring database- {table} TABLE write failed. Error Message: \n\t {e}")
+
+
+class BatchState:
+    """
+    Counters of a batch, shared by the collections running concurrently, and written to the instances table.
+    """
+
+    def __init__(self, monitoring_database: MonitoringDatabase, total_collections_submitted: int):
+        self.monitoring_database = monitoring_database
+        self.total_collections_submitted = total_collections_submitted
+        self.total_collections_processed = 0
+        self.total_collections_succeeded = 0
+        self.last_collection_status = None
+        self.running = []
+        self.lock = threading.Lock()
+
+    def update_instances_table(self) -> None:
+        """Write the counters, with the running collections (comma separated) as current collection. Lock held."""
+        with exception_handler("INSTANCES"):
+            self.monitoring_database.update_instances_table(
+                f"{datetime.now()}",
+                ",".join(self.running) or None,
+                self.last_collection_status,
+                self.total_collections_processed,
+                self.total_collections_succeeded,
+                self.total_collections_submitted,
+            )
+
+    def collection_started(self, collection: str) -> None:
+        with self.lock:
+            self.running.append(collection)
+            self.update_instances_table()
+
+    def collection_finished(self, collection: str, processed: bool, collection_status: str) -> None:
+        with self.lock:
+            self.running.remove(collection)
+            self.total_collections_processed += processed
+            self.total_collections_succeeded += collection_status == "successful"
+            self.last_collection_status = collection_status
+            self.update_instances_table()
+
+
+def collection_cmd(collection: str, stage: str = "all") -> list[str]:
+    """Construct the command to execute run_collection.py (sibling script, located via __file__)"""
+    return [
+        "python",
+        str(pathlib.Path(__file__).parent / "run_collection.py"),
+        "--collection",
+        collection,
+        "--stage",
+        stage,
+    ]
+
+
+def process_collection(
     collection: str,
     config: dict,
-    failed: bool = False,
-):
+    batch_state: BatchState,
+    budget_db: str | None = None,
+    prefetcher: SetupPrefetcher | None = None,
+    upload_manager: S3UploadManager | None = None,
+) -> str:
+    """
+    Execute run_collection.py on a collection in a subprocess, record it in the monitoring database and queue it for S3.
 
+    Inputs:
+        collection: Collection id
+        config: Pipeline configuration
+        batch_state: Shared counters of the batch
+        budget_db: Shared budget database of a concurrent batch, passed to run_collection as RP_SHARED_BUDGET_DB
+        prefetcher: Runs the collection's setup ahead of time. Only the process stage is run here when given.
+        upload_manager: Moves the collection to S3 once its log file is closed. Kept locally when None.
+
+    Returns:
+        Collection status, "successful" or "failed"
+    """
     COLLECTIONS_ROOT_DIR = config["paths"]["COLLECTIONS_ROOT_DIR"]
-    S3_UPLOAD_PREFIX = config["paths"].get("S3_UPLOAD_PREFIX", "")
-    S3_UPLOAD_FAILED_PREFIX = config["paths"].get("S3_UPLOAD_FAILED_PREFIX", "")
-    RIPPLE1D_VERSION = config["RIPPLE1D_VERSION"]
+    monitoring_database = batch_state.monitoring_database
+
+    logger.info(f"Starting processing for collection: {collection} ...")
+    cmd = collection_cmd(collection, "all" if prefetcher is None else "process")
+    env = None
+    if budget_db:
+        env = {**os.environ, "RP_SHARED_BUDGET_DB": budget_db}
+        # Leases left by an earlier run of this collection that did not exit cleanly
+        SharedBudget.release_holder(budget_db, collection)
+
+    # Set up log files
+    log_dir = os.path.join(COLLECTIONS_ROOT_DIR, collection)
+    os.makedirs(log_dir, exist_ok=True)
+    log_file = os.path.join(log_dir, f"{collection}.log")
+
+    with open(log_file, "a") as f:
+        f.write("************************************************************************")
+        f.write(f"\n--- Starting processing for collection: {collection} ---\n")
+        f.flush()
+
+        # Reset collection status before next collection starts processing
+        collection_status = None
+        error_message = None
+        collection_finish_time = None
+        processed = False
+        prefetched = False
+
+        try:
+            # Get timestamp for collection start time
+            collection_start_time = datetime.now()
 
-    if failed:
-        dateime_obj = datetime.now()
-        timestamp = dateime_obj.strftime("%m-%d-%Y_%H_%M")
-        s3_mv_command = [
-            "aws",
-            "s3",
-            "mv",
-            f"{COLLECTIONS_ROOT_DIR}/{collection}",
-            f"{S3_UPLOAD_FAILED_PREFIX}/{collection}_{RIPPLE1D_VERSION}_{timestamp}",
-            "--recursive",
-        ]
-    else:
-        s3_mv_command = [
-            "aws",
-            "s3",
-            "mv",
-            f"{COLLECTIONS_ROOT_DIR}/{collection}",
-            f"{S3_UPLOAD_PREFIX}/{collection}",
-            "--recursive",
-        ]
+            # Update instances table in monitoring database before processing
+            batch_state.collection_started(collection)
+            # Update collections table in monitoring database
+            with exception_handler("COLLECTIONS"):
+                monitoring_database.update_collections_table(
+                    collection,
+                    collection_start_time,
+                    None,
+                    "running",
+                    None,
+                )
 
-    subprocess.Popen(s3_mv_command, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
-    logger.info(f"Submitted S3 mv command on collection: {collection} ...")
+            if prefetcher is not None:
+                setup_error = prefetcher.wait(collection)
+                prefetched = True
+                if setup_error:
+                    raise RuntimeError(f"Setup failed: {setup_error}")
+
+            # Use subprocess to execute ripple_pipeline.py and send stdout & stderr to log file
+            process = subprocess.run(cmd, shell=True, stdout=f, stderr=f, env=env)
+
+            # Get timestamp after processing is finished
+            collection_finish_time = datetime.now()
+
+            # Collection counts as processed
+            processed = True
+
+            if process.returncode != 0:
+                raise subprocess.CalledProcessError(process.returncode, cmd)
+
+            # Logic for successfully processed collections
+            logger.info(f"Collection {collection} processed successfully.")
+            collection_status = "successful"
+
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Error processing collection {collection}: {e} ")
+            logger.info(f"See {log_file} for more details.")
+            collection_status = "failed"
+            error_message = str(e)
+
+        except Exception as e:
+            logger.exception(f"Unexpected error occurred while executing run_pipeline on collection: {collection}")
+            logger.info(f"See {log_file} for more details.")
+            collection_status = "failed"
+            error_message = str(e)
+
+        finally:
+            if prefetched:
+                prefetcher.done(collection)
+
+            if budget_db:
+                # Give back the job slots and raster task leases the collection process still held
+                released = SharedBudget.release_holder(budget_db, collection)
+                if released:
+                    logger.info(f"Released {released} budget leases left by collection {collection}")
+
+            # Update collections table in monitoring database
+            with exception_handler("COLLECTIONS"):
+                monitoring_database.update_collections_table(
+                    collection,
+                    collection_start_time,
+                    collection_finish_time,
+                    collection_status,
+                    error_message,
+                )
 
+            # Update instances table in monitoring database
+            batch_state.collection_finished(collection, processed, collection_status)
 
-@contextmanager
-def exception_handler(table):
-    try:
-        yield
-    except Exception as e:
-        logger.exception(f"Monitoring database- {table} TABLE write failed. Error Message: \n\t {e}")
+    # Move collection to S3 bucket
+    if upload_manager is not None:
+        upload_manager.submit(collection, collection_status == "failed")
+
+    return collection_status
+
+
+def drain_queue(
+    work_queue: WorkQueue,
+    worker: str,
+    heartbeat_s: float,
+    config: dict,
+    batch_state: BatchState,
+    budget_db: str | None = None,
+    upload_manager: S3UploadManager | None = None,
+) -> None:
+    """Claim and process collections from the work queue until none is pending."""
+    while (collection := work_queue.claim(worker)) is not None:
+        logger.info(f"Claimed collection {collection} from the work queue")
+        with batch_state.lock:
+            batch_state.total_collections_submitted += 1
+        collection_status = None
+        try:
+            with work_queue.keep_alive(collection, worker, heartbeat_s):
+                collection_status = process_collection(
+                    collection, config, batch_state, budget_db, upload_manager=upload_manager
+                )
+        finally:
+            work_queue.complete(collection, worker, collection_status or "failed")
 
 
-def batch_pipeline(collection_list):
+def batch_pipeline(collection_list=None, concurrency=1, prefetch=False, queue=False):
     """
     Iterate over each collection in a list of collections, and execute all Ripple1D setup, processing, and qc steps for each collection.
 
     Inputs:
         collection_list: A filepath to line separated list of collections.
             OR a string in quotes with space delimeted collections.
+        concurrency: Number of collections processed at once. With more than one, the collections share
+            the in-flight Ripple1d job and raster task caps of execution.BUDGETS in config.
+        prefetch: Set up upcoming collections while the current ones are processing, up to
+            execution.PREFETCH_DEPTH ahead and while execution.MIN_FREE_DISK_GB is free.
+        queue: Claim collections from the work queue in the monitoring database, shared by all hosts, until
+            none is pending. The collections of collection_list, if given, are added to the queue first.
     """
+    if queue and prefetch:
+        raise ValueError("prefetch needs the collections up front, it can't be combined with queue")
 
     config = load_config()
 
@@ -77,7 +261,7 @@ def batch_pipeline(collection_list):
     MONITORING_DB_PATH = config["paths"]["MONITORING_DB_PATH"]
 
     # Get list of collections
-    collections = read_input(collection_list)
+    collections = read_input(collection_list) if collection_list else []
 
     # Identify hostname, used to get IP Address
     hostname = f"{socket.gethostname()}"
@@ -88,135 +272,73 @@ def batch_pipeline(collection_list):
     monitoring_database = MonitoringDatabase(ip_address, username, MONITORING_DB_PATH, RIPPLE1D_VERSION)
     monitoring_database.create_tables()
 
-    # Set default values for monitoring database
-    total_collections_submitted = len(collections)
-    total_collections_processed = 0
-    total_collections_succeeded = 0
-    last_collection_status = None
-
-    # Update instances table in monitoring database
-    with exception_handler("INSTANCES"):
-        monitoring_database.update_instances_table(
-            f"{datetime.now()}",
-            None,
-            last_collection_status,
-            total_collections_processed,
-            total_collections_succeeded,
-            total_collections_submitted,
+    # Set default values for monitoring database, and update instances table
+    batch_state = BatchState(monitoring_database, 0 if queue else len(collections))
+    with batch_state.lock:
+        batch_state.update_instances_table()
+
+    budget_db = None
+    if concurrency > 1:
+        os.makedirs(COLLECTIONS_ROOT_DIR, exist_ok=True)
+        budget_db = os.path.join(COLLECTIONS_ROOT_DIR, "shared_budget.sqlite")
+        SharedBudget.init_db(budget_db, config["database"]["DB_CONN_TIMEOUT"])
+        logger.info(f"Running {concurrency} collections at once, budgets: {config['execution'].get('BUDGETS')}")
+
+    prefetcher = None
+    if prefetch:
+        prefetcher = SetupPrefetcher(
+            collections,
+            collection_cmd,
+            COLLECTIONS_ROOT_DIR,
+            config["execution"].get("PREFETCH_DEPTH", 1),
+            config["execution"].get("MIN_FREE_DISK_GB", 0),
         )
-
-    for collection in collections:
-        logger.info(f"Starting processing for collection: {collection} ...")
-        # Construct the command to execute run_collection.py (sibling script, located via __file__)
-        cmd = [
-            "python",
-            str(pathlib.Path(__file__).parent / "run_collection.py"),
-            "--collection",
-            collection,
-        ]
-
-        # Set up log files
-        log_dir = os.path.join(COLLECTIONS_ROOT_DIR, collection)
-        os.makedirs(log_dir, exist_ok=True)
-        log_file = os.path.join(log_dir, f"{collection}.log")
-
-        with open(log_file, "a") as f:
-            f.write("************************************************************************")
-            f.write(f"\n--- Starting processing for collection: {collection} ---\n")
-            f.flush()
-
-            # Get timestamp for collection start time
-            collection_start_time = datetime.now()
-
-            # Reset collection status before next collection starts processing
-            collection_status = None
-            error_message = None
-            collection_finish_time = None
-
-            try:
-                # Get timestamp for collection start time
-                collection_start_time = datetime.now()
-
-                # Update instances table in monitoring database before processing
-                with exception_handler("INSTANCES"):
-                    monitoring_database.update_instances_table(
-                        f"{datetime.now()}",
-                        collection,
-                        last_collection_status,
-                        total_collections_processed,
-                        total_collections_succeeded,
-                        total_collections_submitted,
-                    )
-                # Update collections table in monitoring database
-                with exception_handler("COLLECTIONS"):
-                    monitoring_database.update_collections_table(
-                        collection,
-                        collection_start_time,
-                        None,
-                        "running",
-                        None,
-                    )
-
-                # Use subprocess to execute ripple_pipeline.py and send stdout & stderr to log file
-                process = subprocess.run(cmd, shell=True, stdout=f, stderr=f)
-
-                # Get timestamp after processing is finished
-                collection_finish_time = datetime.now()
-
-                # Increment counter for total collections processed
-                total_collections_processed += 1
-
-                if process.returncode != 0:
-                    raise subprocess.CalledProcessError(process.returncode, cmd)
-
-                # Logic for successfully processed collections
-                logger.info(f"Collection {collection} processed successfully.")
-                collection_status = "successful"
-                total_collections_succeeded += 1
-
-            except subprocess.CalledProcessError as e:
-                logger.error(f"Error processing collection {collection}: {e} ")
-                logger.info(f"See {log_file} for more details.")
-                collection_status = "failed"
-                error_message = str(e)
-
-            except Exception as e:
-                logger.exception(f"Unexpected error occurred while executing run_pipeline on collection: {collection}")
-                logger.info(f"See {log_file} for more details.")
-                collection_status = "failed"
-                error_message = str(e)
-
-            finally:
-                # Update collections table in monitoring database
-                with exception_handler("COLLECTIONS"):
-                    monitoring_database.update_collections_table(
-                        collection,
-                        collection_start_time,
-                        collection_finish_time,
-                        collection_status,
-                        error_message,
-                    )
-
-                # Update instances table in monitoring database
-                with exception_handler("INSTANCES"):
-                    monitoring_database.update_instances_table(
-                        f"{datetime.now()}",
-                        None,  # reset current_collection_id
-                        collection_status,
-                        total_collections_processed,
-                        total_collections_succeeded,
-                        total_collections_submitted,
-                    )
-
-                # Move collection to S3 bucket
-                s3_move(
-                    collection,
+        prefetcher.start()
+
+    upload_manager = S3UploadManager(config, monitoring_database)
+
+    # Each thread waits on its collection's subprocess, the work itself runs in the subprocesses
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        if queue:
+            queue_config = config.get("work_queue", {})
+            work_queue = WorkQueue(
+                MONITORING_DB_PATH,
+                config["database"]["DB_CONN_TIMEOUT"],
+                queue_config.get("STALE_AFTER_S", 900),
+                queue_config.get("MAX_ATTEMPTS", 2),
+            )
+            if collections:
+                added = work_queue.enqueue(collections)
+                logger.info(f"Added {added} of {len(collections)} collections to the work queue")
+            worker = f"{hostname}:{os.getpid()}"
+            futures = [
+                executor.submit(
+                    drain_queue,
+                    work_queue,
+                    worker,
+                    queue_config.get("HEARTBEAT_S", 60),
                     config,
-                    collection_status == "failed",
+                    batch_state,
+                    budget_db,
+                    upload_manager,
+                )
+                for _ in range(max(1, concurrency))
+            ]
+        else:
+            futures = [
+                executor.submit(
+                    process_collection, collection, config, batch_state, budget_db, prefetcher, upload_manager
                 )
+                for collection in collections
+            ]
+        for future in futures:
+            future.result()
 
-                # Set last collection status
-                last_collection_status = collection_status
+    logger.info("Waiting for S3 uploads to finish ...")
+    upload_results = upload_manager.wait()
+    failed_uploads = [collection for collection, ok in upload_results.items() if not ok]
+    if failed_uploads:
+        logger.error(f"S3 upload incomplete for collections: {', '.join(failed_uploads)}, see uploads table")
 
 
 def read_input(collection_list):
@@ -256,6 +378,10 @@ if __name__ == "__main__":
     Sample Usage:
         python batch_ripple_pipeline.py -l "collection1 collection2 collection3"
         python batch_ripple_pipeline.py -l ~/collections.lst
+        python batch_ripple_pipeline.py -l ~/collections.lst --concurrency 3
+        python batch_ripple_pipeline.py -l ~/collections.lst --prefetch
+        python batch_ripple_pipeline.py -l ~/collections.lst --queue
+        python batch_ripple_pipeline.py --queue --concurrency 2
     """
 
     parser = argparse.ArgumentParser(description="Run ripple pipeline on each collection in the collection list")
@@ -264,7 +390,28 @@ if __name__ == "__main__":
         "-l",
         "--collection_list",
         help="A filepath (.txt or .lst) containing a new line separated list of valid collections or a space separated string of collections",
-        required=True,
+    )
+
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Number of collections processed at once, sharing the Ripple1d job and raster task budgets "
+        "of execution.BUDGETS in config. Default 1, one collection after another.",
+    )
+
+    parser.add_argument(
+        "--prefetch",
+        action="store_true",
+        help="Set up the next collections (STAC, downloads, reach filtering) while the current ones are processing. "
+        "Depth and disk guard: execution.PREFETCH_DEPTH and execution.MIN_FREE_DISK_GB in config.",
+    )
+
+    parser.add_argument(
+        "--queue",
+        action="store_true",
+        help="Claim collections from the work queue in the monitoring database until none is pending, with the "
+        "other hosts running --queue. The collections of -l, if given, are added to the queue first.",
     )
 
     parser.add_argument(
@@ -281,6 +428,10 @@ if __name__ == "__main__":
     )
 
     args = vars(parser.parse_args())
+    if not args["collection_list"] and not args["queue"]:
+        parser.error("-l/--collection_list is required without --queue")
+    if args["queue"] and args["prefetch"]:
+        parser.error("--prefetch can't be combined with --queue")
 
     configure_logging(args.pop("log_level"), args.pop("third_party_log_level"))
 
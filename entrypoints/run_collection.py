@@ -3,17 +3,23 @@
 import argparse
 import logging
 
-# Import necessary modules
+# Pipeline modules are imported by the stage functions that use them: raster workers spawned on Windows
+# re-import this module, and --help or --stage setup need none of the process and QC dependencies
 from ripple1d_pipeline import configure_logging
-from ripple1d_pipeline.process import *
-from ripple1d_pipeline.qc import *
-from ripple1d_pipeline.setup import *
 
 logger = logging.getLogger("run_collection")
 
 
 def setup(collection_name):
     """Setup the resources."""
+    from ripple1d_pipeline.setup import (
+        CollectionData,
+        Database,
+        STACImporter,
+        create_src_models_gpkg,
+        filter_nwm_reaches,
+    )
+
     logger.info(f"Setting up the resources for collection: {collection_name}")
 
     # Instantiate CollectionData
@@ -41,11 +47,41 @@ def setup(collection_name):
     Database.insert_models(models_data, collection)
 
 
-def process(collection_name):
-    """Process the data."""
+def process(collection_name, resume=False):
+    """
+    Process the data.
+
+    resume: skip the entities whose step already succeeded in an earlier run of the collection and whose outputs
+        still exist, so only the unfinished part of the collection is submitted again
+    """
+    from ripple1d_pipeline.process import (
+        RASTER_BUDGET,
+        ConflateModelStepProcessor,
+        GenericReachStepProcessor,
+        JobClient,
+        KWSEStepProcessor,
+        Model,
+        RasterWorkerPool,
+        Reach,
+        SharedBudget,
+        create_extent_lib,
+        create_f2f_start_file,
+        create_footprint_index,
+        create_library_mosaics,
+        execute_ikwse_for_network,
+        load_all_rating_curves,
+        load_conflation,
+        process_bridges,
+        process_library_rasters,
+        scan_library,
+        update_network,
+    )
+    from ripple1d_pipeline.setup import CollectionData, Database
+
     logger.info("Starting processing >>>>>>>>")
     # Instantiate CollectionData, Database, JobClient objects
     collection = CollectionData(collection_name)
+    Database.migrate_db(collection)  # collections set up by an earlier version lack newer tables and columns
     database = Database(collection)
     jobclient = JobClient(collection)
 
@@ -55,7 +91,7 @@ def process(collection_name):
     # TODO - Create a @dataclass for model_job_status & reach_job_status
     logger.info("Starting Conflate Model Step >>>>>>")
     conflate_step_processor = ConflateModelStepProcessor(collection, models)
-    conflate_step_processor.execute_step(jobclient, database, timeout=20)
+    conflate_step_processor.execute_step(jobclient, database, timeout=20, resume=resume)
     logger.info("<<<<<<Finished Conflate Model Step")
     conflate_step_processor.dismiss_timedout_jobs(jobclient)  # dismiss stale jobs so they don't occupy API
 
@@ -81,14 +117,14 @@ def process(collection_name):
 
     logger.info("Starting Extract Submodel Step >>>>>>")
     submodel_step_processor = GenericReachStepProcessor(collection, reaches, "extract_submodel")
-    submodel_step_processor.execute_step(jobclient, database, timeout=10)
+    submodel_step_processor.execute_step(jobclient, database, timeout=10, resume=resume)
     logger.info("<<<<<< Finished Extract Submodel Step")
 
     logger.info("Starting Create Ras Terrain Step >>>>>>")
     terrain_step_processor = GenericReachStepProcessor(
         collection, submodel_step_processor.valid_entities, "create_ras_terrain"
     )
-    terrain_step_processor.execute_step(jobclient, database, timeout=10)
+    terrain_step_processor.execute_step(jobclient, database, timeout=10, resume=resume)
     logger.info("<<<<<< Finished Create Ras Terrain Step")
     submodel_step_processor.dismiss_timedout_jobs(
         jobclient
@@ -100,7 +136,7 @@ def process(collection_name):
         terrain_step_processor.valid_entities,
         "create_model_run_normal_depth",
     )
-    create_model_step_processor.execute_step(jobclient, database, timeout=15)
+    create_model_step_processor.execute_step(jobclient, database, timeout=15, resume=resume)
     logger.info("<<<<<< Finished Create Model Run Normal Depth Step")
     terrain_step_processor.dismiss_timedout_jobs(jobclient)
 
@@ -110,7 +146,7 @@ def process(collection_name):
         create_model_step_processor.valid_entities,
         "run_incremental_normal_depth",
     )
-    nd_step_processor.execute_step(jobclient, database, timeout=25)
+    nd_step_processor.execute_step(jobclient, database, timeout=25, resume=resume)
     logger.info("<<<<< Finished Run Incremental Normal Depth Step")
     create_model_step_processor.dismiss_timedout_jobs(jobclient)
     nd_step_processor.dismiss_timedout_jobs(jobclient)
@@ -119,7 +155,7 @@ def process(collection_name):
     nd_rc_step_processor = GenericReachStepProcessor(
         collection, nd_step_processor.valid_entities, "nd_create_rating_curves_db"
     )
-    nd_rc_step_processor.execute_step(jobclient, database, timeout=15)
+    nd_rc_step_processor.execute_step(jobclient, database, timeout=15, resume=resume)
     logger.info("<<<<< Finished nd create_rating_curves_db Step")
     nd_rc_step_processor.dismiss_timedout_jobs(jobclient)
 
@@ -131,12 +167,13 @@ def process(collection_name):
         jobclient,
         nd_rc_step_processor.valid_entities,
         timeout=20,
+        resume=resume,
     )
     logger.info("<<<<< Completed Initial run_known_wse and Initial create_rating_curves_db steps")
 
     logger.info("Starting Final execute_kwse_step >>>>>>")
     kwse_step_processor = KWSEStepProcessor(collection, nd_rc_step_processor.valid_entities)
-    kwse_step_processor.execute_step(jobclient, database, timeout=240)
+    kwse_step_processor.execute_step(jobclient, database, timeout=240, resume=resume)
     logger.info("<<<<< Finished Final execute_kwse_step")
     kwse_step_processor.dismiss_timedout_jobs(jobclient)
 
@@ -144,7 +181,7 @@ def process(collection_name):
     kwse_rc_step_processor = GenericReachStepProcessor(
         collection, kwse_step_processor.valid_entities, "kwse_create_rating_curves_db"
     )
-    kwse_rc_step_processor.execute_step(jobclient, database, timeout=15)
+    kwse_rc_step_processor.execute_step(jobclient, database, timeout=15, resume=resume)
     logger.info("<<<<< Finished kwse create_rating_curves_db Step")
     kwse_rc_step_processor.dismiss_timedout_jobs(jobclient)
 
@@ -154,23 +191,53 @@ def process(collection_name):
 
     logger.info("Starting create_fim_lib Step >>>>>>")
     fimlib_step_processor = GenericReachStepProcessor(collection, nd_rc_step_processor.valid_entities, "create_fim_lib")
-    fimlib_step_processor.execute_step(jobclient, database, timeout=150)
+    fimlib_step_processor.execute_step(jobclient, database, timeout=150, resume=resume)
     logger.info("<<<<< Finished create_fim_lib Step")
     fimlib_step_processor.dismiss_timedout_jobs(jobclient)
 
-    try:
-        logger.info("Starting bridge deck masking Step >>>>>>")
-        process_bridges(collection)
-        logger.info("<<<<< Finished bridge deck masking Step")
-    except Exception:
-        logger.exception("Error - bridge deck masking step failed")
-
-    try:
-        logger.info("Starting create extent library Step >>>>>>")
-        create_extent_lib(collection)
-        logger.info("<<<<< Finished create extent library Step")
-    except Exception:
-        logger.exception("Error - create extent library step failed")
+    # One worker pool for all raster stages, so workers are started (spawned, on Windows) only once
+    raster_budget = SharedBudget.from_config(collection.config, RASTER_BUDGET, collection.stac_collection_id)
+    with RasterWorkerPool.from_config(collection.config, budget=raster_budget) as raster_pool:
+        # Bridge masking rewrites TIFs in place, so one enumeration of the library serves both stages
+        library_scan = scan_library(collection.library_dir)
+        if collection.config["extent_library"].get("FUSED_BRIDGE_MASKING", False):
+            try:
+                logger.info("Starting fused bridge deck masking and create extent library Step >>>>>>")
+                process_library_rasters(collection, pool=raster_pool, library_scan=library_scan)
+                logger.info("<<<<< Finished fused bridge deck masking and create extent library Step")
+            except Exception:
+                logger.exception("Error - fused bridge deck masking and create extent library step failed")
+        else:
+            try:
+                logger.info("Starting bridge deck masking Step >>>>>>")
+                process_bridges(collection, pool=raster_pool, library_scan=library_scan)
+                logger.info("<<<<< Finished bridge deck masking Step")
+            except Exception:
+                logger.exception("Error - bridge deck masking step failed")
+
+            try:
+                logger.info("Starting create extent library Step >>>>>>")
+                create_extent_lib(collection, pool=raster_pool, library_scan=library_scan)
+                logger.info("<<<<< Finished create extent library Step")
+            except Exception:
+                logger.exception("Error - create extent library step failed")
+
+        footprint_mode = collection.config["extent_library"].get("FOOTPRINT_INDEX", "")
+        if footprint_mode:
+            try:
+                logger.info("Starting extent footprint index Step >>>>>>")
+                create_footprint_index(collection, footprint_mode, pool=raster_pool)
+                logger.info("<<<<< Finished extent footprint index Step")
+            except Exception:
+                logger.exception("Error - extent footprint index step failed")
+
+    if collection.config["extent_library"].get("MOSAICS", False):
+        try:
+            logger.info("Starting library mosaics Step >>>>>>")
+            create_library_mosaics(collection, library_scan=library_scan)
+            logger.info("<<<<< Finished library mosaics Step")
+        except Exception:
+            logger.exception("Error - library mosaics step failed")
 
     try:
         logger.info("Creating f2f start file >>>>>>")
@@ -182,6 +249,16 @@ def process(collection_name):
 
 def run_qc(collection_name, execute_flows2fim=False):
     """Perform quality control."""
+    from ripple1d_pipeline.process import JobClient
+    from ripple1d_pipeline.qc import (
+        copy_qc_map,
+        create_failed_jobs_report,
+        create_job_timeline_report,
+        create_timedout_jobs_report,
+        run_flows2fim,
+    )
+    from ripple1d_pipeline.setup import CollectionData, Database
+
     logger.info("Starting QC")
     collection = CollectionData(collection_name)
     database = Database(collection)
@@ -195,6 +272,13 @@ def run_qc(collection_name, execute_flows2fim=False):
     create_timedout_jobs_report(collection, database, job_client)
     logger.info("<<<<< Finished Creating TimedOut Job Report")
 
+    try:
+        logger.info("Creating Job Timeline Report >>>>>>>>")
+        create_job_timeline_report(collection, database)
+        logger.info("<<<<< Finished Creating Job Timeline Report")
+    except Exception:
+        logger.exception("Error - job timeline report failed")
+
     if execute_flows2fim:
         logger.info("Starting run_flows2fim step >>>>>>")
         run_flows2fim(collection)
@@ -205,13 +289,25 @@ def run_qc(collection_name, execute_flows2fim=False):
         logger.info("<<<<< Finished copy_qc_map step")
 
 
-def run_pipeline(collection: str):
-    """Automate execution of all pipeline steps with conditional QC"""
+def run_pipeline(collection: str, stage: str = "all", resume: bool = False):
+    """
+    Automate execution of all pipeline steps with conditional QC
+
+    stage: "all" for setup, process and QC, "setup" for setup only, "process" for process and QC of a
+        collection already set up (run_batch --prefetch runs setup ahead of time)
+    resume: process only what an earlier, interrupted run of the collection left unfinished. Implies stage
+        "process", the collection is not set up again
+    """
+    if stage == "setup":
+        setup(collection)
+        return
+
     execute_flows2fim = False
 
     try:
-        setup(collection)
-        process(collection)
+        if stage == "all" and not resume:
+            setup(collection)
+        process(collection, resume)
         execute_flows2fim = True
     except Exception as e:
         logger.error(f"Main workflow failed: {str(e)}")
@@ -239,6 +335,18 @@ if __name__ == "__main__":
         "locally from the provided STAC URL (in config.py). ",
         required=True,
     )
+    parser.add_argument(
+        "--stage",
+        choices=["all", "setup", "process"],
+        default="all",
+        help="Pipeline stages to run: all (default), setup only, or process and QC of a collection already set up.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Resume an interrupted run: skip setup and the entities whose step already succeeded and whose outputs "
+        "still exist.",
+    )
     parser.add_argument(
         "--log-level",
         default=None,
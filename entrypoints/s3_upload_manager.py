@@ -0,0 +1,188 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import boto3
+from boto3.s3.transfer import TransferConfig, create_transfer_manager
+
+logger = logging.getLogger(__name__)
+
+# Threads checking uploaded objects with HEAD requests, per collection
+VERIFY_WORKERS = 16
+
+
+def parse_s3_uri(uri: str) -> tuple[str, str]:
+    """Split s3://bucket/prefix into (bucket, prefix), prefix without trailing slash."""
+    if not uri.startswith("s3://"):
+        raise ValueError(f"Not an S3 URI: {uri}")
+    bucket, _, prefix = uri[len("s3://") :].partition("/")
+    return bucket, prefix.strip("/")
+
+
+class S3UploadManager:
+    """
+    Moves finished collections to S3 in-process, a bounded number of collections at a time.
+
+    All uploads go through one S3 transfer manager, so the multipart settings, the number of concurrent
+    requests and the bandwidth cap of the s3_upload config section hold across collections. Each uploaded
+    object is checked with a HEAD request and a local file is deleted only once its object size matches.
+    Progress and outcome of each collection are written to the uploads table of the monitoring database.
+    """
+
+    def __init__(self, config: dict, monitoring_database=None):
+        """
+        Inputs:
+            config: Pipeline configuration
+            monitoring_database: MonitoringDatabase to record upload status in, or None
+        """
+        settings = config.get("s3_upload", {})
+        self.collections_root_dir = config["paths"]["COLLECTIONS_ROOT_DIR"]
+        self.upload_prefix = config["paths"].get("S3_UPLOAD_PREFIX", "")
+        self.failed_prefix = config["paths"].get("S3_UPLOAD_FAILED_PREFIX", "")
+        self.ripple1d_version = config["RIPPLE1D_VERSION"]
+        self.monitoring_database = monitoring_database
+
+        mb = 1024**2
+        max_bandwidth_mbps = settings.get("MAX_BANDWIDTH_MBPS", 0)
+        transfer_config = TransferConfig(
+            multipart_threshold=settings.get("MULTIPART_THRESHOLD_MB", 64) * mb,
+            multipart_chunksize=settings.get("MULTIPART_CHUNKSIZE_MB", 64) * mb,
+            max_concurrency=settings.get("MAX_TRANSFER_CONCURRENCY", 16),
+            max_bandwidth=int(max_bandwidth_mbps * mb / 8) if max_bandwidth_mbps else None,
+            # The CRT client, picked automatically on some instance types, ignores the bandwidth cap
+            preferred_transfer_client="classic",
+        )
+        # Default credential chain, as the aws CLI used before
+        self.client = boto3.Session().client("s3")
+        self.transfer_manager = create_transfer_manager(self.client, transfer_config)
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(1, settings.get("MAX_CONCURRENT_UPLOADS", 1)), thread_name_prefix="s3-upload"
+        )
+        self.futures = {}
+        self._db_lock = threading.Lock()
+
+    def destination(self, collection: str, failed: bool = False) -> str | None:
+        """S3 URI a collection is moved to, None when the corresponding prefix is not configured."""
+        if failed:
+            if not self.failed_prefix:
+                return None
+            timestamp = datetime.now().strftime("%m-%d-%Y_%H_%M")
+            return f"{self.failed_prefix.rstrip('/')}/{collection}_{self.ripple1d_version}_{timestamp}"
+        if not self.upload_prefix:
+            return None
+        return f"{self.upload_prefix.rstrip('/')}/{collection}"
+
+    def submit(self, collection: str, failed: bool = False) -> None:
+        """Queue a collection for upload. It is skipped, and kept locally, when no prefix is configured."""
+        destination = self.destination(collection, failed)
+        if destination is None:
+            logger.info(f"No S3 upload prefix configured, keeping collection {collection} locally")
+            return
+        self._record(collection, destination, "queued")
+        self.futures[collection] = self.executor.submit(self._move_collection, collection, destination)
+        logger.info(f"Queued S3 upload of collection {collection} to {destination}")
+
+    def wait(self) -> dict[str, bool]:
+        """
+        Wait for all queued uploads and shut down.
+
+        Returns:
+            Collection -> True if all its files were uploaded, verified and deleted locally
+        """
+        results = {}
+        for collection, future in self.futures.items():
+            try:
+                results[collection] = future.result()
+            except Exception:
+                logger.exception(f"S3 upload of collection {collection} failed")
+                results[collection] = False
+        self.executor.shutdown()
+        self.transfer_manager.shutdown()
+        return results
+
+    def _record(self, collection: str, destination: str, status: str, **fields) -> None:
+        if self.monitoring_database is None:
+            return
+        try:
+            with self._db_lock:
+                self.monitoring_database.update_uploads_table(
+                    collection,
+                    destination,
+                    status,
+                    fields.get("files_total"),
+                    fields.get("files_uploaded"),
+                    fields.get("bytes_uploaded"),
+                    fields.get("start_time"),
+                    fields.get("finish_time"),
+                    fields.get("error_message"),
+                )
+        except Exception as e:
+            logger.exception(f"Monitoring database- UPLOADS TABLE write failed. Error Message: \n\t {e}")
+
+    def _verify(self, bucket: str, key: str, size: int) -> bool:
+        try:
+            return self.client.head_object(Bucket=bucket, Key=key)["ContentLength"] == size
+        except Exception as e:
+            logger.warning(f"Could not verify s3://{bucket}/{key}: {e}")
+            return False
+
+    def _move_collection(self, collection: str, destination: str) -> bool:
+        """Upload a collection directory, verify each object, then delete the verified local files."""
+        local_dir = os.path.join(self.collections_root_dir, collection)
+        bucket, prefix = parse_s3_uri(destination)
+        start_time = datetime.now()
+
+        files = []
+        for dirpath, _, filenames in os.walk(local_dir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                key = f"{prefix}/{os.path.relpath(path, local_dir).replace(os.sep, '/')}".lstrip("/")
+                files.append((path, key, os.path.getsize(path)))
+
+        self._record(collection, destination, "uploading", files_total=len(files), start_time=start_time)
+        logger.info(f"Uploading {len(files)} files of collection {collection} to {destination}")
+
+        uploads = [(path, key, size, self.transfer_manager.upload(path, bucket, key)) for path, key, size in files]
+        uploaded, errors = [], []
+        for path, key, size, future in uploads:
+            try:
+                future.result()
+                uploaded.append((path, key, size))
+            except Exception as e:
+                errors.append(f"{path}: {e}")
+
+        with ThreadPoolExecutor(max_workers=VERIFY_WORKERS) as executor:
+            checks = list(executor.map(lambda file: self._verify(bucket, file[1], file[2]), uploaded))
+        verified = [file for file, ok in zip(uploaded, checks, strict=True) if ok]
+        errors.extend(
+            f"{path}: uploaded size does not match" for (path, _, _), ok in zip(uploaded, checks, strict=True) if not ok
+        )
+
+        for path, _, _ in verified:
+            os.remove(path)
+        # Remove the directories emptied, deepest first, the collection directory included
+        for dirpath, _, _ in os.walk(local_dir, topdown=False):
+            try:
+                os.rmdir(dirpath)
+            except OSError:
+                pass
+
+        succeeded = not errors
+        self._record(
+            collection,
+            destination,
+            "successful" if succeeded else "failed",
+            files_total=len(files),
+            files_uploaded=len(verified),
+            bytes_uploaded=sum(size for _, _, size in verified),
+            start_time=start_time,
+            finish_time=datetime.now(),
+            error_message=None if succeeded else f"{len(errors)} files not moved, first: {errors[0]}",
+        )
+        if succeeded:
+            logger.info(f"Moved collection {collection} to {destination}")
+        else:
+            logger.error(f"{len(errors)} files of collection {collection} not moved to {destination}, kept locally")
+        return succeeded
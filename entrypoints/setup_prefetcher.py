@@ -0,0 +1,104 @@
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds between free disk space checks while the disk guard holds back the next setup
+DISK_GUARD_POLL_WAIT = 60
+
+
+class SetupPrefetcher:
+    """
+    Runs the setup stage of upcoming collections ahead of their processing, in a background thread.
+
+    Setup (STAC scan, S3 download, GPKG merge, reach filtering) does not use the Ripple1d server, so
+    it runs for the next collections while the current one is processing. At most `depth` collections
+    are set up ahead of the ones processing, and a new setup waits while the free disk space of the
+    collections root is below `min_free_disk_gb` and another collection is processing (which will free
+    space when it is moved to S3).
+    """
+
+    def __init__(
+        self, collections: list[str], build_cmd, collections_root_dir: str, depth: int, min_free_disk_gb: float
+    ):
+        """
+        Inputs:
+            collections: Collections to set up, in processing order
+            build_cmd: Function (collection, stage) -> run_collection.py command
+            collections_root_dir: Collections root, where setup downloads to and logs are written
+            depth: Number of collections set up ahead of the ones processing
+            min_free_disk_gb: Free disk space required to start a setup
+        """
+        self.collections = collections
+        self.build_cmd = build_cmd
+        self.collections_root_dir = collections_root_dir
+        self.min_free_disk_gb = min_free_disk_gb
+        self._slots = threading.Semaphore(max(1, depth))
+        self._ready = {collection: threading.Event() for collection in collections}
+        self._errors = {}
+        self._processing = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="setup-prefetch", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def _free_disk_gb(self) -> float:
+        return shutil.disk_usage(self.collections_root_dir).free / 1024**3
+
+    def _wait_for_disk(self, collection: str) -> None:
+        while (free_gb := self._free_disk_gb()) < self.min_free_disk_gb:
+            with self._lock:
+                processing = self._processing
+            if not processing:
+                # Nothing running will free space, waiting would stall the batch
+                logger.warning(f"Only {free_gb:.1f} GB free, setting up {collection} anyway")
+                return
+            logger.info(f"Only {free_gb:.1f} GB free, setup of {collection} waits for a collection to finish")
+            time.sleep(DISK_GUARD_POLL_WAIT)
+
+    def _run(self) -> None:
+        for collection in self.collections:
+            self._slots.acquire()
+            try:
+                self._wait_for_disk(collection)
+                log_dir = os.path.join(self.collections_root_dir, collection)
+                os.makedirs(log_dir, exist_ok=True)
+                cmd = self.build_cmd(collection, "setup")
+                logger.info(f"Prefetching setup for collection: {collection} ...")
+                with open(os.path.join(log_dir, f"{collection}.log"), "a") as f:
+                    f.write("************************************************************************")
+                    f.write(f"\n--- Starting setup for collection: {collection} ---\n")
+                    f.flush()
+                    process = subprocess.run(cmd, shell=True, stdout=f, stderr=f)
+                if process.returncode != 0:
+                    raise subprocess.CalledProcessError(process.returncode, cmd)
+                logger.info(f"Setup for collection {collection} finished.")
+            except Exception as e:
+                logger.error(f"Setup failed for collection {collection}: {e}")
+                self._errors[collection] = str(e)
+            finally:
+                self._ready[collection].set()
+
+    def wait(self, collection: str) -> str | None:
+        """
+        Wait for the setup of a collection, and count it as processing.
+
+        Returns:
+            Error message if the setup failed, else None
+        """
+        self._ready[collection].wait()
+        with self._lock:
+            self._processing += 1
+        # The collection is no longer ahead, let the next one be set up
+        self._slots.release()
+        return self._errors.get(collection)
+
+    def done(self, collection: str) -> None:
+        """Count a collection returned by wait as no longer processing."""
+        with self._lock:
+            self._processing -= 1
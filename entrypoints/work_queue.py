@@ -0,0 +1,193 @@
+"""
+Queue of collections shared by the run_batch hosts of a fleet.
+
+Instead of each host working through its own static list, hosts started with run_batch --queue pull the
+next pending collection when they have capacity. The queue lives in the work_queue table of the monitoring
+database, which the fleet already shares. A claim is taken under BEGIN IMMEDIATE, so two hosts can't claim
+the same collection, and is kept alive by a heartbeat while the collection is processed. Claims whose
+heartbeat stopped (host crashed or lost the share) are put back to pending, up to a number of attempts.
+The default rollback journal is kept (no WAL, which needs shared memory on a single host and is unsafe on a
+network share), and hosts wait for each other's write lock up to the connection timeout.
+
+run_batch only uses enqueue, claim, heartbeat and complete, another backend can replace this one by
+providing the same methods.
+"""
+
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import UTC, datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+
+def _utc_now() -> str:
+    # UTC, so heartbeats written by hosts in different time zones compare
+    return datetime.now(UTC).isoformat(sep=" ", timespec="seconds")
+
+
+class WorkQueue:
+    """
+    Collection queue backed by a table of the SQLite monitoring database.
+    """
+
+    def __init__(self, db_path: str, timeout: float = 60, stale_after_s: float = 900, max_attempts: int = 2):
+        """
+        Args:
+            db_path: Monitoring database, shared by the hosts
+            timeout: SQLite connection timeout in seconds
+            stale_after_s: Seconds without heartbeat after which a claim is taken back
+            max_attempts: Claims of a collection before a stale claim marks it failed instead of pending
+        """
+        self.db_path = db_path
+        self.timeout = timeout
+        self.stale_after_s = stale_after_s
+        self.max_attempts = max_attempts
+        self.init_db()
+
+    @contextmanager
+    def _get_connection(self):
+        # Autocommit mode, transactions are opened explicitly with BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def init_db(self) -> None:
+        """Create the work_queue table."""
+        with self._get_connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS work_queue (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    collection_id TEXT UNIQUE NOT NULL,
+                    queue_status TEXT NOT NULL DEFAULT 'pending',
+                    claimed_by TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    enqueue_time TIMESTAMP,
+                    claim_time TIMESTAMP,
+                    heartbeat_time TIMESTAMP,
+                    finish_time TIMESTAMP
+                );
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS work_queue_status_idx ON work_queue (queue_status, seq);")
+
+    def enqueue(self, collections: list[str]) -> int:
+        """
+        Add collections to the end of the queue. Collections already queued, in any status, are left as they are.
+
+        Returns:
+            Number of collections added
+        """
+        now = _utc_now()
+        with self._get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                added = 0
+                for collection in collections:
+                    cursor = conn.execute(
+                        "INSERT OR IGNORE INTO work_queue (collection_id, enqueue_time) VALUES (?, ?)",
+                        (collection, now),
+                    )
+                    added += cursor.rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def _reclaim_stale(self, conn: sqlite3.Connection) -> None:
+        """Put claims without a recent heartbeat back to pending, or failed once out of attempts. Lock held."""
+        cutoff = (datetime.now(UTC) - timedelta(seconds=self.stale_after_s)).isoformat(sep=" ", timespec="seconds")
+        stale = conn.execute(
+            "SELECT collection_id, claimed_by, attempts FROM work_queue "
+            "WHERE queue_status = 'claimed' AND heartbeat_time < ?",
+            (cutoff,),
+        ).fetchall()
+        for collection, claimed_by, attempts in stale:
+            status = "pending" if attempts < self.max_attempts else "failed"
+            logger.warning(f"Claim of {collection} by {claimed_by} is stale, collection set back to {status}")
+            conn.execute(
+                "UPDATE work_queue SET queue_status = ?, claimed_by = NULL, finish_time = ? "
+                "WHERE collection_id = ? AND queue_status = 'claimed'",
+                (status, _utc_now() if status == "failed" else None, collection),
+            )
+
+    def claim(self, worker: str) -> str | None:
+        """
+        Claim the oldest pending collection, after taking back stale claims.
+
+        Args:
+            worker: Identifies the claiming host and process
+
+        Returns:
+            Collection id, or None if nothing is pending
+        """
+        with self._get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._reclaim_stale(conn)
+                row = conn.execute(
+                    "SELECT collection_id FROM work_queue WHERE queue_status = 'pending' ORDER BY seq LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    now = _utc_now()
+                    conn.execute(
+                        "UPDATE work_queue SET queue_status = 'claimed', claimed_by = ?, attempts = attempts + 1, "
+                        "claim_time = ?, heartbeat_time = ? WHERE collection_id = ?",
+                        (worker, now, now, row[0]),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return row[0] if row else None
+
+    def heartbeat(self, collection: str, worker: str) -> bool:
+        """
+        Renew a claim.
+
+        Returns:
+            False if the claim was lost, i.e. taken back as stale
+        """
+        with self._get_connection() as conn:
+            cursor = conn.execute(
+                "UPDATE work_queue SET heartbeat_time = ? "
+                "WHERE collection_id = ? AND claimed_by = ? AND queue_status = 'claimed'",
+                (_utc_now(), collection, worker),
+            )
+        return cursor.rowcount > 0
+
+    def complete(self, collection: str, worker: str, status: str) -> None:
+        """Record the outcome of a claimed collection, 'successful' or 'failed'."""
+        with self._get_connection() as conn:
+            cursor = conn.execute(
+                "UPDATE work_queue SET queue_status = ?, finish_time = ? WHERE collection_id = ? AND claimed_by = ?",
+                (status, _utc_now(), collection, worker),
+            )
+        if not cursor.rowcount:
+            logger.warning(f"Claim of {collection} by {worker} was lost, its outcome {status} is not recorded")
+
+    @contextmanager
+    def keep_alive(self, collection: str, worker: str, interval_s: float):
+        """Heartbeat a claim every interval_s seconds, in a background thread, for the duration of the block."""
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(interval_s):
+                try:
+                    if not self.heartbeat(collection, worker):
+                        logger.warning(f"Claim of {collection} by {worker} was taken back, another host may run it")
+                except Exception as e:
+                    logger.warning(f"Heartbeat of {collection} failed: {e}")
+
+        thread = threading.Thread(target=beat, name=f"heartbeat-{collection}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
@@ -58,6 +58,8 @@ _ENV_OVERLAY = {
     "RP_S3_UPLOAD_PREFIX": EnvVar(("paths", "S3_UPLOAD_PREFIX"), required=False, default=""),
     "RP_S3_UPLOAD_FAILED_PREFIX": EnvVar(("paths", "S3_UPLOAD_FAILED_PREFIX"), required=False, default=""),
     "RP_STAC_S3_KEY_PREFIX": EnvVar(("paths", "STAC_S3_KEY_PREFIX"), required=False, default=""),
+    # Set by run_batch --concurrency for its collection processes
+    "RP_SHARED_BUDGET_DB": EnvVar(("execution", "SHARED_BUDGET_DB"), required=False, default=""),
 }
 
 
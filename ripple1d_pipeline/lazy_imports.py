@@ -0,0 +1,40 @@
+"""
+Lazy public names of the subpackages (PEP 562).
+
+Importing ripple1d_pipeline.process, .setup or .qc used to import every module of the subpackage, and with
+them geopandas, pandas, boto3, pystac_client, duckdb and GDAL. Raster worker processes, spawned on
+Windows, paid that on start for the one module their task lives in. Each subpackage now lists its public
+names with the submodule defining them, and a name's submodule is imported on first access only.
+"""
+
+import importlib
+import sys
+
+
+def attach(package: str, exports: dict[str, str]):
+    """
+    Module __getattr__ and __dir__ of a package, and its __all__.
+
+    Usage, in the package __init__.py:
+        __getattr__, __dir__, __all__ = attach(__name__, {"Database": "database", ...})
+
+    A name is cached in the package namespace once imported, so a function shadows its same-named
+    submodule (e.g. update_network) as with eager imports. `from package import *` imports every name.
+
+    Args:
+        package: Package name, __name__ of the __init__.py
+        exports: Public name -> submodule defining it, relative to the package
+    """
+
+    def __getattr__(name: str):
+        submodule = exports.get(name)
+        if submodule is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(f".{submodule}", package), name)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__() -> list[str]:
+        return sorted(set(vars(sys.modules[package])) | set(exports))
+
+    return __getattr__, __dir__, list(exports)
@@ -1,14 +1,37 @@
-from .bridge_processor import process_bridges
-from .conflate_step_processor import ConflateModelStepProcessor
-from .create_f2f_start_file import create_f2f_start_file
-from .extent_library import create_extent_lib
-from .generic_reach_step_processor import GenericReachStepProcessor
-from .ikwse_step import execute_ikwse_for_network
-from .job_client import JobClient
-from .kwse_step_processor import KWSEStepProcessor
-from .load_conflation import load_conflation
-from .load_rating_curves import load_all_rating_curves
-from .model import Model
-from .move_fims_to_library import move_fims_to_library
-from .reach import Reach
-from .update_network import update_network
+from ..lazy_imports import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    {
+        "process_bridges": "bridge_processor",
+        "BridgeTileIndex": "bridge_tile_index",
+        "ConflateModelStepProcessor": "conflate_step_processor",
+        "create_f2f_start_file": "create_f2f_start_file",
+        "create_footprint_index": "extent_footprints",
+        "create_extent_lib": "extent_library",
+        "process_library_rasters": "fused_raster_stage",
+        "GenericReachStepProcessor": "generic_reach_step_processor",
+        "execute_ikwse_for_network": "ikwse_step",
+        "JobClient": "job_client",
+        "RetryPolicy": "job_retry",
+        "record_job_timeline": "job_timeline",
+        "KWSEStepProcessor": "kwse_step_processor",
+        "create_library_mosaics": "library_mosaic",
+        "LibraryScan": "library_scan",
+        "scan_library": "library_scan",
+        "load_conflation": "load_conflation",
+        "load_all_rating_curves": "load_rating_curves",
+        "Model": "model",
+        "move_fims_to_library": "move_fims_to_library",
+        "RasterWorkerPool": "raster_pool",
+        "Reach": "reach",
+        "JOB_BUDGET": "shared_budget",
+        "RASTER_BUDGET": "shared_budget",
+        "SharedBudget": "shared_budget",
+        "StepSpan": "step_metrics",
+        "record_step": "step_metrics",
+        "SubmissionThrottle": "submission_throttle",
+        "TimeoutPolicy": "timeout_policy",
+        "update_network": "update_network",
+    },
+)
@@ -12,16 +12,32 @@ class BaseModelStepProcessor(BaseStepProcessor):
         self.models = models
         self.db_table = "models"
 
-    def _format_model_payload(self, template: dict, model_id: str, model_name: str) -> dict:
-        """Common model payload formatting"""
-        replacements = {
+    @property
+    def entities(self) -> list[Model]:
+        return self.models
+
+    @entities.setter
+    def entities(self, models: list[Model]):
+        self.models = models
+
+    def _replacements(self, model_id: str, model_name: str) -> dict:
+        """Values of the placeholders of model payload and output templates"""
+        return {
             "model_id": model_id,
             "model_name": model_name,
             "source_model_directory": self.collection.source_models_dir,
             "source_network": self.collection.config["paths"]["SOURCE_NETWORK"],
         }
+
+    def _format_model_payload(self, template: dict, model_id: str, model_name: str) -> dict:
+        """Common model payload formatting"""
+        replacements = self._replacements(model_id, model_name)
         return {key: format_template(value, replacements) for key, value in template.items()}
 
+    def _output_paths(self, model: Model, templates: list[str]) -> list[str]:
+        """Model output path templates formatted for model"""
+        return format_template(templates, self._replacements(model.id, model.name))
+
     def _update_database(self, database: Database, status: str):
         """Common model database update"""
         database.update_models_table(
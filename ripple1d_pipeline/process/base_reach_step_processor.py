@@ -4,6 +4,21 @@ from .base_step_processor import BaseStepProcessor, format_template
 from .reach import Reach
 
 
+def reach_replacements(
+    collection: CollectionData, reach_id: int, model_id: str | None = None, model_name: str | None = None
+) -> dict:
+    """Values of the placeholders of reach payload and output templates"""
+    return {
+        "nwm_reach_id": reach_id,
+        "model_id": model_id or "",
+        "model_name": model_name or "",
+        "submodels_directory": collection.submodels_dir,
+        "library_directory": collection.library_dir,
+        "source_model_directory": collection.source_models_dir,
+        "terrain_source_url": collection.config["paths"]["TERRAIN_SOURCE_URL"],
+    }
+
+
 class BaseReachStepProcessor(BaseStepProcessor):
     """Base class for reach-level processing steps"""
 
@@ -12,6 +27,18 @@ class BaseReachStepProcessor(BaseStepProcessor):
         self.reaches = reaches
         self.db_table = "processing"
 
+    @property
+    def entities(self) -> list[Reach]:
+        return self.reaches
+
+    @entities.setter
+    def entities(self, reaches: list[Reach]):
+        self.reaches = reaches
+
+    def _replacements(self, reach_id: int, model_id: str | None = None, model_name: str | None = None) -> dict:
+        """Values of the placeholders of reach payload and output templates"""
+        return reach_replacements(self.collection, reach_id, model_id, model_name)
+
     def _format_reach_payload(
         self,
         template: dict,
@@ -20,17 +47,14 @@ class BaseReachStepProcessor(BaseStepProcessor):
         model_name: str | None = None,
     ) -> dict:
         """Common reach payload formatting"""
-        replacements = {
-            "nwm_reach_id": reach_id,
-            "model_id": model_id or "",
-            "model_name": model_name or "",
-            "submodels_directory": self.collection.submodels_dir,
-            "library_directory": self.collection.library_dir,
-            "source_model_directory": self.collection.source_models_dir,
-            "terrain_source_url": self.collection.config["paths"]["TERRAIN_SOURCE_URL"],
-        }
+        replacements = self._replacements(reach_id, model_id, model_name)
         return {key: format_template(value, replacements) for key, value in template.items()}
 
+    def _output_paths(self, reach: Reach, templates: list[str]) -> list[str]:
+        """Reach output path templates formatted for reach"""
+        model = reach.model
+        return format_template(templates, self._replacements(reach.id, model and model.id, model and model.name))
+
     def _update_database(self, database: Database, status: str):
         """Common reach database update"""
         database.update_processing_table(
@@ -38,3 +62,7 @@ class BaseReachStepProcessor(BaseStepProcessor):
             self.process_name,
             status,
         )
+
+    def _ras_lengths(self, database: Database) -> dict:
+        """Reach id -> ras length"""
+        return database.get_ras_lengths([reach.id for reach in self.reaches])
@@ -1,9 +1,17 @@
+import glob
 import logging
+import os
+import time
 from abc import abstractmethod
+from datetime import datetime
 
 from ..setup.collection_data import CollectionData
 from ..setup.database import Database
 from .job_client import JobClient, JobRecord
+from .job_retry import RetryPolicy
+from .job_timeline import record_job_timeline
+from .step_metrics import record_step
+from .timeout_policy import TimeoutPolicy
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +31,11 @@ def format_template(value, replacements: dict):
     return value
 
 
+def output_exists(path: str) -> bool:
+    """Whether the output path, a glob pattern with Windows or POSIX separators, matches any file"""
+    return bool(glob.glob(os.path.normpath(path.replace("\\", os.sep))))
+
+
 class BaseStepProcessor:
     """Base class for all processing steps"""
 
@@ -34,37 +47,234 @@ class BaseStepProcessor:
             "failed": [],
             "not_accepted": [],
             "unknown": [],
+            "skipped": [],
+            "retried": [],
         }
 
-    def execute_step(self, job_client: JobClient, database: Database, timeout: int):
-        """Template method defining the processing workflow"""
-        self._execute_requests()
-        self._update_database(database, "accepted")
-        self._update_database(database, "not_accepted")
-        logger.info("Jobs submitted, waiting for jobs to finish")
-        self._wait_for_jobs(job_client, timeout)
-        self._update_database(database, "succeeded")
-        self._update_database(database, "failed")
-        self._update_database(database, "unknown")
-        self._log_results()
+    def execute_step(self, job_client: JobClient, database: Database, timeout: int, resume: bool = False):
+        """
+        Template method defining the processing workflow, recorded as a span in the step_metrics table.
+
+        timeout is the static job timeout in minutes, used until the step has enough run time history for the
+        timeout policy to learn per-job timeouts. With resume, entities completed by an earlier run are skipped.
+        Failed and not accepted entities are then retried per the retry policy.
+        """
+        policy = TimeoutPolicy.from_config(self.collection.config, self.collection.stac_collection_id)
+        retry_policy = RetryPolicy.from_config(self.collection.config)
+        with record_step(database, self.process_name, "api") as span:
+            if resume:
+                self.skip_completed(database)
+            with span.phase("submit"):
+                self._execute_requests(job_client)
+            self._update_database(database, "accepted")
+            self._update_database(database, "not_accepted")
+            ras_lengths = self._ras_lengths(database) if policy.adaptive else {}
+            job_timeouts = {
+                job_record.id: policy.timeout_for(self.process_name, ras_lengths.get(job_record.entity.id), timeout)
+                for job_record in self.job_records["accepted"]
+            }
+            logger.info("Jobs submitted, waiting for jobs to finish")
+            with span.phase("wait"):
+                self._wait_for_jobs(job_client, timeout, job_timeouts)
+            self._update_database(database, "succeeded")
+            self._update_database(database, "failed")
+            self._update_database(database, "unknown")
+            if retry_policy.enabled:
+                with span.phase("retry"):
+                    self._retry_jobs(job_client, database, retry_policy, policy, ras_lengths, timeout)
+            self._log_results()
+            span.counts = {
+                status: len(self.job_records[status])
+                for status in ("succeeded", "failed", "not_accepted", "unknown", "skipped", "retried")
+            }
+            # Job metadata is fetched (one request per job) only for the timeline or the timeout history
+            if database.job_timeline or policy.adaptive:
+                metadata = self._record_job_timeline(job_client, database)
+                span.job_durations = self._run_times(
+                    metadata, self.job_records["succeeded"] + self.job_records["failed"] + self.job_records["retried"]
+                )
+                policy.record(
+                    self.process_name,
+                    [
+                        (ras_lengths.get(job_record.entity.id), metadata[job_record.id]["finish_duration_minutes"])
+                        for job_record in self.job_records["succeeded"]
+                        if metadata.get(job_record.id, {}).get("finish_duration_minutes") is not None
+                    ],
+                )
+
+    def _retry_jobs(
+        self,
+        job_client: JobClient,
+        database: Database,
+        retry_policy: RetryPolicy,
+        timeout_policy: TimeoutPolicy,
+        ras_lengths: dict,
+        timeout: int,
+    ) -> None:
+        """
+        Resubmit the entities whose job did not succeed and is retryable, waiting with exponential backoff
+        between attempts, until none is left to retry or retry_policy.max_attempts is reached.
+
+        Each attempt of an entity whose first job did not succeed is recorded in the job_attempts table.
+        The job records of retried attempts are moved to job_records["retried"].
+        """
+        attempt = 1
+        attempt_records = self.job_records["failed"] + self.job_records["not_accepted"] + self.job_records["unknown"]
+        while attempt_records:
+            retries, rows = [], []
+            attempt_time = datetime.now().isoformat(sep=" ", timespec="seconds")
+            for job_record in attempt_records:
+                error, retry = None, False
+                if job_record.status != "successful":
+                    error = self._job_error(job_client, job_record)
+                    retry = attempt < retry_policy.max_attempts and self._retryable(job_record, error, retry_policy)
+                if retry:
+                    retries.append(job_record)
+                rows.append(
+                    (
+                        self.process_name,
+                        str(job_record.entity.id),
+                        attempt,
+                        job_record.id or None,
+                        job_record.status,
+                        error,
+                        retry,
+                        attempt_time,
+                    )
+                )
+            try:
+                database.insert_job_attempts(rows)
+            except Exception as e:
+                logger.warning(f"Could not record the job attempts of {self.process_name}: {e}")
+            if not retries:
+                break
+
+            delay = retry_policy.backoff(attempt)
+            attempt += 1
+            logger.info(
+                f"Retrying {len(retries)} {self.process_name} entities in {delay:.0f} s, "
+                f"attempt {attempt} of {retry_policy.max_attempts}"
+            )
+            time.sleep(delay)
+            for job_record in retries:
+                self.job_records[job_record.status].remove(job_record)
+            self.job_records["retried"].extend(retries)
+            # Timed out jobs may still be running, dismiss them before running their entity again
+            job_client.dismiss_jobs([job_record for job_record in retries if job_record.status == "unknown"])
+
+            attempt_records = [self._execute_single_request(job_client, job_record.entity) for job_record in retries]
+            accepted = [job_record for job_record in attempt_records if job_record.status == "accepted"]
+            self.job_records["accepted"].extend(accepted)
+            self.job_records["not_accepted"].extend(
+                job_record for job_record in attempt_records if job_record.status == "not_accepted"
+            )
+            job_timeouts = {
+                job_record.id: timeout_policy.timeout_for(
+                    self.process_name, ras_lengths.get(job_record.entity.id), timeout
+                )
+                for job_record in accepted
+            }
+            succeeded, failed, unknown = job_client.wait_for_jobs(accepted, timeout, job_timeouts)
+            self.job_records["succeeded"].extend(succeeded)
+            self.job_records["failed"].extend(failed)
+            self.job_records["unknown"].extend(unknown)
+            for status in ("not_accepted", "succeeded", "failed", "unknown"):
+                self._update_database(database, status)
+
+    @staticmethod
+    def _job_error(job_client: JobClient, job_record: JobRecord) -> str:
+        """Why a job did not succeed, the Ripple1d error for failed jobs"""
+        if job_record.status == "failed":
+            return job_client.get_failed_job_err_and_tb(job_record.id)[0]
+        if job_record.status == "unknown":
+            return "client timeout"
+        return "not accepted"
+
+    def _retryable(self, job_record: JobRecord, error: str, retry_policy: RetryPolicy) -> bool:
+        """Whether an entity whose job did not succeed is worth another attempt"""
+        if job_record.status not in retry_policy.statuses:
+            return False
+        if job_record.status == "failed":
+            return retry_policy.is_retryable_error(error)
+        return True
+
+    def _record_job_timeline(self, job_client: JobClient, database: Database) -> dict[str, dict]:
+        """
+        Write the lifecycle of the step's jobs to the job_timeline table, timed out and retried jobs included.
+
+        Returns:
+            Job id -> Ripple1d metadata
+        """
+        job_records = (
+            self.job_records["succeeded"]
+            + self.job_records["failed"]
+            + self.job_records["unknown"]
+            + self.job_records["retried"]
+        )
+        jobs = [(job_record.entity.id, job_record.id) for job_record in job_records]
+        return record_job_timeline(job_client, database, self.process_name, jobs)
+
+    @staticmethod
+    def _run_times(metadata: dict[str, dict], job_records: list[JobRecord]) -> list[float]:
+        """Run time in minutes of the jobs with a finish duration in their metadata"""
+        return [
+            metadata[job_record.id]["finish_duration_minutes"]
+            for job_record in job_records
+            if metadata.get(job_record.id, {}).get("finish_duration_minutes") is not None
+        ]
+
+    def skip_completed(self, database: Database) -> None:
+        """
+        Remove from the step the entities whose job succeeded in an earlier run and whose outputs still exist,
+        and record them as skipped. They stay valid entities for the following steps.
+
+        The outputs of a step are the path templates (glob patterns) under outputs in its processing_steps
+        config. Steps without outputs are skipped on status alone.
+        """
+        templates = self.collection.config["processing_steps"][self.process_name].get("outputs") or []
+        completed = database.get_completed_entities(self.process_name, self.db_table)
+        remaining = []
+        for entity in self.entities:
+            paths = self._output_paths(entity, templates)
+            if entity.id in completed and all(output_exists(path) for path in paths):
+                self.job_records["skipped"].append(JobRecord(entity, completed[entity.id], "skipped"))
+            else:
+                remaining.append(entity)
+        self.entities = remaining
+        skipped = len(self.job_records["skipped"])
+        logger.info(f"Resuming {self.process_name}: {skipped} completed by an earlier run, {len(remaining)} to run")
+
+    @abstractmethod
+    def _output_paths(self, entity, templates: list[str]) -> list[str]:
+        """Output path templates formatted for entity"""
+        pass
+
+    def _ras_lengths(self, database: Database) -> dict:
+        """Entity id -> ras length, for the timeouts of entities of different size. Empty for model steps"""
+        return {}
 
     @abstractmethod
-    def _execute_requests(self):
+    def _execute_requests(self, job_client: JobClient):
         """Execute API requests for all items"""
         pass
 
+    @abstractmethod
+    def _execute_single_request(self, job_client: JobClient, entity) -> JobRecord:
+        """Submit the job of one entity"""
+        pass
+
     @abstractmethod
     def _update_database(self, database: Database, status: str):
         """Update database with current status"""
         pass
 
-    def _wait_for_jobs(self, job_client: JobClient, timeout: int):
+    def _wait_for_jobs(self, job_client: JobClient, timeout: int, job_timeouts: dict[str, float] | None = None):
         """Common job waiting implementation"""
         (
             self.job_records["succeeded"],
             self.job_records["failed"],
             self.job_records["unknown"],
-        ) = job_client.wait_for_jobs(self.job_records["accepted"], timeout)
+        ) = job_client.wait_for_jobs(self.job_records["accepted"], timeout, job_timeouts)
 
     def _categorize_job_record(self, job_record: JobRecord) -> None:
         """Categorizes a job result into appropriate status list"""
@@ -83,6 +293,8 @@ class BaseStepProcessor:
         logger.info(f"Failed: {len(self.job_records['failed'])}")
         logger.info(f"Not Accepted: {len(self.job_records['not_accepted'])}")
         logger.info(f"Unknown: {len(self.job_records['unknown'])}")
+        if self.job_records["retried"]:
+            logger.info(f"Retried: {len(self.job_records['retried'])}")
 
     def dismiss_timedout_jobs(self, job_client: JobClient):
         """Dismiss all unknown jobs"""
@@ -90,5 +302,6 @@ class BaseStepProcessor:
 
     @property
     def valid_entities(self):
-        """Returns all entities that were succeeded or timedout(unknown)"""
-        return [job_record.entity for job_record in self.job_records["succeeded"] + self.job_records["unknown"]]
+        """Returns all entities that were succeeded, timedout(unknown) or skipped as completed by an earlier run"""
+        job_records = self.job_records["succeeded"] + self.job_records["unknown"] + self.job_records["skipped"]
+        return [job_record.entity for job_record in job_records]
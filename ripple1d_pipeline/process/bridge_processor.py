@@ -1,20 +1,39 @@
 """
 Bridge processor module for masking depth library TIFs based on bridge locations.
 
-Uses GDAL/OGR command-line tools via subprocess for all operations. This has benefits of maintainability and also easier debugging if you have existing intermediate outputs before the subprocess call.
+Uses GDAL/OGR command-line tools via subprocess for the raster operations. This has benefits of maintainability and also easier debugging if you have existing intermediate outputs before the subprocess call.
+The bridge tile index is the exception, it is loaded once into memory (see bridge_tile_index.py) as querying it per reach with ogr2ogr costs a process launch and an index open per reach.
+
+Masking subtracts the bridge deck from the depth grid in place, so it must run once per grid. Processed grids are
+recorded in the bridge_masked_grids table of the collection database with their size and mtime, and a grid that
+still has them is not masked again (e.g. on a resumed or repeated run). A grid rewritten by create_fim_lib since
+has a new mtime, and is masked again.
 """
 
 import json
 import logging
-import multiprocessing
 import shutil
 import subprocess
 import tempfile
 import time
+from collections.abc import Iterator
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+from osgeo import gdal
 
 from ..setup.collection_data import CollectionData
-from .extent_library import get_all_tif_paths
+from ..setup.database import Database
+from .library_scan import LibraryScan, scan_library
+from .raster_pool import RasterTask, RasterWorkerPool
+from .step_metrics import record_step
+
+if TYPE_CHECKING:
+    # Loaded by the stage only, shapely is not needed in the raster workers importing this module
+    from .bridge_tile_index import BridgeTileIndex
+
+gdal.UseExceptions()
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +49,18 @@ def run_cmd(cmd: list, description: str) -> subprocess.CompletedProcess:
     return result
 
 
+def masked_grid_entry(depth_path: Path, library_dir: Path) -> tuple[str, int, int]:
+    """(path relative to the library, size, mtime_ns) of a depth grid, as recorded in bridge_masked_grids."""
+    st = depth_path.stat()
+    return depth_path.relative_to(library_dir).as_posix(), st.st_size, st.st_mtime_ns
+
+
+def is_masked(depth_path: Path, library_dir: Path, masked: dict[str, tuple[int, int]]) -> bool:
+    """Whether a depth grid was bridge masked and not rewritten since, masked as from get_bridge_masked_grids."""
+    grid, size, mtime_ns = masked_grid_entry(depth_path, library_dir)
+    return masked.get(grid) == (size, mtime_ns)
+
+
 def get_raster_info(
     tif_path: Path,
 ) -> tuple[tuple[float, float, float, float], tuple[float, float], float]:
@@ -89,12 +120,130 @@ def align_raster(
     run_cmd(cmd, f"gdalwarp align {src_path}")
 
 
-def apply_bridge_mask(args: tuple) -> tuple[str, bool]:
+def build_aligned_rasters(
+    reach_id: str,
+    dem_path: Path,
+    bridge_paths: list[str],
+    bounds: tuple[float, float, float, float],
+    res: tuple[float, float],
+    nodata: float,
+    temp_parent: Path,
+) -> tuple[Path, Path, Path]:
+    """
+    Mosaic the reach's bridge tiles and align them and the reach DEM to the depth grid, as VRTs.
+
+    The VRTs are written to a new temp dir under temp_parent, the caller removes it when done.
+
+    Returns:
+        Tuple of (temp_dir, aligned_dem, aligned_bridges)
+    """
+    reach_temp_dir = Path(tempfile.mkdtemp(dir=str(temp_parent), prefix=f"{reach_id}_"))
+
+    bridges_vrt = reach_temp_dir / "bridges.vrt"
+    run_cmd(
+        ["gdalbuildvrt", bridges_vrt] + bridge_paths,
+        "gdalbuildvrt",
+    )
+
+    # Depth rasters are in EPSG:5070, reproject DEM and bridges to match
+    target_crs = "EPSG:5070"
+
+    aligned_dem = reach_temp_dir / "aligned_dem.vrt"
+    align_raster(
+        dem_path,
+        aligned_dem,
+        bounds,
+        res,
+        nodata=nodata,
+        target_crs=target_crs,
+    )
+
+    aligned_bridges = reach_temp_dir / "aligned_bridges.vrt"
+    align_raster(
+        bridges_vrt,
+        aligned_bridges,
+        bounds,
+        res,
+        nodata=nodata,
+        target_crs=target_crs,
+        resampling="near",
+    )
+    return reach_temp_dir, aligned_dem, aligned_bridges
+
+
+def get_bridge_footprint(
+    aligned_bridges: Path,
+) -> tuple[tuple[int, int, int, int], str, tuple[int, int]] | None:
+    """
+    Get the pixel window of the reach grid covered by bridges, computed once per reach.
+
+    The mask is saved next to the aligned bridges VRT, in the reach temp dir, so the per-TIF tasks carry its
+    path rather than each pickling the array.
+
+    Args:
+        aligned_bridges: Bridge elevation VRT aligned to the reach depth grid
+
+    Returns:
+        (window, mask_path, grid_size) where window is (xoff, yoff, xsize, ysize), mask_path is the .npy of a
+        boolean array of the window marking bridge pixels and grid_size is the (width, height) of the reach grid.
+        None if no bridge pixel falls on the grid.
+    """
+    ds = gdal.Open(str(aligned_bridges))
+    bridges = ds.GetRasterBand(1).ReadAsArray()
+    grid_size = (ds.RasterXSize, ds.RasterYSize)
+    ds = None
+
+    # Same "no bridge" test as the masking expression in apply_bridge_mask
+    is_bridge = ~((bridges == -9999) | np.isnan(bridges))
+    rows = np.flatnonzero(is_bridge.any(axis=1))
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero(is_bridge.any(axis=0))
+
+    yoff, xoff = int(rows[0]), int(cols[0])
+    ysize, xsize = int(rows[-1]) - yoff + 1, int(cols[-1]) - xoff + 1
+    mask_path = Path(aligned_bridges).with_name("bridge_mask.npy")
+    np.save(mask_path, is_bridge[yoff : yoff + ysize, xoff : xoff + xsize])
+    return (xoff, yoff, xsize, ysize), str(mask_path), grid_size
+
+
+def tif_touches_bridges(
+    depth_path: Path,
+    footprint: tuple[tuple[int, int, int, int], str, tuple[int, int]],
+) -> bool:
+    """
+    Check if any wet (non-nodata) depth pixel falls under a bridge, reading only the bridge window.
+
+    Only wet pixels under a bridge are changed by the masking, so a TIF without any can be left untouched.
+    A TIF that is not on the reach grid is reported as touching, so it is processed as before.
+    """
+    (xoff, yoff, xsize, ysize), mask_path, grid_size = footprint
+    ds = gdal.Open(str(depth_path))
+    if (ds.RasterXSize, ds.RasterYSize) != grid_size:
+        ds = None
+        logger.debug(f"{depth_path} is not on the reach grid, bridge window check skipped")
+        return True
+    band = ds.GetRasterBand(1)
+    nodata = band.GetNoDataValue()
+    depth = band.ReadAsArray(xoff, yoff, xsize, ysize)
+    ds = None
+
+    wet = ~np.isnan(depth)
+    if nodata is not None:
+        wet &= depth != nodata
+    return bool(np.any(wet & np.load(mask_path)))
+
+
+def apply_bridge_mask(args: tuple) -> tuple[str, bool, bool]:
     """
     Process a single depth TIF with bridge masking (worker function for multiprocessing).
 
     Expects pre-aligned DEM and bridge VRTs. Runs gdal_calc for the masking computation
-    and overwrites the original file on success.
+    and overwrites the original file on success. When a bridge footprint is given, TIFs with no
+    wet pixel under a bridge are skipped and keep their bytes.
+
+    Returns:
+        Tuple of (depth_path, success, modified)
     """
     (
         depth_path,
@@ -104,11 +253,16 @@ def apply_bridge_mask(args: tuple) -> tuple[str, bool]:
         conv_factor,
         depth_nodata,
         reach_id,
+        footprint,
     ) = args
-    logger.debug(f"Processing {depth_path} with bridge mask")
     depth_path = Path(depth_path)
 
     try:
+        if footprint is not None and not tif_touches_bridges(depth_path, footprint):
+            logger.debug(f"No wet pixels under bridges in {depth_path}, skipped")
+            return (str(depth_path), True, False)
+
+        logger.debug(f"Processing {depth_path} with bridge mask")
         with tempfile.TemporaryDirectory(dir=library_parent, prefix=f"{reach_id}_") as temp_dir:
             temp_dir = Path(temp_dir)
 
@@ -160,118 +314,96 @@ def apply_bridge_mask(args: tuple) -> tuple[str, bool]:
             logger.debug(f"Finished processing {depth_path}, moving result to original location")
             shutil.move(str(cog_output), str(depth_path))
             logger.debug(f"Successfully processed {depth_path}")
-        return (str(depth_path), True)
+        return (str(depth_path), True, True)
 
     except Exception as e:
         logger.exception(f"Error processing {depth_path}: {e}")
-        return (str(depth_path), False)
-
-
-def process_bridges(collection: "CollectionData") -> dict[str, any]:
+        return (str(depth_path), False, False)
+
+
+def _bridge_reach_tasks(
+    library_scan: LibraryScan,
+    submodels_dir: Path,
+    library_dir: Path,
+    bridge_index: "BridgeTileIndex",
+    conv_factor: float,
+    skip_dry_tifs: bool,
+    masked: dict[str, tuple[int, int]],
+    results: dict[str, list],
+    reach_temp_dirs: dict[str, tuple[Path, int]],
+) -> Iterator[RasterTask]:
     """
-    Apply bridge masking to depth library TIFs in place.
-    """
-    library_dir = Path(collection.library_dir)
-    submodels_dir = Path(collection.submodels_dir)
-    bridge_index_path = collection.bridge_tile_index_path
-    conv_factor = collection.config["bridge_processing"]["BRIDGE_ELEV_CONV_FACTOR"]
-
-    reach_dirs = [d for d in library_dir.iterdir() if d.is_dir()]
-    logger.info(f"Found {len(reach_dirs)} reaches to process")
-    logger.info(f"Bridge index: {bridge_index_path}")
-
-    t_total = time.perf_counter()
-    reaches_with_bridges, reaches_without_bridges, files_modified = [], [], []
+    Prepare reaches one at a time and yield a bridge masking task per depth TIF not masked yet.
 
-    for reach_dir in reach_dirs:
-        reach_id = reach_dir.name
+    Runs in the pool's feeder thread, so the next reach is prepared while workers are busy with the
+    previous one. Each reach's aligned VRTs live in a temp dir registered in reach_temp_dirs with its
+    task count, the consumer removes it once the last task of the reach is done.
+    """
+    for reach_id in library_scan.reach_ids:
         logger.debug(f"Processing reach {reach_id}")
 
-        # Use generator to stop at first match. Faster than getting all reach tifs
-        sample_reach_tif = next(iter(reach_dir.rglob("*.tif")), None)
-        if sample_reach_tif is None:
+        reach_tifs = library_scan.reach_paths(reach_id)
+        if not reach_tifs:
             logger.warning(f"Reach {reach_id}: no TIF files found, skipping")
             continue
+        if masked:
+            # Masking is not idempotent, grids masked by an earlier run are left alone
+            pending, done = [], []
+            for p in reach_tifs:
+                (done if is_masked(p, library_dir, masked) else pending).append(p)
+            results["already_masked"].extend(str(p) for p in done)
+            reach_tifs = pending
+            if not reach_tifs:
+                logger.info(f"Reach {reach_id}: all TIFs already masked, skipped")
+                continue
         dem_path = submodels_dir / reach_id / "Terrain" / f"{reach_id}.seamless_3dep_dem_3m_5070.tif"
         if not dem_path.exists():
             raise FileNotFoundError(f"No DEM found for reach {reach_id}: {dem_path}")
 
         # The bridge query requires that all bridge tiles be in epsg 5070
         try:
-            bounds, depth_res, depth_nodata = get_raster_info(sample_reach_tif)
+            bounds, depth_res, depth_nodata = get_raster_info(reach_tifs[0])
             xmin, ymin, xmax, ymax = bounds
             t_query = time.perf_counter()
-            result = run_cmd(
-                [
-                    "ogr2ogr",
-                    "-f",
-                    "CSV",
-                    "-spat",
-                    xmin,
-                    ymin,
-                    xmax,
-                    ymax,
-                    "-select",
-                    "location",
-                    "/vsistdout/",
-                    bridge_index_path,
-                ],
-                "ogr2ogr bridge query",
-            )
+            intersecting_bridge_paths = bridge_index.query(xmin, ymin, xmax, ymax)
             dt_query = time.perf_counter() - t_query
-            lines = result.stdout.strip().split("\n")
-            intersecting_bridge_paths = lines[1:] if len(lines) > 1 else []
-            logger.debug(f"Reach {reach_id}: {len(intersecting_bridge_paths)} bridges (query: {dt_query:.3f}s)")
+            logger.debug(f"Reach {reach_id}: {len(intersecting_bridge_paths)} bridges (query: {dt_query * 1e6:.0f}us)")
         except Exception as e:
             logger.exception(f"Error querying bridges for reach {reach_id}: {e}")
             continue
 
         if not intersecting_bridge_paths:
             # No bridges in this reach - nothing to do
-            reaches_without_bridges.append(reach_id)
+            results["reaches_without_bridges"].append(reach_id)
             logger.info(f"Reach {reach_id}: no bridges, skipped")
             continue
 
-        reaches_with_bridges.append(reach_id)
-
-        # Only enumerate all TIFs for processing if there are bridges that intersect reach bounds
-        reach_tifs = get_all_tif_paths(reach_dir)
+        results["reaches_with_bridges"].append(reach_id)
         logger.debug(f"Reach {reach_id}: found {len(reach_tifs)} TIFs to process")
 
-        with tempfile.TemporaryDirectory(dir=str(library_dir.parent), prefix=f"{reach_id}_") as reach_temp_dir:
-            reach_temp_dir = Path(reach_temp_dir)
-
-            bridges_vrt = reach_temp_dir / "bridges.vrt"
-            run_cmd(
-                ["gdalbuildvrt", bridges_vrt] + intersecting_bridge_paths,
-                "gdalbuildvrt",
-            )
-
-            # Depth rasters are in EPSG:5070, reproject DEM and bridges to match
-            target_crs = "EPSG:5070"
-
-            aligned_dem = reach_temp_dir / "aligned_dem.vrt"
-            align_raster(
-                dem_path,
-                aligned_dem,
-                bounds,
-                depth_res,
-                nodata=depth_nodata,
-                target_crs=target_crs,
-            )
-
-            aligned_bridges = reach_temp_dir / "aligned_bridges.vrt"
-            align_raster(
-                bridges_vrt,
-                aligned_bridges,
-                bounds,
-                depth_res,
-                nodata=depth_nodata,
-                target_crs=target_crs,
-                resampling="near",
-            )
-
-            worker_args = [
+        reach_temp_dir, aligned_dem, aligned_bridges = build_aligned_rasters(
+            reach_id, dem_path, intersecting_bridge_paths, bounds, depth_res, depth_nodata, library_dir.parent
+        )
+
+        footprint = None
+        if skip_dry_tifs:
+            footprint = get_bridge_footprint(aligned_bridges)
+            if footprint is None:
+                # Bridge tiles intersect the reach bbox but hold no bridge pixel on the grid
+                results["skipped"].extend(str(p) for p in reach_tifs)
+                logger.info(f"Reach {reach_id}: no bridge pixels on the depth grid, skipped")
+                shutil.rmtree(reach_temp_dir, ignore_errors=True)
+                continue
+            (_, _, xsize, ysize), _, (width, height) = footprint
+            logger.debug(f"Reach {reach_id}: bridge window {xsize}x{ysize} of {width}x{height} grid")
+
+        # Registered before the first task is yielded, so the consumer always finds it
+        reach_temp_dirs[reach_id] = (reach_temp_dir, len(reach_tifs))
+        logger.info(f"Reach {reach_id}: queued {len(reach_tifs)} TIFs with {len(intersecting_bridge_paths)} bridges")
+
+        for depth_path in reach_tifs:
+            yield (
+                apply_bridge_mask,
                 (
                     str(depth_path),
                     str(aligned_dem),
@@ -280,31 +412,111 @@ def process_bridges(collection: "CollectionData") -> dict[str, any]:
                     conv_factor,
                     depth_nodata,
                     reach_id,
-                )
-                for depth_path in reach_tifs
-            ]
-
-            # based on the cpu utilization, the num_workers maybe increased by x1.5, or x2 or even x3.
-            num_workers = collection.config["execution"]["OPTIMUM_PARALLEL_PROCESS_COUNT"] * 2
-            with multiprocessing.Pool(processes=num_workers) as pool:
-                for depth_path, success in pool.imap_unordered(apply_bridge_mask, worker_args):
-                    if success:
-                        files_modified.append(depth_path)
-                    else:
-                        logger.error(f"Failed to process {depth_path}")
-
-            logger.info(
-                f"Reach {reach_id}: processed {len(reach_tifs)} TIFs with {len(intersecting_bridge_paths)} bridges"
+                    footprint,
+                ),
+                reach_id,
             )
 
-    dt_total = time.perf_counter() - t_total
-    logger.info(
-        f"Bridge processing complete: {len(reaches_with_bridges)} with bridges, "
-        f"{len(reaches_without_bridges)} without, total: {dt_total:.1f}s"
-    )
 
-    return {
-        "reaches_with_bridges": reaches_with_bridges,
-        "reaches_without_bridges": reaches_without_bridges,
-        "modified": files_modified,
-    }
+def process_bridges(
+    collection: "CollectionData",
+    bridge_index: "BridgeTileIndex | None" = None,
+    pool: RasterWorkerPool | None = None,
+    library_scan: LibraryScan | None = None,
+) -> dict[str, any]:
+    """
+    Apply bridge masking to depth library TIFs in place.
+
+    Args:
+        collection: CollectionData object with configuration
+        bridge_index: Preloaded bridge tile index. Loaded from BRIDGE_TILE_INDEX_PATH when not provided,
+            pass one in to reuse it across collections.
+        pool: Shared raster worker pool. A pool is started for this call when not provided.
+        library_scan: Library enumeration shared with the other raster stages. Scanned when not provided.
+
+    Depth TIFs recorded in bridge_masked_grids and unchanged since are not processed again.
+    """
+    database = Database(collection)
+    with record_step(database, "process_bridges") as span:
+        library_dir = Path(collection.library_dir)
+        submodels_dir = Path(collection.submodels_dir)
+        bridge_index_path = collection.bridge_tile_index_path
+        conv_factor = collection.config["bridge_processing"]["BRIDGE_ELEV_CONV_FACTOR"]
+        skip_dry_tifs = collection.config["bridge_processing"].get("SKIP_DRY_TIFS", False)
+
+        if library_scan is None:
+            library_scan = scan_library(library_dir)
+        logger.info(f"Found {len(library_scan.reach_ids)} reaches to process")
+        logger.info(f"Bridge index: {bridge_index_path}")
+
+        t_total = time.perf_counter()
+        # Load the tile index once, reach queries are then answered in memory
+        if bridge_index is None:
+            from .bridge_tile_index import BridgeTileIndex
+
+            bridge_index = BridgeTileIndex.from_file(bridge_index_path)
+
+        masked = database.get_bridge_masked_grids()
+        results = {
+            "reaches_with_bridges": [],
+            "reaches_without_bridges": [],
+            "modified": [],
+            "skipped": [],
+            "already_masked": [],
+        }
+        reach_temp_dirs = {}
+        failed = 0
+        tasks = _bridge_reach_tasks(
+            library_scan,
+            submodels_dir,
+            library_dir,
+            bridge_index,
+            conv_factor,
+            skip_dry_tifs,
+            masked,
+            results,
+            reach_temp_dirs,
+        )
+
+        own_pool = pool is None
+        if own_pool:
+            pool = RasterWorkerPool.from_config(collection.config)
+            pool.start()
+        try:
+            for reach_id, (depth_path, success, modified) in pool.run(tasks):
+                if not success:
+                    failed += 1
+                    logger.error(f"Failed to process {depth_path}")
+                else:
+                    results["modified" if modified else "skipped"].append(depth_path)
+                    # Stat after masking, a grid rewritten later (e.g. by create_fim_lib) no longer matches.
+                    # Recorded right away, as a grid masked but not recorded would be masked again on resume
+                    database.insert_bridge_masked_grids([(*masked_grid_entry(Path(depth_path), library_dir), modified)])
+
+                reach_temp_dir, remaining = reach_temp_dirs[reach_id]
+                if remaining > 1:
+                    reach_temp_dirs[reach_id] = (reach_temp_dir, remaining - 1)
+                else:
+                    del reach_temp_dirs[reach_id]
+                    shutil.rmtree(reach_temp_dir, ignore_errors=True)
+                    logger.debug(f"Reach {reach_id}: bridge masking done")
+        finally:
+            if own_pool:
+                pool.close()
+            for reach_temp_dir, _ in reach_temp_dirs.values():
+                shutil.rmtree(reach_temp_dir, ignore_errors=True)
+
+        dt_total = time.perf_counter() - t_total
+        logger.info(
+            f"Bridge processing complete: {len(results['reaches_with_bridges'])} with bridges, "
+            f"{len(results['reaches_without_bridges'])} without, {len(results['modified'])} TIFs modified, "
+            f"{len(results['skipped'])} TIFs without wet pixels under bridges skipped, "
+            f"{len(results['already_masked'])} TIFs already masked, total: {dt_total:.1f}s"
+        )
+        span.counts = {
+            "succeeded": len(results["modified"]) + len(results["skipped"]),
+            "failed": failed,
+            "skipped": len(results["already_masked"]),
+        }
+
+    return results
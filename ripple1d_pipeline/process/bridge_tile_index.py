@@ -0,0 +1,91 @@
+"""
+In-memory spatial index over the bridge tile index (BRIDGE_TILE_INDEX_PATH).
+
+The tile index is read once and its tile bounds are held in a shapely STRtree, so a reach
+bbox query is answered in memory instead of launching an ogr2ogr process per reach.
+"""
+
+import logging
+import time
+from pathlib import Path
+
+import numpy as np
+import shapely
+from osgeo import ogr
+
+ogr.UseExceptions()
+
+logger = logging.getLogger(__name__)
+
+
+class BridgeTileIndex:
+    """
+    Bounds and locations of bridge tiles, queryable by bounding box.
+
+    The bridge tiles are expected to be in EPSG:5070, same as the depth grids being queried.
+    """
+
+    def __init__(self, bounds: np.ndarray, locations: list[str]):
+        """
+        Args:
+            bounds: Array of shape (n, 4) holding (xmin, ymin, xmax, ymax) per tile
+            locations: Tile raster paths, in the same order as bounds
+        """
+        self.bounds = np.asarray(bounds, dtype="float64").reshape(-1, 4)
+        self.locations = list(locations)
+        if len(self.locations) != len(self.bounds):
+            raise ValueError(f"{len(self.bounds)} tile bounds but {len(self.locations)} tile locations")
+        self.tree = shapely.STRtree(shapely.box(*self.bounds.T))
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    @classmethod
+    def from_file(cls, index_path: str | Path, location_field: str = "location") -> "BridgeTileIndex":
+        """
+        Read a tile index (GeoPackage, GeoParquet or any OGR source, including /vsis3/ paths) into memory.
+
+        Args:
+            index_path: Path of the tile index dataset
+            location_field: Attribute holding the path of each tile raster
+
+        Returns:
+            BridgeTileIndex holding the envelope and location of every tile
+        """
+        t_start = time.perf_counter()
+        ds = ogr.Open(str(index_path))
+        layer = ds.GetLayer(0)
+        # Only the location attribute is needed, skip reading everything else
+        layer_defn = layer.GetLayerDefn()
+        layer.SetIgnoredFields(
+            [
+                layer_defn.GetFieldDefn(i).GetName()
+                for i in range(layer_defn.GetFieldCount())
+                if layer_defn.GetFieldDefn(i).GetName() != location_field
+            ]
+        )
+
+        bounds, locations = [], []
+        for feature in layer:
+            geom = feature.GetGeometryRef()
+            if geom is None:
+                continue
+            # OGR envelope order is (minx, maxx, miny, maxy)
+            minx, maxx, miny, maxy = geom.GetEnvelope()
+            bounds.append((minx, miny, maxx, maxy))
+            locations.append(feature.GetField(location_field))
+        ds = None
+
+        index = cls(np.array(bounds, dtype="float64").reshape(-1, 4), locations)
+        logger.info(f"Loaded {len(index)} bridge tiles from {index_path} in {time.perf_counter() - t_start:.1f}s")
+        return index
+
+    def query(self, xmin: float, ymin: float, xmax: float, ymax: float) -> list[str]:
+        """
+        Get locations of all tiles intersecting the bounding box.
+
+        Locations are returned in tile index order, same as an ogr2ogr -spat query, so mosaics built
+        from them resolve overlaps the same way.
+        """
+        hits = self.tree.query(shapely.box(xmin, ymin, xmax, ymax), predicate="intersects")
+        return [self.locations[i] for i in np.sort(hits)]
@@ -1,11 +1,8 @@
 import logging
-from time import sleep
-
-import requests
 
 from ..setup.collection_data import CollectionData
 from .base_model_step_processor import BaseModelStepProcessor
-from .job_client import JobRecord
+from .job_client import JobClient, JobRecord
 from .model import Model
 
 logger = logging.getLogger(__name__)
@@ -18,24 +15,20 @@ class ConflateModelStepProcessor(BaseModelStepProcessor):
         super().__init__(collection, models)
         self.process_name = "conflate_model"
 
-    def _execute_requests(self):
+    def _execute_requests(self, job_client: JobClient):
         """Model-specific request execution"""
 
         for model in self.models:
-            job_record = self._execute_single_request(model)
+            job_record = self._execute_single_request(job_client, model)
             self._categorize_job_record(job_record)
 
-    def _execute_single_request(self, model: Model) -> JobRecord:
+    def _execute_single_request(self, job_client: JobClient, model: Model) -> JobRecord:
         """Single request implementation with retries"""
-        url = f"{self.collection.RIPPLE1D_API_URL}/processes/{self.collection.config['processing_steps'][self.process_name]['api_process_name']}/execution"
+        api_process_name = self.collection.config["processing_steps"][self.process_name]["api_process_name"]
         template = self.collection.config["processing_steps"][self.process_name]["payload_template"]
         payload = self._format_model_payload(template, model.id, model.name)
 
-        for attempt in range(5):
-            response = requests.post(url, json=payload)
-            if response.status_code == 201:
-                return JobRecord(model, response.json()["jobID"], "accepted")
-            logger.debug(f"Attempt {attempt + 1} failed for model {model.id}: {response.text}")
-            sleep(attempt * self.collection.config["polling"]["API_LAUNCH_JOBS_RETRY_WAIT"])
-
+        job_id = job_client.submit_job(api_process_name, payload, model.id)
+        if job_id:
+            return JobRecord(model, job_id, "accepted", job_client.endpoint_for(job_id))
         return JobRecord(model, "", "not_accepted")
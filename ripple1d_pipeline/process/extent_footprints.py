@@ -0,0 +1,209 @@
+"""
+Footprint index of the extent library: the wet area of extent grids as polygons, in one GeoPackage.
+
+Each extent grid (or only the largest flow grid of each reach) is polygonized in the raster workers,
+and the polygons are written to library_extent_footprints.gpkg with reach_id, stage, flow and the
+path of the grid relative to the extent library. GeoPackage layers carry an R-tree spatial index,
+so questions like "which reach/flow grids cover this point" are answered with an index query
+instead of opening rasters.
+
+Extent library layout: library_extent/<reach_id>/z_<stage>/f_<flow>.tif, stage is "nd" (normal depth)
+or a downstream stage like "12_5" (12.5).
+"""
+
+import logging
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+from osgeo import gdal, ogr, osr
+
+from ..setup.collection_data import CollectionData
+from .library_scan import scan_library
+from .raster_pool import RasterWorkerPool
+
+gdal.UseExceptions()
+ogr.UseExceptions()
+
+logger = logging.getLogger(__name__)
+
+FOOTPRINT_MODES = ("all", "max_flow")
+FOOTPRINT_LAYER = "footprints"
+# Features are written in transactions of this size, GeoPackage inserts are slow one by one
+FOOTPRINT_COMMIT_BATCH = 1000
+
+
+def parse_grid_path(relative_path: str) -> tuple[str, int] | None:
+    """
+    Get the stage and flow of an extent grid from its path relative to the reach folder.
+
+    Args:
+        relative_path: Path like "z_12_5/f_1200.tif"
+
+    Returns:
+        Tuple of (stage, flow), e.g. ("12.5", 1200) or ("nd", 1200). None if the path is not a flow grid.
+    """
+    parts = relative_path.split("/")
+    if len(parts) != 2 or not parts[0].startswith("z_") or not parts[1].startswith("f_"):
+        return None
+    try:
+        flow = int(Path(parts[1]).stem[2:])
+    except ValueError:
+        return None
+    return parts[0][2:].replace("_", "."), flow
+
+
+def _stage_sort_key(stage: str) -> float:
+    """Sort normal depth first, then downstream stages by value."""
+    try:
+        return float(stage)
+    except ValueError:
+        return float("-inf")
+
+
+def select_footprint_grids(reach_tifs: dict[str, list[str]], mode: str) -> list[tuple[str, str, int, str]]:
+    """
+    Select the extent grids to polygonize.
+
+    Args:
+        reach_tifs: Dictionary mapping reach ID to TIF paths relative to the reach folder
+        mode: "all" for every grid, "max_flow" for the grid of the largest flow of each reach
+            (highest stage for that flow), i.e. its largest extent
+
+    Returns:
+        List of (reach_id, stage, flow, path relative to the extent library)
+    """
+    grids = []
+    for reach_id, tifs in reach_tifs.items():
+        reach_grids = []
+        for relative_path in tifs:
+            parsed = parse_grid_path(relative_path)
+            if parsed is not None:
+                reach_grids.append((reach_id, parsed[0], parsed[1], f"{reach_id}/{relative_path}"))
+        if mode == "max_flow" and reach_grids:
+            reach_grids = [max(reach_grids, key=lambda g: (g[2], _stage_sort_key(g[1])))]
+        grids.extend(reach_grids)
+    return grids
+
+
+def footprint_worker(args: tuple) -> tuple[tuple, bytes | None, str | None]:
+    """
+    Worker function to polygonize the wet pixels (value 1) of one extent grid.
+
+    Args:
+        args: Tuple containing (grid, library_extent_dir), grid as returned by select_footprint_grids
+
+    Returns:
+        Tuple of (grid, footprint multipolygon as WKB or None when dry or failed, projection WKT)
+    """
+    grid, library_extent_dir = args
+    try:
+        ds = gdal.Open(str(Path(library_extent_dir) / grid[3]))
+        wet = ds.GetRasterBand(1).ReadAsArray() == 1
+        projection = ds.GetProjection()
+        if not np.any(wet):
+            return grid, None, projection
+
+        mask_ds = gdal.GetDriverByName("MEM").Create("", ds.RasterXSize, ds.RasterYSize, 1, gdal.GDT_Byte)
+        mask_ds.SetGeoTransform(ds.GetGeoTransform())
+        mask_band = mask_ds.GetRasterBand(1)
+        mask_band.WriteArray(wet.astype("uint8"))
+        ds = None
+
+        # Polygonize only the wet pixels, using the mask band as its own mask
+        vector_ds = ogr.GetDriverByName("Memory").CreateDataSource("")
+        layer = vector_ds.CreateLayer("wet", geom_type=ogr.wkbPolygon)
+        gdal.Polygonize(mask_band, mask_band, layer, -1)
+
+        footprint = ogr.Geometry(ogr.wkbMultiPolygon)
+        for feature in layer:
+            footprint.AddGeometry(feature.GetGeometryRef())
+        footprint = footprint.UnionCascaded()
+        return grid, bytes(ogr.ForceToMultiPolygon(footprint).ExportToWkb()), projection
+
+    except Exception as e:
+        logger.exception(f"Error polygonizing {grid[3]}: {e}")
+        return grid, None, None
+
+
+def create_footprint_index(
+    collection: type[CollectionData],
+    mode: str = "max_flow",
+    pool: RasterWorkerPool | None = None,
+) -> int:
+    """
+    Polygonize extent grids and write them to the footprint index, replacing any previous index.
+
+    Args:
+        collection: CollectionData object with configuration
+        mode: One of FOOTPRINT_MODES, see select_footprint_grids
+        pool: Shared raster worker pool. A pool is started for this call when not provided.
+
+    Returns:
+        Number of footprints written
+    """
+    if mode not in FOOTPRINT_MODES:
+        raise ValueError(f"Footprint mode {mode!r} is not one of {FOOTPRINT_MODES}")
+
+    t_start = time.perf_counter()
+    library_extent_dir = Path(collection.extent_library_dir)
+    index_path = collection.extent_footprints_path
+    grids = select_footprint_grids(scan_library(library_extent_dir).reach_tifs, mode)
+    logger.info(f"Polygonizing {len(grids)} extent grids ({mode})")
+
+    driver = ogr.GetDriverByName("GPKG")
+    if os.path.exists(index_path):
+        driver.DeleteDataSource(index_path)
+    out_ds = driver.CreateDataSource(index_path)
+    out_layer = None
+    written, dry, failed = 0, 0, 0
+
+    own_pool = pool is None
+    if own_pool:
+        pool = RasterWorkerPool.from_config(collection.config)
+        pool.start()
+    try:
+        tasks = ((footprint_worker, (grid, library_extent_dir), None) for grid in grids)
+        for _, (grid, wkb, projection) in pool.run(tasks):
+            if wkb is None:
+                if projection is None:
+                    failed += 1
+                else:
+                    dry += 1
+                continue
+
+            if out_layer is None:
+                # Layer is created from the first footprint, all grids of a collection share one CRS
+                srs = osr.SpatialReference()
+                srs.ImportFromWkt(projection)
+                out_layer = out_ds.CreateLayer(FOOTPRINT_LAYER, srs=srs, geom_type=ogr.wkbMultiPolygon)
+                out_layer.CreateField(ogr.FieldDefn("reach_id", ogr.OFTString))
+                out_layer.CreateField(ogr.FieldDefn("stage", ogr.OFTString))
+                out_layer.CreateField(ogr.FieldDefn("flow", ogr.OFTInteger64))
+                out_layer.CreateField(ogr.FieldDefn("path", ogr.OFTString))
+                out_layer.StartTransaction()
+
+            feature = ogr.Feature(out_layer.GetLayerDefn())
+            feature.SetField("reach_id", grid[0])
+            feature.SetField("stage", grid[1])
+            feature.SetField("flow", grid[2])
+            feature.SetField("path", grid[3])
+            feature.SetGeometry(ogr.CreateGeometryFromWkb(wkb))
+            out_layer.CreateFeature(feature)
+            written += 1
+            if written % FOOTPRINT_COMMIT_BATCH == 0:
+                out_layer.CommitTransaction()
+                out_layer.StartTransaction()
+    finally:
+        if own_pool:
+            pool.close()
+        if out_layer is not None:
+            out_layer.CommitTransaction()
+        out_ds = None
+
+    logger.info(
+        f"Footprint index {index_path}: {written} footprints, {dry} dry grids, {failed} failed, "
+        f"{time.perf_counter() - t_start:.1f}s"
+    )
+    return written
@@ -2,22 +2,41 @@
 Create Extent library from Depth library using GDAL operations.
 After profiling, it is found that the optimum parallel process count is same number as CPU cores.
 This script is compute intensive and not memory intensive.
+
+Extent and domain TIFs are created either in-process (engine "native", numpy / in-memory rasterize and a single
+COG write per file), or with the gdal_calc, gdal_rasterize and gdal_translate command-line tools (engine "gdal_cli").
+See benchmarks/extent_library.py.
 """
 
 import logging
-import multiprocessing
 import os
 import subprocess
 import sys
 import tempfile
 from pathlib import Path
 
+import numpy as np
+from osgeo import gdal, gdal_array
+
 from ..setup.collection_data import CollectionData
+from ..setup.database import Database
+from .extent_manifest import ExtentManifest, file_hash, plan_extent_updates, remove_orphans
+from .library_scan import LibraryScan, scan_library
+from .raster_pool import RasterTask, RasterWorkerPool
+from .step_metrics import record_step
+
+gdal.UseExceptions()
 
 logger = logging.getLogger(__name__)
 
+EXTENT_ENGINES = ("native", "gdal_cli")
+# gdal_calc default nodata for Byte outputs, kept so both engines produce the same extent values
+EXTENT_NODATA = 255
+# Manifest entries are committed in batches, so an interrupted run keeps most of its progress
+MANIFEST_COMMIT_BATCH = 500
 
-def create_extent_tif(tif_path: Path, tmp_dir: Path, dest_dir: Path) -> None:
+
+def create_extent_tif(tif_path: Path, tmp_dir: Path, dest_dir: Path, overwrite: bool = False) -> None:
     """
     Create extent TIFF from depth TIFF using GDAL operations.
 
@@ -25,11 +44,12 @@ def create_extent_tif(tif_path: Path, tmp_dir: Path, dest_dir: Path) -> None:
         tif_path: Path to input TIFF file
         tmp_dir: Temporary directory for processing
         dest_dir: Destination directory for output file
+        overwrite: Recreate the output even if it exists, e.g. when the depth TIFF changed
     """
     tmp_tif = tmp_dir / f"tmp_{tif_path.stem}.tif"
     dest_tif = dest_dir / f"{tif_path.stem}.tif"
 
-    if dest_tif.exists():
+    if not overwrite and dest_tif.exists():
         logger.debug(f"Destination file {dest_tif} exists. Skipping processing.")
         return
 
@@ -76,6 +96,97 @@ def create_extent_tif(tif_path: Path, tmp_dir: Path, dest_dir: Path) -> None:
         raise RuntimeError(f"gdal_translate failed for {tif_path}")
 
 
+def depth_to_extent(depth: np.ndarray, nodata: float | None) -> np.ndarray:
+    """Threshold a depth array into extent values: 1 where depth > 0, 0 where depth <= 0, EXTENT_NODATA on nodata."""
+    extent = (depth > 0).astype(np.uint8)
+    is_nodata = np.isnan(depth)
+    if nodata is not None:
+        is_nodata |= depth == nodata
+    extent[is_nodata] = EXTENT_NODATA
+    return extent
+
+
+def write_dataset_cog(dest_tif: Path, ds: gdal.Dataset, options: list[str] | None = None) -> None:
+    """
+    Write a dataset (usually in-memory) as a COG. Removes a partially written dest_tif on failure.
+    """
+    try:
+        gdal.GetDriverByName("COG").CreateCopy(str(dest_tif), ds, options=options or [])
+    except Exception as e:
+        if os.path.exists(dest_tif):  # clean up
+            os.remove(dest_tif)
+        raise RuntimeError(f"COG write failed for {dest_tif}") from e
+
+
+def write_array_cog(
+    dest_tif: Path,
+    array: np.ndarray,
+    geotransform: tuple,
+    projection: str,
+    nodata: float | None,
+    options: list[str] | None = None,
+) -> None:
+    """
+    Write a single band array as a COG through an in-memory dataset, without intermediate files.
+
+    Removes a partially written dest_tif on failure.
+    """
+    mem_ds = gdal_array.OpenArray(array)
+    mem_ds.SetGeoTransform(geotransform)
+    mem_ds.SetProjection(projection)
+    if nodata is not None:
+        mem_ds.GetRasterBand(1).SetNoDataValue(nodata)
+    try:
+        write_dataset_cog(dest_tif, mem_ds, options)
+    finally:
+        mem_ds = None
+
+
+def create_extent_tif_native(tif_path: Path, dest_dir: Path, overwrite: bool = False) -> None:
+    """
+    Create extent TIFF from depth TIFF in-process, without intermediate files.
+
+    The depth raster is read block by block and thresholded into an in-memory Byte raster, which is
+    written once as a COG, so a worker never holds the full float depth grid. Values match the gdal_calc
+    path: 1 where depth > 0, 0 where depth <= 0, and EXTENT_NODATA where depth is nodata.
+
+    Args:
+        tif_path: Path to input TIFF file
+        dest_dir: Destination directory for output file
+        overwrite: Recreate the output even if it exists, e.g. when the depth TIFF changed
+    """
+    dest_tif = dest_dir / f"{tif_path.stem}.tif"
+
+    if not overwrite and dest_tif.exists():
+        logger.debug(f"Destination file {dest_tif} exists. Skipping processing.")
+        return
+
+    src_ds = gdal.Open(str(tif_path))
+    src_band = src_ds.GetRasterBand(1)
+    src_nodata = src_band.GetNoDataValue()
+    width, height = src_ds.RasterXSize, src_ds.RasterYSize
+
+    mem_ds = gdal.GetDriverByName("MEM").Create("", width, height, 1, gdal.GDT_Byte)
+    mem_ds.SetGeoTransform(src_ds.GetGeoTransform())
+    mem_ds.SetProjection(src_ds.GetProjection())
+    mem_band = mem_ds.GetRasterBand(1)
+    mem_band.SetNoDataValue(EXTENT_NODATA)
+
+    block_x, block_y = src_band.GetBlockSize()
+    for yoff in range(0, height, block_y):
+        ysize = min(block_y, height - yoff)
+        for xoff in range(0, width, block_x):
+            xsize = min(block_x, width - xoff)
+            depth = src_band.ReadAsArray(xoff, yoff, xsize, ysize)
+            mem_band.WriteArray(depth_to_extent(depth, src_nodata), xoff, yoff)
+    src_ds = None
+
+    try:
+        write_dataset_cog(dest_tif, mem_ds)
+    finally:
+        mem_ds = None
+
+
 def create_domain_tif(tif_path: Path, tmp_dir: Path, gpkg_path: Path, dest_dir: Path) -> None:
     """
     Create domain TIFF from geopackage using GDAL operations.
@@ -155,24 +266,107 @@ def create_domain_tif(tif_path: Path, tmp_dir: Path, gpkg_path: Path, dest_dir:
         raise RuntimeError(f"gdal_translate failed for {dest_tif}")
 
 
+def create_domain_tif_native(tif_path: Path, gpkg_path: Path, dest_dir: Path) -> None:
+    """
+    Create domain TIFF from geopackage in-process, without intermediate files.
+
+    Only the reference TIFF's grid definition (size, geotransform, projection) is read, no pixels.
+    XS_concave_hull is rasterized as 0 into an in-memory Byte raster initialised to EXTENT_NODATA,
+    which is written once as a COG.
+
+    Args:
+        tif_path: Path to reference TIFF file, any depth TIFF of the reach
+        gpkg_path: Path to input geopackage file
+        dest_dir: Destination directory for output file
+    """
+    dest_tif = dest_dir / "domain.tif"
+
+    if dest_tif.exists():
+        logger.debug(f"Domain file {dest_tif} exists. Skipping processing.")
+        return
+
+    ref_ds = gdal.Open(str(tif_path))
+    width, height = ref_ds.RasterXSize, ref_ds.RasterYSize
+    geotransform, projection = ref_ds.GetGeoTransform(), ref_ds.GetProjection()
+    ref_ds = None
+
+    mem_ds = gdal.GetDriverByName("MEM").Create("", width, height, 1, gdal.GDT_Byte)
+    mem_ds.SetGeoTransform(geotransform)
+    mem_ds.SetProjection(projection)
+    mem_band = mem_ds.GetRasterBand(1)
+    mem_band.SetNoDataValue(EXTENT_NODATA)
+    mem_band.Fill(EXTENT_NODATA)
+
+    try:
+        gdal.Rasterize(mem_ds, str(gpkg_path), layers=["XS_concave_hull"], burnValues=[0])
+        gdal.GetDriverByName("COG").CreateCopy(str(dest_tif), mem_ds)
+    except Exception as e:
+        if os.path.exists(dest_tif):  # clean up
+            os.remove(dest_tif)
+        raise RuntimeError(f"Domain creation failed for {dest_tif}") from e
+    finally:
+        mem_ds = None
+
+
 def fim_worker(args: tuple) -> None:
     """
     Worker function for processing FIM extent files.
 
     Args:
-        args: Tuple containing (tif_path, library_dir, library_extent_dir)
+        args: Tuple containing (tif_path, library_dir, library_extent_dir, engine)
     """
-    tif_path, library_dir, library_extent_dir = args
+    tif_path, library_dir, library_extent_dir, engine = args
     try:
         relative_path = tif_path.relative_to(library_dir)
         dest_path = library_extent_dir / relative_path
         dest_dir = dest_path.parent
         dest_dir.mkdir(parents=True, exist_ok=True)
 
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            create_extent_tif(tif_path, Path(tmp_dir), dest_dir)
+        if engine == "native":
+            create_extent_tif_native(tif_path, dest_dir)
+        else:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                create_extent_tif(tif_path, Path(tmp_dir), dest_dir)
+    except Exception as e:
+        logger.exception(f"Error processing {tif_path}: {str(e)}")
+
+
+def manifest_fim_worker(args: tuple) -> tuple[tuple[str, int, int, str, str] | None, bool]:
+    """
+    Worker function to bring one extent TIF up to date with its depth TIF.
+
+    A depth TIF with a recorded hash is hashed first, and its extent is only recreated (overwritten)
+    when the hash differs. A depth TIF without one gets its extent created, or kept if it exists.
+
+    Args:
+        args: Tuple containing (tif_path, library_dir, library_extent_dir, engine, recorded_hash)
+
+    Returns:
+        Tuple of (manifest entry or None on failure, whether the extent was recreated)
+    """
+    tif_path, library_dir, library_extent_dir, engine, recorded_hash = args
+    try:
+        # Stat before reading, so a depth TIF changed during processing is seen as changed on the next run
+        st = tif_path.stat()
+        relative_path = tif_path.relative_to(library_dir)
+        output = relative_path.with_name(f"{tif_path.stem}.tif")
+        digest = file_hash(tif_path)
+        entry = (relative_path.as_posix(), st.st_size, st.st_mtime_ns, digest, output.as_posix())
+        if recorded_hash == digest:
+            return entry, False
+
+        overwrite = recorded_hash is not None
+        dest_dir = library_extent_dir / relative_path.parent
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        if engine == "native":
+            create_extent_tif_native(tif_path, dest_dir, overwrite=overwrite)
+        else:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                create_extent_tif(tif_path, Path(tmp_dir), dest_dir, overwrite=overwrite)
+        return entry, overwrite
     except Exception as e:
         logger.exception(f"Error processing {tif_path}: {str(e)}")
+        return None, False
 
 
 def domain_worker(args: tuple) -> None:
@@ -180,9 +374,9 @@ def domain_worker(args: tuple) -> None:
     Worker function for processing model domain files.
 
     Args:
-        args: Tuple containing (reach_id, tif_path, library_extent_dir, submodels_dir)
+        args: Tuple containing (reach_id, tif_path, library_extent_dir, submodels_dir, engine)
     """
-    reach_id, tif_path, library_extent_dir, submodels_dir = args
+    reach_id, tif_path, library_extent_dir, submodels_dir, engine = args
     try:
         tif_path = Path(tif_path)
         gpkg_path = Path(submodels_dir) / reach_id / f"{reach_id}.gpkg"
@@ -190,8 +384,11 @@ def domain_worker(args: tuple) -> None:
 
         if gpkg_path.exists():
             dest_dir.mkdir(parents=True, exist_ok=True)
-            with tempfile.TemporaryDirectory() as tmp_dir:
-                create_domain_tif(tif_path, Path(tmp_dir), gpkg_path, dest_dir)
+            if engine == "native":
+                create_domain_tif_native(tif_path, gpkg_path, dest_dir)
+            else:
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    create_domain_tif(tif_path, Path(tmp_dir), gpkg_path, dest_dir)
         else:
             logger.error(f"Missing geopackage for reach {reach_id}: {gpkg_path}")
     except Exception as e:
@@ -224,45 +421,149 @@ def get_reachid_tif_map(tif_paths: list[Path]) -> dict[str, Path]:
     return {str(path.parent.parent.name): path for path in tif_paths}
 
 
-def create_extent_lib(collection: type[CollectionData], print_progress: bool = False) -> None:
+def get_extent_lib_tasks(
+    tif_paths: list[Path],
+    library_dir: Path,
+    library_extent_dir: Path,
+    submodels_dir: Path,
+    engine: str = "gdal_cli",
+) -> list[RasterTask]:
+    """
+    Build the extent library task stream, with each reach's domain task interleaved with its FIM tasks.
+
+    Interleaving keeps the cheap FIM tasks and the heavier domain tasks mixed, so the workers
+    stay busy instead of running all domains in a tail at the end.
+
+    Args:
+        tif_paths: List of depth TIFF file paths
+        library_dir: Root of the depth library
+        library_extent_dir: Root of the extent library
+        submodels_dir: Root of the submodels, holding the XS_concave_hull geopackages
+        engine: Extent TIFF engine, one of EXTENT_ENGINES
+
+    Returns:
+        List of (worker function, worker args, tag) tasks, tagged "fim" or "domain"
+    """
+    reach_tifs = {}
+    for tif_path in tif_paths:
+        reach_tifs.setdefault(str(tif_path.parent.parent.name), []).append(tif_path)
+
+    tasks = []
+    for reach_id, paths in reach_tifs.items():
+        # Same representative TIFF as get_reachid_tif_map, the last one found for the reach
+        tasks.append((domain_worker, (reach_id, paths[-1], library_extent_dir, submodels_dir, engine), "domain"))
+        tasks.extend((fim_worker, (p, library_dir, library_extent_dir, engine), "fim") for p in paths)
+    return tasks
+
+
+def get_manifest_extent_lib_tasks(
+    to_check: list[tuple[Path, str | None]],
+    library_dir: Path,
+    library_extent_dir: Path,
+    submodels_dir: Path,
+    engine: str = "gdal_cli",
+) -> list[RasterTask]:
+    """
+    Build the extent library task stream for the depth TIFs that are new or changed since the manifest.
+
+    Same layout as get_extent_lib_tasks, but FIM tasks run manifest_fim_worker, and domain tasks are only
+    added for reaches that have any depth TIF to check.
+
+    Args:
+        to_check: Depth TIFs to check, as returned by plan_extent_updates
+        library_dir: Root of the depth library
+        library_extent_dir: Root of the extent library
+        submodels_dir: Root of the submodels, holding the XS_concave_hull geopackages
+        engine: Extent TIFF engine, one of EXTENT_ENGINES
+
+    Returns:
+        List of (worker function, worker args, tag) tasks, tagged "fim" or "domain"
+    """
+    reach_tifs = {}
+    for tif_path, recorded_hash in to_check:
+        reach_tifs.setdefault(str(tif_path.parent.parent.name), []).append((tif_path, recorded_hash))
+
+    tasks = []
+    for reach_id, items in reach_tifs.items():
+        tasks.append((domain_worker, (reach_id, items[-1][0], library_extent_dir, submodels_dir, engine), "domain"))
+        tasks.extend((manifest_fim_worker, (p, library_dir, library_extent_dir, engine, h), "fim") for p, h in items)
+    return tasks
+
+
+def create_extent_lib(
+    collection: type[CollectionData],
+    print_progress: bool = False,
+    pool: RasterWorkerPool | None = None,
+    library_scan: LibraryScan | None = None,
+) -> None:
     """
     Main function to create extent library from depth library.
 
     Args:
         collection: CollectionData object with configuration
         print_progress: Whether to display progress bar
+        pool: Shared raster worker pool. A pool is started for this call when not provided.
+        library_scan: Library enumeration shared with the other raster stages. Scanned when not provided.
     """
-    library_dir = Path(collection.library_dir)
-    extent_library_dir = Path(collection.extent_library_dir)
-    submodels_dir = Path(collection.submodels_dir)
-    process_count = collection.config["execution"]["OPTIMUM_PARALLEL_PROCESS_COUNT"]
-
-    # Process FIM extent files
-    tif_paths = get_all_tif_paths(library_dir)
-    with multiprocessing.Pool(process_count) as pool:
-        for i, _ in enumerate(
-            pool.imap_unordered(fim_worker, [(p, library_dir, extent_library_dir) for p in tif_paths]),
-            1,
-        ):
-            if print_progress:
-                sys.stdout.write(f"\rProcessing FIMs: {i}/{len(tif_paths)}")
-                sys.stdout.flush()
-    if print_progress:
-        sys.stdout.write("\n")
-
-    # Process domain files
-    reach_map = get_reachid_tif_map(tif_paths)
-    with multiprocessing.Pool(process_count) as pool:
-        for i, _ in enumerate(
-            pool.imap_unordered(
-                domain_worker,
-                [(rid, p, extent_library_dir, submodels_dir) for rid, p in reach_map.items()],
-            ),
-            1,
-        ):
-            if print_progress:
-                sys.stdout.write(f"\rProcessing domains: {i}/{len(reach_map)}")
-                sys.stdout.flush()
-
-    if print_progress:
-        sys.stdout.write("\n")
+    with record_step(Database(collection), "create_extent_lib") as span:
+        library_dir = Path(collection.library_dir)
+        extent_library_dir = Path(collection.extent_library_dir)
+        submodels_dir = Path(collection.submodels_dir)
+        process_count = collection.config["execution"]["OPTIMUM_PARALLEL_PROCESS_COUNT"]
+        engine = collection.config.get("extent_library", {}).get("ENGINE", "gdal_cli")
+        if engine not in EXTENT_ENGINES:
+            raise ValueError(f"extent_library.ENGINE={engine!r} is not one of {EXTENT_ENGINES}")
+
+        if library_scan is None:
+            library_scan = scan_library(library_dir)
+        tif_paths = library_scan.all_paths()
+        manifest = None
+        if collection.config["extent_library"].get("USE_MANIFEST", False):
+            manifest = ExtentManifest(collection.extent_manifest_path, collection.config["database"]["DB_CONN_TIMEOUT"])
+            to_check, orphans, unchanged = plan_extent_updates(tif_paths, library_dir, manifest.load())
+            logger.info(f"Extent manifest: {unchanged} unchanged, {len(to_check)} to check, {len(orphans)} orphans")
+            remove_orphans(manifest, orphans, extent_library_dir)
+            tasks = get_manifest_extent_lib_tasks(to_check, library_dir, extent_library_dir, submodels_dir, engine)
+            fim_count = len(to_check)
+        else:
+            tasks = get_extent_lib_tasks(tif_paths, library_dir, extent_library_dir, submodels_dir, engine)
+            fim_count = len(tif_paths)
+        totals = {"fim": fim_count, "domain": len(tasks) - fim_count}
+        done = {"fim": 0, "domain": 0}
+        entries, recreated, failed = [], 0, 0
+
+        own_pool = pool is None
+        if own_pool:
+            pool = RasterWorkerPool(process_count)
+            pool.start()
+        try:
+            for kind, result in pool.run(tasks):
+                done[kind] += 1
+                if manifest is not None and kind == "fim":
+                    entry, overwritten = result
+                    if entry is None:
+                        failed += 1
+                    else:
+                        entries.append(entry)
+                        recreated += overwritten
+                    if len(entries) >= MANIFEST_COMMIT_BATCH:
+                        manifest.upsert(entries)
+                        entries = []
+                if print_progress:
+                    sys.stdout.write(
+                        f"\rProcessing FIMs: {done['fim']}/{totals['fim']}, "
+                        f"domains: {done['domain']}/{totals['domain']}"
+                    )
+                    sys.stdout.flush()
+        finally:
+            if own_pool:
+                pool.close()
+            if manifest is not None:
+                manifest.upsert(entries)
+
+        if print_progress:
+            sys.stdout.write("\n")
+        if manifest is not None:
+            logger.info(f"Extent manifest: {recreated} stale extents recreated, {failed} failed")
+        logger.info(f"Extent library created for {totals['fim']} FIMs and {totals['domain']} domains")
+        span.counts = {"succeeded": done["fim"] + done["domain"] - failed, "failed": failed}
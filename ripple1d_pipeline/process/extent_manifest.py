@@ -0,0 +1,174 @@
+"""
+Manifest of the extent library, used to rebuild only the extents whose depth TIF changed.
+
+Without it, create_extent_lib can only skip a depth TIF when its extent exists, so a depth TIF
+rewritten in place (e.g. by process_bridges) keeps its stale extent, and every output is stat-ed
+on each run. The manifest records, per depth TIF, its size, mtime and content hash and the extent
+created from it. On a re-run:
+- depth TIFs with the recorded size and mtime are skipped without touching their extent,
+- depth TIFs with a new size or mtime are hashed, and their extent is recreated only if the hash changed,
+- depth TIFs not in the manifest get their extent created (an existing one is kept, as before),
+- extents of depth TIFs that no longer exist are removed.
+
+The manifest is a SQLite database in the collection folder (collection.extent_manifest_path).
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_hash(path: Path) -> str:
+    """
+    Get the blake2b content hash of a file.
+
+    Args:
+        path: File to hash
+
+    Returns:
+        Hex digest of the file contents
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtentManifest:
+    """
+    SQLite table of depth TIF (source) to extent TIF (output), keyed by source path relative to the library.
+    """
+
+    def __init__(self, db_path: str, timeout: float = 30):
+        self.db_path = db_path
+        self.timeout = timeout
+        with self._get_connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS extent_manifest (
+                    source TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    hash TEXT NOT NULL,
+                    output TEXT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+                """
+            )
+            conn.commit()
+
+    @contextmanager
+    def _get_connection(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def load(self) -> dict[str, tuple[int, int, str, str]]:
+        """
+        Get all manifest entries.
+
+        Returns:
+            Dictionary mapping source to (size, mtime_ns, hash, output)
+        """
+        with self._get_connection() as conn:
+            rows = conn.execute("SELECT source, size, mtime_ns, hash, output FROM extent_manifest").fetchall()
+        return {source: (size, mtime_ns, digest, output) for source, size, mtime_ns, digest, output in rows}
+
+    def upsert(self, entries: list[tuple[str, int, int, str, str]]) -> None:
+        """
+        Insert or replace entries.
+
+        Args:
+            entries: List of (source, size, mtime_ns, hash, output)
+        """
+        if not entries:
+            return
+        with self._get_connection() as conn:
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO extent_manifest (source, size, mtime_ns, hash, output, updated_at)
+                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                """,
+                entries,
+            )
+            conn.commit()
+
+    def delete(self, sources: list[str]) -> None:
+        """
+        Delete entries by source.
+
+        Args:
+            sources: Source paths, relative to the library
+        """
+        if not sources:
+            return
+        with self._get_connection() as conn:
+            conn.executemany("DELETE FROM extent_manifest WHERE source = ?", [(s,) for s in sources])
+            conn.commit()
+
+
+def plan_extent_updates(
+    tif_paths: list[Path],
+    library_dir: Path,
+    entries: dict[str, tuple[int, int, str, str]],
+) -> tuple[list[tuple[Path, str | None]], list[tuple[str, str]], int]:
+    """
+    Compare the depth TIFs on disk with the manifest. Only the depth TIFs are stat-ed, never the outputs.
+
+    Args:
+        tif_paths: Depth TIF paths found in the library
+        library_dir: Root of the depth library
+        entries: Manifest entries, as returned by ExtentManifest.load
+
+    Returns:
+        Tuple of (
+            depth TIFs to check as (path, recorded hash or None when not in the manifest),
+            orphans as (source, output),
+            number of unchanged depth TIFs,
+        )
+    """
+    to_check, unchanged, seen = [], 0, set()
+    for tif_path in tif_paths:
+        source = tif_path.relative_to(library_dir).as_posix()
+        seen.add(source)
+        entry = entries.get(source)
+        if entry is None:
+            to_check.append((tif_path, None))
+            continue
+        st = tif_path.stat()
+        if (st.st_size, st.st_mtime_ns) == entry[:2]:
+            unchanged += 1
+        else:
+            to_check.append((tif_path, entry[2]))
+
+    orphans = [(source, entry[3]) for source, entry in entries.items() if source not in seen]
+    return to_check, orphans, unchanged
+
+
+def remove_orphans(manifest: ExtentManifest, orphans: list[tuple[str, str]], library_extent_dir: Path) -> None:
+    """
+    Remove the extents of depth TIFs that no longer exist, and their manifest entries.
+
+    Args:
+        manifest: Extent manifest
+        orphans: List of (source, output), as returned by plan_extent_updates
+        library_extent_dir: Root of the extent library
+    """
+    for _, output in orphans:
+        try:
+            os.remove(library_extent_dir / output)
+        except FileNotFoundError:
+            pass
+    manifest.delete([source for source, _ in orphans])
+    if orphans:
+        logger.info(f"Removed {len(orphans)} orphan extents")
@@ -0,0 +1,381 @@
+"""
+Fused raster stage: bridge masking and extent creation in a single pass over the depth library.
+
+Run separately, process_bridges rewrites each depth TIF under a bridge and create_extent_lib then reads
+every depth TIF again, i.e. two full reads, two full writes and four subprocesses per file.
+process_library_rasters reads each depth TIF once, applies the bridge mask with numpy, and writes the
+corrected depth COG (only when a bridge changed it) and the extent COG from the same array.
+
+Enabled with extent_library.FUSED_BRIDGE_MASKING, in place of running the two stages one after the other.
+
+Depth TIFs masked by an earlier run are recorded in bridge_masked_grids, as by process_bridges, and are not masked
+again. With extent_library.USE_MANIFEST, the extent manifest is planned and updated as by create_extent_lib, so
+depth TIFs that are masked and unchanged since the manifest are skipped without being read.
+"""
+
+import logging
+import os
+import shutil
+import sys
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+from osgeo import gdal
+
+from ..setup.collection_data import CollectionData
+from ..setup.database import Database
+from .bridge_processor import (
+    build_aligned_rasters,
+    get_bridge_footprint,
+    get_raster_info,
+    is_masked,
+    masked_grid_entry,
+)
+from .extent_library import EXTENT_NODATA, MANIFEST_COMMIT_BATCH, depth_to_extent, domain_worker, write_array_cog
+from .extent_manifest import ExtentManifest, file_hash, plan_extent_updates, remove_orphans
+from .library_scan import LibraryScan, scan_library
+from .raster_pool import RasterTask, RasterWorkerPool
+from .step_metrics import record_step
+
+if TYPE_CHECKING:
+    # Loaded by the stage only, shapely is not needed in the raster workers importing this module
+    from .bridge_tile_index import BridgeTileIndex
+
+gdal.UseExceptions()
+
+logger = logging.getLogger(__name__)
+
+
+def mask_depth_with_bridges(depth: np.ndarray, nodata: float, bridge: tuple) -> bool:
+    """
+    Apply the bridge mask to a depth array in place, reading only the bridge window of the DEM and bridges.
+
+    Same algorithm as the gdal_calc expression in bridge_processor.apply_bridge_mask:
+    delta = (DEM + depth) - bridge_elev * conv_factor, set to nodata where delta < 0, on bridge pixels only.
+
+    Args:
+        depth: Full depth array of the TIF, modified in place
+        nodata: Depth nodata value
+        bridge: Tuple of (aligned_dem, aligned_bridges, conv_factor, footprint) for the reach
+
+    Returns:
+        True if any wet pixel is under a bridge, i.e. the depth array was changed
+    """
+    aligned_dem, aligned_bridges, conv_factor, footprint = bridge
+    (xoff, yoff, xsize, ysize), mask_path, (width, height) = footprint
+    if depth.shape != (height, width):
+        raise ValueError(f"Depth grid {depth.shape[1]}x{depth.shape[0]} is not on the reach grid {width}x{height}")
+    is_bridge = np.load(mask_path)
+
+    window = depth[yoff : yoff + ysize, xoff : xoff + xsize]
+    wet = ~np.isnan(window) & (window != nodata)
+    if not np.any(wet & is_bridge):
+        return False
+
+    dem_ds = gdal.Open(str(aligned_dem))
+    dem = dem_ds.GetRasterBand(1).ReadAsArray(xoff, yoff, xsize, ysize)
+    dem_ds = None
+    bridges_ds = gdal.Open(str(aligned_bridges))
+    bridges = bridges_ds.GetRasterBand(1).ReadAsArray(xoff, yoff, xsize, ysize)
+    bridges_ds = None
+
+    delta = (dem + window) - (bridges * conv_factor)
+    masked = np.where(delta < 0, nodata, delta)
+    window[is_bridge] = masked[is_bridge]
+    return True
+
+
+def _read_depth(tif_path: Path) -> tuple[np.ndarray, float, tuple, str]:
+    """Read a depth TIF, returning (depth array, nodata, geotransform, projection)."""
+    ds = gdal.Open(str(tif_path))
+    band = ds.GetRasterBand(1)
+    # Same default as get_raster_info, which the bridge stage uses for the depth nodata
+    nodata = band.GetNoDataValue()
+    nodata = -9999.0 if nodata is None else nodata
+    depth = band.ReadAsArray()
+    geotransform, projection = ds.GetGeoTransform(), ds.GetProjection()
+    ds = None
+    return depth, nodata, geotransform, projection
+
+
+def fused_worker(args: tuple) -> tuple[str, bool, bool, tuple | None, tuple | None]:
+    """
+    Worker function to bridge mask one depth TIF and create its extent TIF from a single read.
+
+    With the manifest, the depth TIF is hashed after masking and an existing extent is only recreated when
+    the hash differs from the recorded one, as in extent_library.manifest_fim_worker.
+
+    Args:
+        args: Tuple containing (tif_path, library_dir, library_extent_dir, bridge, use_manifest, recorded_hash),
+            bridge is None for reaches without bridges and for depth TIFs already masked
+
+    Returns:
+        Tuple of (tif_path, success, depth_modified, bridge_masked_grids row or None, manifest entry or None)
+    """
+    tif_path, library_dir, library_extent_dir, bridge, use_manifest, recorded_hash = args
+    try:
+        relative_path = tif_path.relative_to(library_dir)
+        output = relative_path.with_name(f"{tif_path.stem}.tif")
+        dest_tif = library_extent_dir / output
+
+        depth, modified = None, False
+        if bridge is not None:
+            depth, nodata, geotransform, projection = _read_depth(tif_path)
+            modified = mask_depth_with_bridges(depth, nodata, bridge)
+            if modified:
+                # Write next to the original and swap, so a failure never leaves a partial depth TIF
+                tmp_tif = tif_path.with_name(f"{tif_path.stem}.masked.tmp")
+                write_array_cog(tmp_tif, depth, geotransform, projection, nodata, ["COMPRESS=LZW"])
+                os.replace(tmp_tif, tif_path)
+                logger.debug(f"Applied bridge mask to {tif_path}")
+        masked_row = None if bridge is None else (*masked_grid_entry(tif_path, library_dir), modified)
+
+        entry = None
+        if use_manifest:
+            # Stat before hashing, so a depth TIF changed during processing is seen as changed on the next run
+            st = tif_path.stat()
+            entry = (relative_path.as_posix(), st.st_size, st.st_mtime_ns, file_hash(tif_path), output.as_posix())
+
+        # An extent made before masking is stale, so it is always rewritten for masked depths
+        stale = modified or (entry is not None and recorded_hash is not None and entry[3] != recorded_hash)
+        if stale or not dest_tif.exists():
+            if depth is None:
+                depth, nodata, geotransform, projection = _read_depth(tif_path)
+            dest_tif.parent.mkdir(parents=True, exist_ok=True)
+            write_array_cog(dest_tif, depth_to_extent(depth, nodata), geotransform, projection, EXTENT_NODATA)
+        else:
+            logger.debug(f"Destination file {dest_tif} exists. Skipping processing.")
+        return (str(tif_path), True, modified, masked_row, entry)
+
+    except Exception as e:
+        logger.exception(f"Error processing {tif_path}: {e}")
+        return (str(tif_path), False, False, None, None)
+
+
+def _prepare_reach_bridges(
+    reach_id: str,
+    sample_tif: Path,
+    submodels_dir: Path,
+    library_dir: Path,
+    bridge_index: "BridgeTileIndex",
+    conv_factor: float,
+) -> tuple[tuple | None, Path | None, int]:
+    """
+    Query the reach's bridges and build its aligned DEM and bridge VRTs.
+
+    Returns:
+        Tuple of (bridge worker arg or None, temp dir to remove or None, number of intersecting bridge tiles)
+    """
+    dem_path = submodels_dir / reach_id / "Terrain" / f"{reach_id}.seamless_3dep_dem_3m_5070.tif"
+    bounds, depth_res, depth_nodata = get_raster_info(sample_tif)
+    bridge_paths = bridge_index.query(*bounds)
+    if not bridge_paths:
+        return None, None, 0
+    if not dem_path.exists():
+        raise FileNotFoundError(f"No DEM found for reach {reach_id}: {dem_path}")
+
+    temp_dir, aligned_dem, aligned_bridges = build_aligned_rasters(
+        reach_id, dem_path, bridge_paths, bounds, depth_res, depth_nodata, library_dir.parent
+    )
+    footprint = get_bridge_footprint(aligned_bridges)
+    if footprint is None:
+        # Bridge tiles intersect the reach bbox but hold no bridge pixel on the grid
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        return None, None, len(bridge_paths)
+    return (str(aligned_dem), str(aligned_bridges), conv_factor, footprint), temp_dir, len(bridge_paths)
+
+
+def _fused_reach_tasks(
+    library_scan: LibraryScan,
+    library_dir: Path,
+    library_extent_dir: Path,
+    submodels_dir: Path,
+    bridge_index: "BridgeTileIndex",
+    conv_factor: float,
+    masked: dict[str, tuple[int, int]],
+    to_check: dict[Path, str | None] | None,
+    results: dict[str, list],
+    reach_temp_dirs: dict[str, tuple[Path, int]],
+) -> Iterator[RasterTask]:
+    """
+    Prepare reaches one at a time and yield the domain task and a fused task per depth TIF to process.
+
+    Depth TIFs already masked get no bridge. With the manifest (to_check, as planned by plan_extent_updates),
+    they are skipped unless new or changed since the manifest, and reaches left without tasks get no domain task.
+
+    Runs in the pool's feeder thread. Like in process_bridges, a reach's temp dir is registered with its
+    task count before its tasks are yielded, and the consumer removes it after the last one.
+    """
+    for reach_id in library_scan.reach_ids:
+        reach_tifs = library_scan.reach_paths(reach_id)
+        if not reach_tifs:
+            logger.warning(f"Reach {reach_id}: no TIF files found, skipping")
+            continue
+
+        # Masking is not idempotent, depth TIFs masked by an earlier run are left alone
+        unmasked = {p for p in reach_tifs if not is_masked(p, library_dir, masked)} if masked else set(reach_tifs)
+        bridge, temp_dir, bridge_count = None, None, 0
+        if unmasked:
+            try:
+                bridge, temp_dir, bridge_count = _prepare_reach_bridges(
+                    reach_id, reach_tifs[0], submodels_dir, library_dir, bridge_index, conv_factor
+                )
+            except Exception as e:
+                # Extents are still created, without masking, same as when the separate bridge stage fails
+                logger.exception(f"Error preparing bridges for reach {reach_id}, extents created without masking: {e}")
+            results["reaches_with_bridges" if bridge is not None else "reaches_without_bridges"].append(reach_id)
+        else:
+            logger.info(f"Reach {reach_id}: all TIFs already masked")
+
+        fused_tasks = []
+        for tif_path in reach_tifs:
+            tif_bridge = bridge if tif_path in unmasked else None
+            if to_check is not None and tif_bridge is None and tif_path not in to_check:
+                results["skipped"].append(str(tif_path))
+                continue
+            recorded_hash = to_check.get(tif_path) if to_check is not None else None
+            fused_args = (tif_path, library_dir, library_extent_dir, tif_bridge, to_check is not None, recorded_hash)
+            fused_tasks.append((fused_worker, fused_args, ("fim", reach_id)))
+        if not fused_tasks:
+            continue
+
+        if bridge is not None:
+            reach_temp_dirs[reach_id] = (temp_dir, len(fused_tasks))
+            logger.info(f"Reach {reach_id}: queued {len(fused_tasks)} TIFs with {bridge_count} bridges")
+
+        # Same representative TIFF as get_extent_lib_tasks, the last one found for the reach
+        domain_args = (reach_id, reach_tifs[-1], library_extent_dir, submodels_dir, "native")
+        yield (domain_worker, domain_args, ("domain", reach_id))
+        yield from fused_tasks
+
+
+def process_library_rasters(
+    collection: type[CollectionData],
+    bridge_index: "BridgeTileIndex | None" = None,
+    pool: RasterWorkerPool | None = None,
+    print_progress: bool = False,
+    library_scan: LibraryScan | None = None,
+) -> dict[str, list]:
+    """
+    Apply bridge masking to the depth library in place and create the extent library, in one pass.
+
+    Args:
+        collection: CollectionData object with configuration
+        bridge_index: Preloaded bridge tile index. Loaded from BRIDGE_TILE_INDEX_PATH when not provided.
+        pool: Shared raster worker pool. A pool is started for this call when not provided.
+        print_progress: Whether to display progress
+        library_scan: Library enumeration. Scanned when not provided.
+
+    Returns:
+        Dictionary with reaches_with_bridges, reaches_without_bridges, modified (depth TIFs changed by
+        bridges), skipped (already masked and unchanged since the manifest) and failed lists
+    """
+    database = Database(collection)
+    with record_step(database, "process_library_rasters") as span:
+        library_dir = Path(collection.library_dir)
+        extent_library_dir = Path(collection.extent_library_dir)
+        submodels_dir = Path(collection.submodels_dir)
+        conv_factor = collection.config["bridge_processing"]["BRIDGE_ELEV_CONV_FACTOR"]
+
+        if library_scan is None:
+            library_scan = scan_library(library_dir)
+        logger.info(f"Found {len(library_scan.reach_ids)} reaches to process")
+
+        t_total = time.perf_counter()
+        if bridge_index is None:
+            from .bridge_tile_index import BridgeTileIndex
+
+            bridge_index = BridgeTileIndex.from_file(collection.bridge_tile_index_path)
+
+        manifest, to_check = None, None
+        if collection.config["extent_library"].get("USE_MANIFEST", False):
+            manifest = ExtentManifest(collection.extent_manifest_path, collection.config["database"]["DB_CONN_TIMEOUT"])
+            checks, orphans, unchanged = plan_extent_updates(library_scan.all_paths(), library_dir, manifest.load())
+            logger.info(f"Extent manifest: {unchanged} unchanged, {len(checks)} to check, {len(orphans)} orphans")
+            remove_orphans(manifest, orphans, extent_library_dir)
+            to_check = dict(checks)
+
+        results = {
+            "reaches_with_bridges": [],
+            "reaches_without_bridges": [],
+            "modified": [],
+            "skipped": [],
+            "failed": [],
+        }
+        reach_temp_dirs = {}
+        tasks = _fused_reach_tasks(
+            library_scan,
+            library_dir,
+            extent_library_dir,
+            submodels_dir,
+            bridge_index,
+            conv_factor,
+            database.get_bridge_masked_grids(),
+            to_check,
+            results,
+            reach_temp_dirs,
+        )
+        done = {"fim": 0, "domain": 0}
+        entries = []
+
+        own_pool = pool is None
+        if own_pool:
+            pool = RasterWorkerPool.from_config(collection.config)
+            pool.start()
+        try:
+            for (kind, reach_id), result in pool.run(tasks):
+                done[kind] += 1
+                if print_progress:
+                    sys.stdout.write(f"\rProcessing FIMs: {done['fim']}, domains: {done['domain']}")
+                    sys.stdout.flush()
+                if kind == "domain":
+                    continue
+
+                tif_path, success, modified, masked_row, entry = result
+                if not success:
+                    results["failed"].append(tif_path)
+                elif modified:
+                    results["modified"].append(tif_path)
+                if masked_row is not None:
+                    # Recorded right away, as a grid masked but not recorded would be masked again on resume
+                    database.insert_bridge_masked_grids([masked_row])
+                if entry is not None:
+                    entries.append(entry)
+                    if len(entries) >= MANIFEST_COMMIT_BATCH:
+                        manifest.upsert(entries)
+                        entries = []
+
+                if reach_id in reach_temp_dirs:
+                    temp_dir, remaining = reach_temp_dirs[reach_id]
+                    if remaining > 1:
+                        reach_temp_dirs[reach_id] = (temp_dir, remaining - 1)
+                    else:
+                        del reach_temp_dirs[reach_id]
+                        shutil.rmtree(temp_dir, ignore_errors=True)
+        finally:
+            if manifest is not None:
+                manifest.upsert(entries)
+            if own_pool:
+                pool.close()
+            for temp_dir, _ in reach_temp_dirs.values():
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+        if print_progress:
+            sys.stdout.write("\n")
+        logger.info(
+            f"Fused raster stage complete: {len(results['reaches_with_bridges'])} reaches with bridges, "
+            f"{len(results['reaches_without_bridges'])} without, {len(results['modified'])} depth TIFs masked, "
+            f"{done['fim']} FIMs, {done['domain']} domains, {len(results['skipped'])} skipped, "
+            f"{len(results['failed'])} failed, total: {time.perf_counter() - t_total:.1f}s"
+        )
+        failed = len(results["failed"])
+        span.counts = {
+            "succeeded": done["fim"] + done["domain"] - failed,
+            "failed": failed,
+            "skipped": len(results["skipped"]),
+        }
+
+    return results
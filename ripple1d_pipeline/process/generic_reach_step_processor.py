@@ -1,11 +1,8 @@
 import logging
-from time import sleep
-
-import requests
 
 from ..setup.collection_data import CollectionData
 from .base_reach_step_processor import BaseReachStepProcessor
-from .job_client import JobRecord
+from .job_client import JobClient, JobRecord
 from .reach import Reach
 
 logger = logging.getLogger(__name__)
@@ -18,23 +15,19 @@ class GenericReachStepProcessor(BaseReachStepProcessor):
         super().__init__(collection, reaches)
         self.process_name = process_name
 
-    def _execute_requests(self):
+    def _execute_requests(self, job_client: JobClient):
         """Generic reach request execution"""
         for reach in self.reaches:
-            job_record = self._execute_single_request(reach)
+            job_record = self._execute_single_request(job_client, reach)
             self._categorize_job_record(job_record)
 
-    def _execute_single_request(self, reach: Reach) -> tuple:
+    def _execute_single_request(self, job_client: JobClient, reach: Reach) -> JobRecord:
         """Single request implementation"""
-        url = f"{self.collection.RIPPLE1D_API_URL}/processes/{self.collection.config['processing_steps'][self.process_name]['api_process_name']}/execution"
+        api_process_name = self.collection.config["processing_steps"][self.process_name]["api_process_name"]
         template = self.collection.config["processing_steps"][self.process_name]["payload_template"]
         payload = self._format_reach_payload(template, reach.id, reach.model.id, reach.model.name)
 
-        for attempt in range(5):
-            response = requests.post(url, json=payload)
-            if response.status_code == 201:
-                return JobRecord(reach, response.json()["jobID"], "accepted")
-            logger.info(f"Attempt {attempt + 1} failed for model {reach.id}: {response.text}")
-            sleep(attempt * self.collection.config["polling"]["API_LAUNCH_JOBS_RETRY_WAIT"])
-
+        job_id = job_client.submit_job(api_process_name, payload, reach.id)
+        if job_id:
+            return JobRecord(reach, job_id, "accepted", job_client.endpoint_for(job_id))
         return JobRecord(reach, "", "not_accepted")
@@ -1,4 +1,3 @@
-import json
 import logging
 import os
 import sqlite3
@@ -8,15 +7,20 @@ from concurrent.futures import ThreadPoolExecutor
 from queue import Queue
 from threading import Lock
 
-import requests
-
 from ..setup.collection_data import CollectionData
 from ..setup.database import Database
+from .base_reach_step_processor import reach_replacements
+from .base_step_processor import format_template, output_exists
 from .job_client import JobClient
+from .job_timeline import record_job_timeline
 from .reach import Reach
+from .timeout_policy import TimeoutPolicy
 
 logger = logging.getLogger(__name__)
 
+# Processing steps run for each reach by the ikwse walk of the network
+IKWSE_STEPS = ("run_iknown_wse", "ikwse_create_rating_curves_db")
+
 
 def get_min_max_elevation(
     reach_id: int,
@@ -54,6 +58,9 @@ def process_reach(
     task_queue: Queue,
     central_db_lock: Lock,
     timeout_minutes: int = 30,
+    timeout_policy: TimeoutPolicy | None = None,
+    ras_length: float | None = None,
+    completed_reaches: set[int] | None = None,
 ) -> None:
     """
     Process a single reach for KWSE.
@@ -63,18 +70,25 @@ def process_reach(
     3. Create FIM Library
     4. Load rating curves to central database
     5. Put upstream reaches in queue for later processing
+
+    timeout_minutes is the static job timeout, timeout_policy adapts it to the run time history and ras_length.
+    Reaches in completed_reaches (resume) are not submitted again, only their upstream reaches are queued.
     """
 
     DS_DEPTH_INCREMENT = collection.config["ripple_settings"]["DS_DEPTH_INCREMENT"]
     RAS_VERSION = collection.config["ripple_settings"]["RAS_VERSION"]
-    RIPPLE1D_API_URL = collection.RIPPLE1D_API_URL
     submodels_directory = collection.submodels_dir
+    kwse_timeout, rc_timeout = timeout_minutes, timeout_minutes
+    if timeout_policy is not None:
+        kwse_timeout = timeout_policy.timeout_for("run_iknown_wse", ras_length, timeout_minutes)
+        rc_timeout = timeout_policy.timeout_for("ikwse_create_rating_curves_db", ras_length, timeout_minutes)
 
     try:
         submodel_directory_path = os.path.join(submodels_directory, str(reach.id))
-        headers = {"Content-Type": "application/json"}
 
-        if reach.id in [valid_reach.id for valid_reach in valid_reaches]:
+        if completed_reaches and reach.id in completed_reaches:
+            logger.info(f"{reach.id} completed by an earlier run, not submitted")
+        elif reach.id in [valid_reach.id for valid_reach in valid_reaches]:
             consider_outlet = False
             if (reach.to_id is None) or (reach.to_id not in [valid_reach.id for valid_reach in valid_reaches]):
                 consider_outlet = True
@@ -88,26 +102,20 @@ def process_reach(
             )
 
             if min_elevation and max_elevation:
-                url = f"{RIPPLE1D_API_URL}/processes/run_known_wse/execution"
-                payload = json.dumps(
-                    {
-                        "submodel_directory": submodel_directory_path,
-                        "plan_suffix": "ikwse",
-                        "min_elevation": min_elevation,
-                        "max_elevation": max_elevation,
-                        "depth_increment": DS_DEPTH_INCREMENT,
-                        "ras_version": RAS_VERSION,
-                        "write_depth_grids": False,
-                    }
-                )
+                payload = {
+                    "submodel_directory": submodel_directory_path,
+                    "plan_suffix": "ikwse",
+                    "min_elevation": min_elevation,
+                    "max_elevation": max_elevation,
+                    "depth_increment": DS_DEPTH_INCREMENT,
+                    "ras_version": RAS_VERSION,
+                    "write_depth_grids": False,
+                }
 
                 logger.info(f"Submitting task for reach {reach.id} with downstream {reach.to_id}")
 
-                # to do: launch job with retry
-                response = requests.post(url, headers=headers, data=payload)
-                response_json = response.json()
-                job_id = response_json.get("jobID")
-                if not job_id or not job_client.check_job_successful(job_id, timeout_minutes=timeout_minutes):
+                job_id = job_client.submit_job("run_known_wse", payload, reach.id)
+                if not job_id or not job_client.check_job_successful(job_id, timeout_minutes=kwse_timeout):
                     logger.info(f"KWSE run failed for {reach.id}, API job ID: {job_id}")
                     with central_db_lock:
                         database.update_processing_table([(reach.id, job_id)], "run_iknown_wse", "failed")
@@ -115,21 +123,15 @@ def process_reach(
                     with central_db_lock:
                         database.update_processing_table([(reach.id, job_id)], "run_iknown_wse", "successful")
 
-                    rc_db = f"{RIPPLE1D_API_URL}/processes/create_rating_curves_db/execution"
-                    rc_db_payload = json.dumps(
-                        {
-                            "submodel_directory": submodel_directory_path,
-                            "plans": ["ikwse"],
-                        }
-                    )
+                    rc_db_payload = {
+                        "submodel_directory": submodel_directory_path,
+                        "plans": ["ikwse"],
+                    }
 
-                    # todo: try to launch job with retry
-                    response = requests.post(rc_db, headers=headers, data=rc_db_payload)
-                    rc_db_response_json = response.json()
-                    rc_db_job_id = rc_db_response_json.get("jobID")
+                    rc_db_job_id = job_client.submit_job("create_rating_curves_db", rc_db_payload, reach.id)
 
                     if not rc_db_job_id or not job_client.check_job_successful(
-                        rc_db_job_id, timeout_minutes=timeout_minutes
+                        rc_db_job_id, timeout_minutes=rc_timeout
                     ):
                         with central_db_lock:
                             database.update_processing_table(
@@ -156,6 +158,13 @@ def process_reach(
         traceback.print_exc()
 
 
+def ikwse_outputs_exist(collection: type[CollectionData], reach_id: int) -> bool:
+    """Whether the files under outputs of the ikwse steps in processing_steps config exist for a reach"""
+    steps = collection.config["processing_steps"]
+    templates = [template for step in IKWSE_STEPS for template in steps[step].get("outputs") or []]
+    return all(output_exists(path) for path in format_template(templates, reach_replacements(collection, reach_id)))
+
+
 def execute_ikwse_for_network(
     initial_reaches: list[Reach],
     collection: type[CollectionData],
@@ -163,11 +172,25 @@ def execute_ikwse_for_network(
     job_client: type[JobClient],
     valid_reaches: list[Reach],
     timeout: int = 30,
+    resume: bool = False,
 ) -> None:
     """
     Start processing the network from the given list of initial reaches.
+
+    With resume, reaches whose run_iknown_wse and ikwse_create_rating_curves_db jobs both succeeded in an
+    earlier run, and whose outputs of both steps still exist, are not submitted again: the network is walked
+    as usual and only its unfinished part is run.
     """
     OPTIMUM_PARALLEL_PROCESS_COUNT = collection.config["execution"]["OPTIMUM_PARALLEL_PROCESS_COUNT"]
+    timeout_policy = TimeoutPolicy.from_config(collection.config, collection.stac_collection_id)
+    ras_lengths = database.get_ras_lengths([reach.id for reach in valid_reaches]) if timeout_policy.adaptive else {}
+    completed_reaches = set()
+    if resume:
+        completed_reaches = set(database.get_completed_entities("run_iknown_wse")) & set(
+            database.get_completed_entities("ikwse_create_rating_curves_db")
+        )
+        completed_reaches = {reach_id for reach_id in completed_reaches if ikwse_outputs_exist(collection, reach_id)}
+        logger.info(f"Resuming ikwse: {len(completed_reaches)} reaches completed by an earlier run")
 
     task_queue = Queue()
     db_lock = Lock()
@@ -189,6 +212,9 @@ def execute_ikwse_for_network(
                     task_queue,
                     db_lock,
                     timeout,
+                    timeout_policy,
+                    ras_lengths.get(reach.id),
+                    completed_reaches,
                 )
                 futures.append(future)
 
@@ -197,3 +223,21 @@ def execute_ikwse_for_network(
                     futures.remove(future)
 
             time.sleep(1)
+
+    if database.job_timeline or timeout_policy.adaptive:
+        for process_name in ("run_iknown_wse", "ikwse_create_rating_curves_db"):
+            jobs = [
+                (reach_id, job_id)
+                for reach_id, job_id in database.get_all_job_ids_for_process(process_name)
+                if reach_id not in completed_reaches
+            ]
+            metadata = record_job_timeline(job_client, database, process_name, jobs)
+            timeout_policy.record(
+                process_name,
+                [
+                    (ras_lengths.get(reach_id), metadata[job_id]["finish_duration_minutes"])
+                    for reach_id, job_id in jobs
+                    if metadata.get(job_id, {}).get("ogc_status") == "successful"
+                    and metadata[job_id].get("finish_duration_minutes") is not None
+                ],
+            )
@@ -1,5 +1,7 @@
 import logging
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import UTC, datetime
 from typing import Any
@@ -9,6 +11,9 @@ import requests
 
 from ..setup.collection_data import CollectionData
 from ..setup.database import Database
+from .job_retry import ERROR_LOOKUP_FAILED
+from .shared_budget import JOB_BUDGET, SharedBudget
+from .submission_throttle import SubmissionThrottle
 
 logger = logging.getLogger(__name__)
 
@@ -18,17 +23,46 @@ class JobRecord:
     entity: Any
     id: str
     status: str
+    endpoint: str = ""
+
+
+def parse_endpoints(api_url: str) -> list[str]:
+    """Split a comma separated RIPPLE1D_API_URL into endpoint base URLs, without trailing slash."""
+    endpoints = [url.strip().rstrip("/") for url in api_url.split(",") if url.strip()]
+    if not endpoints:
+        raise ValueError("RIPPLE1D_API_URL has no endpoint")
+    return endpoints
 
 
 class JobClient:
     """
     Main class to communicate with Ripple1d API.
+
+    RIPPLE1D_API_URL may list several comma separated Ripple1d endpoints sharing the collection directory.
+    Each job is submitted to the endpoint with the fewest jobs in flight from this client, and later
+    requests about the job go to the endpoint it was submitted to. The in-flight count stands in for the
+    server queue depth, which the Ripple1d API does not report: jobs of other clients are not counted.
     """
 
     def __init__(self, collection: type[CollectionData]):
         self.stac_collection_id = collection.stac_collection_id
         self.DEFAULT_POLL_WAIT = collection.config["polling"]["DEFAULT_POLL_WAIT"]
-        self.RIPPLE1D_API_URL = collection.RIPPLE1D_API_URL
+        self.endpoints = parse_endpoints(collection.RIPPLE1D_API_URL)
+        self.RIPPLE1D_API_URL = self.endpoints[0]
+        # Job id -> endpoint, and jobs submitted and not yet seen finished per endpoint
+        self._job_endpoints = {}
+        self._in_flight = {endpoint: set() for endpoint in self.endpoints}
+        self._endpoints_lock = threading.Lock()
+        # With several endpoints, job endpoints are kept in the collection database for later clients (QC)
+        self.database = Database(collection) if len(self.endpoints) > 1 else None
+        self.API_LAUNCH_JOBS_RETRY_WAIT = collection.config["polling"]["API_LAUNCH_JOBS_RETRY_WAIT"]
+        # Cap on in-flight jobs shared with the other collections of a concurrent batch, None if not capped
+        self.job_budget = SharedBudget.from_config(collection.config, JOB_BUDGET, collection.stac_collection_id)
+        self._job_leases = {}
+        self._job_leases_lock = threading.Lock()
+        self.METADATA_WORKERS = collection.config.get("metrics", {}).get("METADATA_WORKERS", 16)
+        # Adaptive submission rate, shared by every step submitting through this client
+        self.throttle = SubmissionThrottle.from_config(collection.config)
 
     @staticmethod
     def datetime_to_epoch_utc(datetime_str):
@@ -41,13 +75,166 @@ class JobClient:
         epoch_time = int(dt_utc.timestamp())
         return epoch_time
 
+    def _pick_endpoint(self, exclude: set) -> str:
+        """
+        Endpoint with the fewest jobs in flight from this client, among those not excluded (all, if all are).
+
+        Not the server queue depth, jobs submitted to the endpoint by other clients are not seen.
+        """
+        with self._endpoints_lock:
+            candidates = [endpoint for endpoint in self.endpoints if endpoint not in exclude] or self.endpoints
+            return min(candidates, key=lambda endpoint: len(self._in_flight[endpoint]))
+
+    def _track_job(self, job_id: str, endpoint: str) -> None:
+        with self._endpoints_lock:
+            self._job_endpoints[job_id] = endpoint
+            self._in_flight[endpoint].add(job_id)
+        if self.database is not None:
+            try:
+                self.database.insert_job_endpoint(job_id, endpoint)
+            except Exception as e:
+                logger.warning(f"Could not record endpoint of job {job_id}: {e}")
+
+    def endpoint_for(self, job_id: str) -> str:
+        """
+        Endpoint a job was submitted to. Jobs not submitted by this client are looked up in the
+        collection database, else each endpoint is asked for the job.
+        """
+        if len(self.endpoints) == 1:
+            return self.RIPPLE1D_API_URL
+        with self._endpoints_lock:
+            endpoint = self._job_endpoints.get(job_id)
+        if endpoint is None:
+            try:
+                endpoint = self.database.get_job_endpoint(job_id)
+            except Exception as e:
+                logger.debug(f"Could not look up endpoint of job {job_id}: {e}")
+        if endpoint is None:
+            for candidate in self.endpoints:
+                try:
+                    if requests.get(f"{candidate}/jobs/{job_id}").status_code == 200:
+                        endpoint = candidate
+                        break
+                except requests.RequestException:
+                    continue
+        endpoint = endpoint or self.RIPPLE1D_API_URL
+        with self._endpoints_lock:
+            self._job_endpoints[job_id] = endpoint
+        return endpoint
+
+    def _job_url(self, job_id: str) -> str:
+        return f"{self.endpoint_for(job_id)}/jobs/{job_id}"
+
+    def _job_finished(self, job_id: str) -> None:
+        """Stop counting a job as in flight, and give back its job slot."""
+        with self._endpoints_lock:
+            endpoint = self._job_endpoints.get(job_id)
+            if endpoint is not None:
+                self._in_flight[endpoint].discard(job_id)
+        self._release_job_slot(job_id)
+
+    def submit_job(self, process_name: str, payload: dict, entity_id: Any = None, attempts: int = 5) -> str | None:
+        """
+        Submit a job to the least loaded Ripple1d endpoint, retrying on non-201 responses, on the next
+        least loaded endpoint when there are several.
+
+        Submissions are paced by the client's submission throttle. Responses showing the server is saturated
+        (see SubmissionThrottle) slow the throttle down and are resubmitted without counting as attempts,
+        for up to submission_throttle.MAX_WAIT_MINUTES.
+
+        When the batch caps in-flight jobs, waits for a slot first. The slot is held until the job is
+        seen finished by wait_for_jobs, check_job_successful, or while waiting for another slot.
+
+        Args:
+            process_name: Ripple1d API process name, e.g. "create_fim_lib"
+            payload: Job payload
+            entity_id: Reach or model id, for logging
+            attempts: Number of submission attempts
+
+        Returns:
+            Job id, or None if the job was not accepted
+        """
+        lease_id = self._acquire_job_slot()
+        tried = set()
+        attempt = 0
+        saturated_since = None
+
+        try:
+            while attempt < attempts:
+                endpoint = self._pick_endpoint(tried)
+                tried.add(endpoint)
+                self.throttle.acquire()
+                response, error = None, None
+                t_start = time.monotonic()
+                try:
+                    response = requests.post(f"{endpoint}/processes/{process_name}/execution", json=payload)
+                except requests.RequestException as e:
+                    error = e
+                latency = time.monotonic() - t_start
+
+                if response is not None and response.status_code == 201:
+                    self.throttle.accepted(latency)
+                    job_id = response.json()["jobID"]
+                    self._track_job(job_id, endpoint)
+                    if lease_id is not None:
+                        with self._job_leases_lock:
+                            self._job_leases[job_id] = lease_id
+                        lease_id = None
+                    return job_id
+
+                reason = str(error) if response is None else f"{response.status_code} {response.text[:200]}"
+                if self.throttle.is_backpressure(response, error):
+                    self.throttle.backpressure(f"{endpoint} {reason}")
+                    saturated_since = saturated_since or time.monotonic()
+                    if time.monotonic() - saturated_since < self.throttle.max_wait_seconds:
+                        logger.debug(f"{process_name} {entity_id} resubmitted, {endpoint} saturated: {reason}")
+                        continue
+                if response is None and len(self.endpoints) == 1:
+                    raise error
+                attempt += 1
+                logger.info(f"Attempt {attempt} failed for {process_name} {entity_id} on {endpoint}: {reason}")
+                if response is not None:
+                    time.sleep((attempt - 1) * self.API_LAUNCH_JOBS_RETRY_WAIT)
+            return None
+        finally:
+            # Slot not handed to an accepted job
+            if lease_id is not None:
+                self.job_budget.release(lease_id)
+
+    def _acquire_job_slot(self) -> int | None:
+        """
+        Take a job slot from the batch budget. While the budget is exhausted, poll this client's own
+        in-flight jobs and give back the slots of those that finished.
+
+        Returns:
+            Lease id, or None if jobs are not capped
+        """
+        if self.job_budget is None:
+            return None
+        while (lease_id := self.job_budget.try_acquire()) is None:
+            with self._job_leases_lock:
+                in_flight = list(self._job_leases)
+            for job_id in in_flight:
+                try:
+                    if self.get_job_status(job_id) in ("successful", "failed", "dismissed"):
+                        self._job_finished(job_id)
+                except requests.RequestException as e:
+                    logger.debug(f"Could not poll in-flight job {job_id}: {e}")
+            time.sleep(self.DEFAULT_POLL_WAIT)
+        return lease_id
+
+    def _release_job_slot(self, job_id: str) -> None:
+        """Give back the job slot of a finished job, if it holds one."""
+        with self._job_leases_lock:
+            lease_id = self._job_leases.pop(job_id, None)
+        if lease_id is not None:
+            self.job_budget.release(lease_id)
+
     def get_job_update_time(self, job_id: str) -> str:
         """
         Get updated time of a job as string
         """
-        url = f"{self.RIPPLE1D_API_URL}/jobs/{job_id}"
-
-        response = requests.get(url)
+        response = requests.get(self._job_url(job_id))
         response.raise_for_status()
         job_update_time = response.json().get("updated")
         return job_update_time
@@ -56,9 +243,7 @@ class JobClient:
         """
         Get status of a job from API
         """
-        url = f"{self.RIPPLE1D_API_URL}/jobs/{job_id}"
-
-        response = requests.get(url)
+        response = requests.get(self._job_url(job_id))
         response.raise_for_status()
         job_status = response.json().get("status")
         return job_status
@@ -72,20 +257,26 @@ class JobClient:
         while True:
             status = self.get_job_status(job_id)
             if status == "successful":
+                self._job_finished(job_id)
                 return True
             elif status == "failed":
-                logger.error(f"{self.RIPPLE1D_API_URL}/jobs/{job_id}?tb=true job failed")
+                self._job_finished(job_id)
+                logger.error(f"{self._job_url(job_id)}?tb=true job failed")
                 return False
             elif status == "running":
                 elapsed_time = time.time() - self.datetime_to_epoch_utc(self.get_job_update_time(job_id))
                 if elapsed_time / 60 > timeout_minutes:
-                    logger.warning(f"{self.RIPPLE1D_API_URL}/jobs/{job_id} client timeout")
+                    self._job_finished(job_id)
+                    logger.warning(f"{self._job_url(job_id)} client timeout")
                     return False
             time.sleep(self.DEFAULT_POLL_WAIT)
 
-    def wait_for_jobs(self, job_records: list[JobRecord], timeout_minutes=90) -> tuple[list[JobRecord]]:
+    def wait_for_jobs(
+        self, job_records: list[JobRecord], timeout_minutes=90, job_timeouts: dict[str, float] | None = None
+    ) -> tuple[list[JobRecord]]:
         """
         Waits for jobs to finish and returns lists of successful, failed, and unknown status jobsjobs.
+        job_timeouts overrides timeout_minutes per job id.
         """
         succeeded = []
         failed = []
@@ -95,19 +286,23 @@ class JobClient:
             while True:
                 status = self.get_job_status(job_record.id)
                 if status == "successful":
+                    self._job_finished(job_record.id)
                     job_record.status = "successful"
                     succeeded.append(job_record)
                     break
                 elif status == "failed":
+                    self._job_finished(job_record.id)
                     job_record.status = "failed"
                     failed.append(job_record)
-                    logger.error(f"{self.RIPPLE1D_API_URL}/jobs/{job_record.id}?tb=true job failed")
+                    logger.error(f"{self._job_url(job_record.id)}?tb=true job failed")
                     break
                 elif status == "running":
                     updated_time = self.get_job_update_time(job_record.id)
                     elapsed_time = time.time() - self.datetime_to_epoch_utc(updated_time)
-                    if elapsed_time / 60 > timeout_minutes:
-                        logger.info(f"{self.RIPPLE1D_API_URL}/jobs/{job_record.id} client timeout")
+                    if elapsed_time / 60 > (job_timeouts or {}).get(job_record.id, timeout_minutes):
+                        # Timed out jobs are dismissed by the step, so their slot is given back here
+                        self._job_finished(job_record.id)
+                        logger.info(f"{self._job_url(job_record.id)} client timeout")
                         job_record.status = "unknown"
                         unknown.append(job_record)
                         break
@@ -118,9 +313,8 @@ class JobClient:
     def get_failed_job_err_and_tb(self, job_id) -> tuple[str, str]:
         headers = {"Content-Type": "application/json"}
 
-        url = f"{self.RIPPLE1D_API_URL}/jobs/{job_id}?tb=true"
-
         try:
+            url = f"{self._job_url(job_id)}?tb=true"
             response = requests.get(url, headers=headers)
             response.raise_for_status()
             response_data = response.json()
@@ -132,14 +326,13 @@ class JobClient:
                 tb = "No traceback"
             return (err, tb)
         except Exception as e:
-            return (f"Failed to get job status. Error: {str(e)}", "")
+            return (f"{ERROR_LOOKUP_FAILED}. Error: {str(e)}", "")
 
     def get_job_payload(self, job_id) -> dict:
         headers = {"Content-Type": "application/json"}
 
-        url = f"{self.RIPPLE1D_API_URL}/jobs/{job_id}/metadata"
-
         try:
+            url = f"{self._job_url(job_id)}/metadata"
             response = requests.get(url, headers=headers)
             response.raise_for_status()
             response_data = response.json()
@@ -150,6 +343,30 @@ class JobClient:
         except Exception as e:
             return {"error": f"Failed to get job metadata. Error: {str(e)}"}
 
+    def _get_job_metadata(self, job_id: str) -> dict | None:
+        try:
+            response = requests.get(f"{self._job_url(job_id)}/metadata", headers={"Content-Type": "application/json"})
+            response.raise_for_status()
+            return response.json().get(job_id, {})
+        except Exception as e:
+            logger.warning(f"Failed to get metadata of job {job_id}. Error: {str(e)}")
+            return None
+
+    def get_jobs_metadata(self, job_ids: list[str]) -> dict[str, dict]:
+        """
+        Fetches the metadata of many jobs, METADATA_WORKERS requests at a time.
+
+        Returns:
+            Job id -> metadata (accept_time, start_time, finish_duration_minutes, ...), for the jobs
+            whose metadata could be fetched
+        """
+        job_ids = [job_id for job_id in job_ids if job_id]
+        if not job_ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.METADATA_WORKERS, len(job_ids))) as executor:
+            metadata = dict(zip(job_ids, executor.map(self._get_job_metadata, job_ids), strict=True))
+        return {job_id: job_metadata for job_id, job_metadata in metadata.items() if job_metadata is not None}
+
     def get_jobs_metadata_df(self, job_records: list[tuple[int, str, str]]) -> pd.DataFrame:
         """
         Fetches metadata for provided jobs and returns a formatted DataFrame.
@@ -162,20 +379,19 @@ class JobClient:
             finish_duration, func_name, status, start_time, status_time,
             func_args, metadata
         """
+        metadata_by_job = self.get_jobs_metadata([job_id for _, job_id, _ in job_records])
         results = []
 
         for entity_id, job_id, _ in job_records:
             if not job_id:
                 continue
 
-            headers = {"Content-Type": "application/json"}
-            url = f"{self.RIPPLE1D_API_URL}/jobs/{job_id}/metadata"
-            try:
-                response = requests.get(url, headers=headers)
-                response.raise_for_status()
-                metadata = response.json().get(job_id, {})
-
-                row = {
+            metadata = metadata_by_job.get(job_id)
+            if metadata is None:
+                results.append({"id": entity_id, "msg": f"Failed to get job metadata of job {job_id}"})
+                continue
+            results.append(
+                {
                     "id": entity_id,
                     "accept_time": metadata.get("accept_time"),
                     "dismiss_time": metadata.get("dismiss_time"),
@@ -185,16 +401,7 @@ class JobClient:
                     "status_time": metadata.get("status_time"),
                     "payload": metadata.get("func_kwargs"),
                 }
-                results.append(row)
-
-            except Exception as e:
-                logger.exception(f"Failed to get job metadata. Error: {str(e)}")
-                results.append(
-                    {
-                        "id": entity_id,
-                        "msg": f"Failed to get job metadata. Error: {str(e)}",
-                    }
-                )
+            )
 
         return pd.DataFrame(
             results,
@@ -258,8 +465,8 @@ class JobClient:
 
         for entity, job_id in job_ids:
             if job_id:  # Ensure job_id exists
-                url = f"{self.RIPPLE1D_API_URL}/jobs/{job_id}"
                 try:
+                    url = self._job_url(job_id)
                     response = requests.get(url, headers=headers)
                     if response.status_code == 200:
                         response_data = response.json()
@@ -281,7 +488,7 @@ class JobClient:
                 continue
 
             try:
-                response = requests.delete(f"{self.RIPPLE1D_API_URL}/jobs/{job.id}")
+                response = requests.delete(f"{job.endpoint or self.endpoint_for(job.id)}/jobs/{job.id}")
                 if response.status_code == 200:
                     logger.info(f"Dismissed job {job.id}")
                 else:
@@ -0,0 +1,76 @@
+"""
+Bounded retry of the jobs of a step that failed for a transient reason.
+
+A failed job is retried when its Ripple1d error matches one of the retryable patterns and none of the
+non-retryable ones: errors such as a locked file, a dropped connection or a crashed HEC-RAS controller
+go away on their own, a bad geometry does not. Jobs the server did not accept are retried too, as the
+server was most likely saturated. A failed job whose error could not be fetched is not retried, as the
+lookup failure says nothing about why the job failed.
+
+Retries wait with exponential backoff between rounds. The wait blocks the step, and the collection, as steps
+run one after the other: keep BACKOFF_SECONDS and MAX_BACKOFF_SECONDS short compared to the step duration.
+Retries are off by default (MAX_ATTEMPTS 1).
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Start of the error reported for a failed job when its error could not be fetched from the server
+ERROR_LOOKUP_FAILED = "Failed to get job status"
+
+# Substrings (case insensitive) of Ripple1d job errors worth retrying
+RETRYABLE_ERRORS = [
+    "timeout",
+    "timed out",
+    "connection",
+    "temporarily unavailable",
+    "database is locked",
+    "permissionerror",
+    "being used by another process",
+    "access is denied",
+    "com_error",
+    "rpc server",
+    "memoryerror",
+]
+
+
+class RetryPolicy:
+    """
+    Which jobs of a step are retried, how many times and after how long.
+    """
+
+    def __init__(self, settings: dict):
+        """
+        Args:
+            settings: retries config section
+        """
+        self.max_attempts = max(settings.get("MAX_ATTEMPTS", 1), 1)
+        self.statuses = settings.get("STATUSES", ["failed", "not_accepted"])
+        self.backoff_seconds = settings.get("BACKOFF_SECONDS", 30)
+        self.backoff_factor = settings.get("BACKOFF_FACTOR", 2)
+        self.max_backoff_seconds = settings.get("MAX_BACKOFF_SECONDS", 600)
+        self.retryable_errors = [pattern.lower() for pattern in settings.get("RETRYABLE_ERRORS", RETRYABLE_ERRORS)]
+        self.non_retryable_errors = [pattern.lower() for pattern in settings.get("NON_RETRYABLE_ERRORS", [])]
+
+    @classmethod
+    def from_config(cls, config: dict) -> "RetryPolicy":
+        return cls(config.get("retries", {}))
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_attempts > 1
+
+    def backoff(self, attempt: int) -> float:
+        """Seconds to wait before retrying the jobs of a failed attempt (1 for the first submission)"""
+        return min(self.backoff_seconds * self.backoff_factor ** (attempt - 1), self.max_backoff_seconds)
+
+    def is_retryable_error(self, error: str | None) -> bool:
+        """Whether a failed job's error is transient, per the retryable and non-retryable patterns"""
+        error = (error or "").lower()
+        # The lookup error (e.g. a connection error) is not the job's error
+        if error.startswith(ERROR_LOOKUP_FAILED.lower()):
+            return False
+        if any(pattern in error for pattern in self.non_retryable_errors):
+            return False
+        return any(pattern in error for pattern in self.retryable_errors)
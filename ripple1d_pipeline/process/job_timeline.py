@@ -0,0 +1,81 @@
+import logging
+from datetime import datetime, timedelta
+
+from ..setup.database import Database
+from .job_client import JobClient
+
+logger = logging.getLogger(__name__)
+
+
+def parse_job_time(value: str | None) -> datetime | None:
+    """Parse a Ripple1d metadata time (UTC, "%Y-%m-%d %H:%M:%S", optionally with fraction or offset)."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return None
+
+
+def _minutes(start: datetime | None, end: datetime | None) -> float | None:
+    if start is None or end is None:
+        return None
+    return round((end - start).total_seconds() / 60, 4)
+
+
+def timeline_row(process_name: str, entity_id, job_id: str, endpoint: str, metadata: dict) -> tuple:
+    """
+    job_timeline row of a job from its Ripple1d metadata.
+
+    Queue wait is accept to start, run time is finish_duration_minutes (start to finish). The finish time is
+    start time plus run time, as Ripple1d has no finish time of its own.
+    """
+    accept_time = parse_job_time(metadata.get("accept_time"))
+    start_time = parse_job_time(metadata.get("start_time"))
+    run_minutes = metadata.get("finish_duration_minutes")
+    finish_time = start_time + timedelta(minutes=run_minutes) if start_time and run_minutes is not None else None
+    return (
+        job_id,
+        process_name,
+        str(entity_id),
+        endpoint,
+        metadata.get("ogc_status"),
+        accept_time.isoformat(sep=" ") if accept_time else None,
+        start_time.isoformat(sep=" ") if start_time else None,
+        finish_time.isoformat(sep=" ") if finish_time else None,
+        metadata.get("dismiss_time"),
+        _minutes(accept_time, start_time),
+        run_minutes,
+    )
+
+
+def record_job_timeline(
+    job_client: JobClient, database: Database, process_name: str, jobs: list[tuple]
+) -> dict[str, dict]:
+    """
+    Fetch the metadata of jobs in bulk and write their lifecycle to the job_timeline table.
+
+    Args:
+        job_client: JobClient the jobs were submitted with
+        database: Collection database
+        process_name: Processing step name, e.g. "run_known_wse"
+        jobs: (entity id, job id) of the jobs, jobs without id are skipped
+
+    Returns:
+        Job id -> metadata, for the jobs whose metadata could be fetched
+    """
+    jobs = [(entity_id, job_id) for entity_id, job_id in jobs if job_id]
+    metadata = job_client.get_jobs_metadata([job_id for _, job_id in jobs])
+    if database.job_timeline:
+        rows = [
+            timeline_row(process_name, entity_id, job_id, job_client.endpoint_for(job_id), metadata[job_id])
+            for entity_id, job_id in jobs
+            if job_id in metadata
+        ]
+        try:
+            database.insert_job_timeline(rows)
+        except Exception as e:
+            logger.warning(f"Could not record the job timeline of {process_name}: {e}")
+        if len(rows) < len(jobs):
+            logger.info(f"No metadata for {len(jobs) - len(rows)} of {len(jobs)} {process_name} jobs")
+    return metadata
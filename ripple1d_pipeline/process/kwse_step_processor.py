@@ -1,12 +1,10 @@
 import logging
-from time import sleep
-
-import requests
 
 from ..setup.collection_data import CollectionData
 from .base_reach_step_processor import BaseReachStepProcessor
 from .ikwse_step import get_min_max_elevation
-from .job_client import JobRecord
+from .job_client import JobClient, JobRecord
+from .job_retry import RetryPolicy
 from .reach import Reach
 
 logger = logging.getLogger(__name__)
@@ -19,13 +17,13 @@ class KWSEStepProcessor(BaseReachStepProcessor):
         super().__init__(collection, reaches)
         self.process_name = "run_known_wse"
 
-    def _execute_requests(self):
+    def _execute_requests(self, job_client: JobClient):
         """KWSE-specific request execution with elevation data"""
         for reach in self.reaches:
-            job_record = self._execute_single_request(reach)
+            job_record = self._execute_single_request(job_client, reach)
             self._categorize_job_record(job_record)
 
-    def _execute_single_request(self, reach: Reach) -> JobRecord:
+    def _execute_single_request(self, job_client: JobClient, reach: Reach) -> JobRecord:
         """KWSE-specific request implementation with elevation data"""
         submodels_dir = self.collection.submodels_dir
         min_elev, max_elev = get_min_max_elevation(reach.to_id, submodels_dir)
@@ -33,16 +31,20 @@ class KWSEStepProcessor(BaseReachStepProcessor):
         if not min_elev or not max_elev:
             return JobRecord(reach, "", "not_accepted")
 
-        url = f"{self.collection.RIPPLE1D_API_URL}/processes/{self.collection.config['processing_steps'][self.process_name]['api_process_name']}/execution"
+        api_process_name = self.collection.config["processing_steps"][self.process_name]["api_process_name"]
         template = self.collection.config["processing_steps"][self.process_name]["payload_template"]
         payload = self._format_reach_payload(template, reach.id)
         payload.update({"min_elevation": min_elev, "max_elevation": max_elev})
 
-        for attempt in range(5):
-            response = requests.post(url, json=payload)
-            if response.status_code == 201:
-                return JobRecord(reach, response.json()["jobID"], "accepted")
-            logger.info(f"Attempt {attempt + 1} failed for model {reach.id}: {response.text}")
-            sleep(attempt * self.collection.config["polling"]["API_LAUNCH_JOBS_RETRY_WAIT"])
-
+        job_id = job_client.submit_job(api_process_name, payload, reach.id)
+        if job_id:
+            return JobRecord(reach, job_id, "accepted", job_client.endpoint_for(job_id))
         return JobRecord(reach, "", "not_accepted")
+
+    def _retryable(self, job_record: JobRecord, error: str, retry_policy: RetryPolicy) -> bool:
+        """Reaches not submitted for lack of downstream elevations are not retried"""
+        if job_record.status == "not_accepted":
+            min_elev, max_elev = get_min_max_elevation(job_record.entity.to_id, self.collection.submodels_dir)
+            if not min_elev or not max_elev:
+                return False
+        return super()._retryable(job_record, error, retry_policy)
@@ -0,0 +1,203 @@
+"""
+Tile indexes and VRT mosaics over the depth library and the extent library.
+
+Like tools/make_tile_index.py, but in-process and incremental: each library gets a GeoPackage tile
+index (layer "tiles", with the gdaltindex "location" field plus reach_id, stage and flow), and only
+grids added to or removed from the library since the last run are opened. Grids rewritten in place
+(e.g. bridge masking) keep their bounds and need no update.
+
+Each stage group (z_nd, z_12_5, ...) also gets a VRT of its grids across all reaches, sources ordered
+by flow so the largest flow of each reach is drawn on top. VRTs are only rebuilt for groups whose
+grids changed.
+
+Outputs, in <collection>/mosaics:
+    library_tiles.gpkg, library/z_<stage>.vrt
+    library_extent_tiles.gpkg, library_extent/z_<stage>.vrt
+
+The tile index can also be opened directly as a mosaic with GDAL's GTI driver (GDAL >= 3.9), e.g.
+gdal.Open("GTI:mosaics/library_extent_tiles.gpkg") with a FILTER open option on reach_id or flow.
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from osgeo import gdal, ogr, osr
+
+from ..setup.collection_data import CollectionData
+from .extent_footprints import parse_grid_path
+from .library_scan import LibraryScan, scan_library
+
+gdal.UseExceptions()
+ogr.UseExceptions()
+
+logger = logging.getLogger(__name__)
+
+TILE_INDEX_LAYER = "tiles"
+
+
+def _grid_bounds(location: str) -> tuple[tuple[float, float, float, float], str]:
+    """
+    Get the bounds and projection of a grid, from its header only.
+
+    Returns:
+        Tuple of ((xmin, ymin, xmax, ymax), projection WKT)
+    """
+    ds = gdal.Open(location)
+    xmin, xres, _, ymax, _, yres = ds.GetGeoTransform()
+    bounds = (xmin, ymax + yres * ds.RasterYSize, xmin + xres * ds.RasterXSize, ymax)
+    projection = ds.GetProjection()
+    ds = None
+    return bounds, projection
+
+
+def _read_index_locations(layer: ogr.Layer) -> dict[str, int]:
+    """Get the FID of every tile of an index layer, by location."""
+    layer_defn = layer.GetLayerDefn()
+    layer.SetIgnoredFields(
+        [
+            layer_defn.GetFieldDefn(i).GetName()
+            for i in range(layer_defn.GetFieldCount())
+            if layer_defn.GetFieldDefn(i).GetName() != "location"
+        ]
+        + ["OGR_GEOMETRY"]
+    )
+    locations = {feature.GetField("location"): feature.GetFID() for feature in layer}
+    layer.SetIgnoredFields([])
+    return locations
+
+
+def update_tile_index(
+    library_scan: LibraryScan,
+    index_path: str,
+    max_workers: int = 16,
+) -> set[str]:
+    """
+    Bring the tile index of a library up to date with a scan of it.
+
+    Args:
+        library_scan: Scan of the library
+        index_path: GeoPackage tile index, created if it does not exist
+        max_workers: Number of grid headers read concurrently
+
+    Returns:
+        Stage groups (e.g. "z_nd") with added or removed grids
+    """
+    grids = {}
+    for reach_id, tifs in library_scan.reach_tifs.items():
+        for relative_path in tifs:
+            parsed = parse_grid_path(relative_path)
+            if parsed is not None:
+                location = str((library_scan.library_dir / reach_id / relative_path).resolve())
+                grids[location] = (reach_id, relative_path.split("/")[0], parsed[0], parsed[1])
+
+    if os.path.exists(index_path):
+        ds = ogr.Open(index_path, update=1)
+        layer = ds.GetLayerByName(TILE_INDEX_LAYER)
+        indexed = {} if layer is None else _read_index_locations(layer)
+    else:
+        ds = ogr.GetDriverByName("GPKG").CreateDataSource(index_path)
+        layer, indexed = None, {}
+
+    added = [location for location in grids if location not in indexed]
+    removed = [location for location in indexed if location not in grids]
+    changed_groups = {grids[location][1] for location in added}
+    changed_groups.update(Path(location).parent.name for location in removed)
+
+    try:
+        if layer is not None and removed:
+            layer.StartTransaction()
+            for location in removed:
+                layer.DeleteFeature(indexed[location])
+            layer.CommitTransaction()
+
+        if added:
+            # Header reads release the GIL, threads are enough and keep this cheap on network storage
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                headers = list(executor.map(_grid_bounds, added))
+
+            if layer is None:
+                srs = osr.SpatialReference()
+                srs.ImportFromWkt(headers[0][1])
+                layer = ds.CreateLayer(TILE_INDEX_LAYER, srs=srs, geom_type=ogr.wkbPolygon)
+                layer.CreateField(ogr.FieldDefn("location", ogr.OFTString))
+                layer.CreateField(ogr.FieldDefn("reach_id", ogr.OFTString))
+                layer.CreateField(ogr.FieldDefn("stage", ogr.OFTString))
+                layer.CreateField(ogr.FieldDefn("flow", ogr.OFTInteger64))
+
+            layer.StartTransaction()
+            for location, ((xmin, ymin, xmax, ymax), _) in zip(added, headers, strict=True):
+                reach_id, _, stage, flow = grids[location]
+                ring = ogr.Geometry(ogr.wkbLinearRing)
+                for x, y in ((xmin, ymin), (xmax, ymin), (xmax, ymax), (xmin, ymax), (xmin, ymin)):
+                    ring.AddPoint_2D(x, y)
+                polygon = ogr.Geometry(ogr.wkbPolygon)
+                polygon.AddGeometry(ring)
+
+                feature = ogr.Feature(layer.GetLayerDefn())
+                feature.SetField("location", location)
+                feature.SetField("reach_id", reach_id)
+                feature.SetField("stage", stage)
+                feature.SetField("flow", flow)
+                feature.SetGeometry(polygon)
+                layer.CreateFeature(feature)
+            layer.CommitTransaction()
+    finally:
+        ds = None
+
+    logger.info(f"Tile index {index_path}: {len(added)} grids added, {len(removed)} removed, {len(grids)} total")
+    return changed_groups
+
+
+def update_group_vrts(library_scan: LibraryScan, vrt_dir: str, changed_groups: set[str]) -> None:
+    """
+    Rebuild the VRTs of changed stage groups, create missing ones and remove those of empty groups.
+
+    Args:
+        library_scan: Scan of the library
+        vrt_dir: Folder of the library's VRTs
+        changed_groups: Stage groups to rebuild, as returned by update_tile_index
+    """
+    groups = {}
+    for reach_id, tifs in library_scan.reach_tifs.items():
+        for relative_path in tifs:
+            parsed = parse_grid_path(relative_path)
+            if parsed is not None:
+                location = str((library_scan.library_dir / reach_id / relative_path).resolve())
+                groups.setdefault(relative_path.split("/")[0], []).append((parsed[1], location))
+
+    os.makedirs(vrt_dir, exist_ok=True)
+    for vrt_name in os.listdir(vrt_dir):
+        if vrt_name.endswith(".vrt") and vrt_name[:-4] not in groups:
+            os.remove(os.path.join(vrt_dir, vrt_name))
+
+    for group, sources in groups.items():
+        vrt_path = os.path.join(vrt_dir, f"{group}.vrt")
+        if group not in changed_groups and os.path.exists(vrt_path):
+            continue
+        sources.sort()
+        gdal.BuildVRT(vrt_path, [location for _, location in sources])
+        logger.debug(f"Built {vrt_path} from {len(sources)} grids")
+
+
+def create_library_mosaics(collection: type[CollectionData], library_scan: LibraryScan | None = None) -> None:
+    """
+    Update the tile indexes and stage group VRTs of the depth library and the extent library.
+
+    Args:
+        collection: CollectionData object with configuration
+        library_scan: Scan of the depth library shared with the raster stages. Scanned when not provided.
+    """
+    t_start = time.perf_counter()
+    os.makedirs(collection.mosaics_dir, exist_ok=True)
+    scans = {
+        "library": library_scan or scan_library(collection.library_dir),
+        "library_extent": scan_library(collection.extent_library_dir),
+    }
+    for name, scan in scans.items():
+        index_path = os.path.join(collection.mosaics_dir, f"{name}_tiles.gpkg")
+        changed_groups = update_tile_index(scan, index_path)
+        update_group_vrts(scan, os.path.join(collection.mosaics_dir, name), changed_groups)
+    logger.info(f"Library mosaics updated in {collection.mosaics_dir} in {time.perf_counter() - t_start:.1f}s")
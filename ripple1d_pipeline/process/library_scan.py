@@ -0,0 +1,98 @@
+"""
+One enumeration of the depth library, shared by the raster stages.
+
+Path.rglob over the whole library is slow on large collections (thousands of TIFs per reach), and
+the bridge and extent stages each used to walk it again. scan_library walks each reach folder with
+os.scandir, one thread per reach folder at a time, and keeps the TIF paths relative to their reach.
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def _scan_reach(reach_dir: str) -> list[str]:
+    """
+    Get the TIF paths under a reach folder, relative to it and sorted.
+
+    Args:
+        reach_dir: Reach folder of the library
+
+    Returns:
+        List of relative TIF paths, e.g. ["z_10_0/f_1200.tif", ...]
+    """
+    paths, stack = [], [("", reach_dir)]
+    while stack:
+        prefix, folder = stack.pop()
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((f"{prefix}{entry.name}/", entry.path))
+                elif entry.name.endswith(".tif"):
+                    paths.append(f"{prefix}{entry.name}")
+    paths.sort()
+    return paths
+
+
+class LibraryScan:
+    """
+    TIF paths of a library, grouped by reach. Paths are stored relative to their reach folder.
+    """
+
+    def __init__(self, library_dir: str | Path, reach_tifs: dict[str, list[str]]):
+        """
+        Args:
+            library_dir: Root of the library
+            reach_tifs: Dictionary mapping reach ID to TIF paths relative to the reach folder
+        """
+        self.library_dir = Path(library_dir)
+        self.reach_tifs = reach_tifs
+
+    def __len__(self) -> int:
+        return sum(len(tifs) for tifs in self.reach_tifs.values())
+
+    @property
+    def reach_ids(self) -> list[str]:
+        """Reach IDs, including reaches with no TIFs."""
+        return list(self.reach_tifs)
+
+    def reach_paths(self, reach_id: str) -> list[Path]:
+        """Get the absolute TIF paths of a reach."""
+        reach_dir = self.library_dir / reach_id
+        return [reach_dir / p for p in self.reach_tifs.get(reach_id, [])]
+
+    def all_paths(self) -> list[Path]:
+        """Get the absolute TIF paths of all reaches, grouped by reach."""
+        return [path for reach_id in self.reach_tifs for path in self.reach_paths(reach_id)]
+
+
+def scan_library(library_dir: str | Path, max_workers: int = 16) -> LibraryScan:
+    """
+    Enumerate the TIFs of a library, scanning reach folders in parallel.
+
+    Args:
+        library_dir: Root of the library, holding one folder per reach
+        max_workers: Number of reach folders scanned concurrently
+
+    Returns:
+        LibraryScan of the library
+    """
+    t_start = time.perf_counter()
+    library_dir = Path(library_dir)
+    with os.scandir(library_dir) as entries:
+        reach_dirs = sorted((e.name, e.path) for e in entries if e.is_dir())
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        reach_tifs = dict(
+            zip((name for name, _ in reach_dirs), executor.map(_scan_reach, [p for _, p in reach_dirs]), strict=True)
+        )
+
+    scan = LibraryScan(library_dir, reach_tifs)
+    logger.info(
+        f"Scanned {library_dir}: {len(scan)} TIFs in {len(reach_tifs)} reaches in {time.perf_counter() - t_start:.1f}s"
+    )
+    return scan
@@ -4,6 +4,7 @@ import os
 
 from ..setup.database import Database
 from .model import Model
+from .step_metrics import record_step
 
 logger = logging.getLogger(__name__)
 
@@ -34,27 +35,33 @@ def load_conflation(models: list[Model], database: type[Database]) -> None:
     """
     Loads conflation data into the processing table from the specified model keys and source models directory.
     """
-    source_models_directory = database.source_models_dir
-    models_data = {}
-
-    for model in models:
-        file_path = f"{source_models_directory}\\{model.id}\\{model.name}.conflation.json"
-        if os.path.exists(file_path):
-            json_data = load_json(f"{source_models_directory}\\{model.id}\\{model.name}.conflation.json")
-            models_data[model.id] = json_data
-        else:
-            logger.info(f"Does not exist {file_path}")
-
-    # Order by number of reaches (ascending) and total RAS length (ascending to place higher lengths last)
-    sorted_models_data = sorted(
-        models_data.items(),
-        key=lambda item: (
-            len(item[1]["reaches"]),
-            sum(get_ras_length(reach) for reach in item[1]["reaches"].values()),
-        ),
-    )
-
-    for model_id, json_data in sorted_models_data:
-        database.update_model_id_and_eclipsed(json_data, model_id)
-
-    logger.info(f"Conflation loaded to {database.db_path} from .conflation.json files")
+    with record_step(database, "load_conflation") as span:
+        source_models_directory = database.source_models_dir
+        models_data = {}
+
+        for model in models:
+            file_path = os.path.join(source_models_directory, model.id, f"{model.name}.conflation.json")
+            if os.path.exists(file_path):
+                json_data = load_json(file_path)
+                models_data[model.id] = json_data
+            else:
+                logger.info(f"Does not exist {file_path}")
+
+        # Order by number of reaches (ascending) and total RAS length (ascending to place higher lengths last)
+        sorted_models_data = sorted(
+            models_data.items(),
+            key=lambda item: (
+                len(item[1]["reaches"]),
+                sum(get_ras_length(reach) for reach in item[1]["reaches"].values()),
+            ),
+        )
+
+        # A reach conflated to several models keeps the last one, its ras length is taken from the same model
+        ras_lengths = {}
+        for model_id, json_data in sorted_models_data:
+            database.update_model_id_and_eclipsed(json_data, model_id)
+            ras_lengths.update({reach_id: get_ras_length(reach) for reach_id, reach in json_data["reaches"].items()})
+        database.update_ras_lengths(list(ras_lengths.items()))
+        span.counts = {"succeeded": len(models_data), "failed": len(models) - len(models_data)}
+
+        logger.info(f"Conflation loaded to {database.db_path} from .conflation.json files")
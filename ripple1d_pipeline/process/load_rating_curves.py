@@ -3,6 +3,7 @@ import os
 import sqlite3
 
 from ..setup.database import Database
+from .step_metrics import record_step
 
 logger = logging.getLogger(__name__)
 
@@ -134,17 +135,21 @@ def load_all_rating_curves(database: type[Database]) -> None:
     db_timeout = database.timeout
     submodels_dir = database.submodels_dir
 
-    conn = sqlite3.connect(db_path, timeout=db_timeout)
-    try:
-        for submodel in os.listdir(submodels_dir):
-            sub_db_path = os.path.join(submodels_dir, submodel, f"{submodel}.db")
-            if os.path.exists(sub_db_path):
-                process_reach_db(sub_db_path, conn)
-                try:
-                    os.remove(sub_db_path)
-                except Exception as e:
-                    logger.exception(f"Could not remove {sub_db_path} Error: {e}")
-
-        logger.info("All rating curves loaded into central database")
-    finally:
-        conn.close()
+    with record_step(database, "load_all_rating_curves") as span:
+        loaded = 0
+        conn = sqlite3.connect(db_path, timeout=db_timeout)
+        try:
+            for submodel in os.listdir(submodels_dir):
+                sub_db_path = os.path.join(submodels_dir, submodel, f"{submodel}.db")
+                if os.path.exists(sub_db_path):
+                    process_reach_db(sub_db_path, conn)
+                    loaded += 1
+                    try:
+                        os.remove(sub_db_path)
+                    except Exception as e:
+                        logger.exception(f"Could not remove {sub_db_path} Error: {e}")
+
+            logger.info("All rating curves loaded into central database")
+        finally:
+            conn.close()
+        span.counts = {"succeeded": loaded}
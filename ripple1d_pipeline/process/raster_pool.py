@@ -0,0 +1,143 @@
+"""
+Long-lived process pool shared by the raster stages (bridge masking and extent library).
+
+Creating a pool per reach, or per stage, pays worker start-up every time. On Windows, processes are
+spawned, so every new pool re-imports the package in each worker. A single RasterWorkerPool is
+started once and accepts a global stream of per-file tasks across all reaches and stages.
+
+The pool's task handler thread pulls tasks from a stage's stream as fast as it can, so tasks queue up well
+ahead of the workers. When a stage stops consuming its results (an error in its loop), the stream is stopped
+and the pool is terminated, which drops the queued tasks, and restarted for the next stage. Otherwise the
+abandoned tasks would all run before the next stage's, e.g. masking grids after their VRTs were removed.
+"""
+
+import logging
+import multiprocessing
+import threading
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any
+
+from .shared_budget import SharedBudget
+
+logger = logging.getLogger(__name__)
+
+# A task is (worker function, worker args, tag). The tag is returned with the result so callers
+# can tell which reach/stage a result belongs to without the workers having to know about it.
+RasterTask = tuple[Callable[[Any], Any], Any, Any]
+
+
+def _run_task(task: RasterTask) -> tuple[Any, Any]:
+    """Run one task in a worker process and return its tag with the result."""
+    func, args, tag = task
+    return tag, func(args)
+
+
+class RasterWorkerPool:
+    """
+    Process pool that outlives a single reach or stage.
+
+    Use as a context manager, and pass the same instance to process_bridges and create_extent_lib:
+
+        with RasterWorkerPool(processes) as pool:
+            process_bridges(collection, pool=pool)
+            create_extent_lib(collection, pool=pool)
+    """
+
+    def __init__(self, processes: int, budget: SharedBudget | None = None):
+        """
+        Args:
+            processes: Number of worker processes
+            budget: Cap on raster tasks shared with the other collections of a concurrent batch
+        """
+        self.processes = processes
+        self.budget = budget
+        self._pool = None
+
+    @classmethod
+    def from_config(cls, config: dict, budget: SharedBudget | None = None) -> "RasterWorkerPool":
+        """
+        Pool of OPTIMUM_PARALLEL_PROCESS_COUNT times RASTER_POOL_MULTIPLIER workers, per execution config.
+
+        The raster tasks are CPU bound, so the multiplier defaults to 1. A larger one only helps when the tasks
+        wait on I/O, e.g. a library on a network drive.
+        """
+        execution = config["execution"]
+        processes = round(execution["OPTIMUM_PARALLEL_PROCESS_COUNT"] * execution.get("RASTER_POOL_MULTIPLIER", 1))
+        return cls(max(processes, 1), budget=budget)
+
+    def __enter__(self) -> "RasterWorkerPool":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+    def start(self) -> None:
+        if self._pool is None:
+            logger.debug(f"Starting raster worker pool with {self.processes} processes")
+            self._pool = multiprocessing.Pool(processes=self.processes)
+
+    def close(self) -> None:
+        """Wait for the queued tasks to finish and stop the workers."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def terminate(self) -> None:
+        """Stop the workers at once, dropping queued tasks and killing running ones."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def run(self, tasks: Iterable[RasterTask]) -> Iterator[tuple[Any, Any]]:
+        """
+        Stream tasks through the pool and yield (tag, result) as tasks finish, in completion order.
+
+        Tasks are pulled from the iterable by the pool's feeder thread, so a generator can prepare
+        the next reach (VRTs etc.) while the workers are still busy with the previous one. Worker
+        functions must be importable module-level functions and should handle their own errors.
+
+        If the caller stops iterating before the last result (raises, breaks), no further task is pulled,
+        and the pool is restarted so tasks already queued or running are dropped.
+        """
+        if self._pool is None:
+            raise RuntimeError("RasterWorkerPool is not started, use it as a context manager")
+        stop = threading.Event()
+        # With a budget, the feeder thread takes a lease before handing each task to the workers, and one lease
+        # is given back per finished task, so the batch never has more tasks queued or running than its budget
+        leases = deque()
+
+        def feed() -> Iterator[RasterTask]:
+            for task in tasks:
+                if stop.is_set():
+                    return
+                if self.budget is not None:
+                    # Same polling as SharedBudget.acquire, but given up once the caller is gone
+                    while (lease_id := self.budget.try_acquire()) is None:
+                        if stop.wait(self.budget.poll_wait):
+                            return
+                    leases.append(lease_id)
+                yield task
+
+        finished = False
+        try:
+            for result in self._pool.imap_unordered(_run_task, feed()):
+                if self.budget is not None:
+                    self.budget.release(leases.popleft())
+                yield result
+            finished = True
+        finally:
+            stop.set()
+            if not finished:
+                logger.warning("Raster tasks abandoned, restarting the raster worker pool to drop the queued ones")
+                # Joins the feeder thread, which returns at the next task or lease wait now that stop is set
+                self.terminate()
+                self.start()
+            while leases:
+                self.budget.release(leases.popleft())
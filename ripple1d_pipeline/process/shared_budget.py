@@ -0,0 +1,157 @@
+"""
+Budget of concurrent work shared by the pipeline processes of a batch.
+
+When run_batch runs several collections at once, each run_collection process submits Ripple1d jobs
+and runs raster tasks on its own. A SharedBudget caps the total across processes: it is a counting
+semaphore backed by a SQLite table, one lease row per unit of work in flight. Leases are held under
+the collection id, so run_batch can release whatever a collection process left behind when it exits.
+
+run_batch points its collection processes at the budget database with RP_SHARED_BUDGET_DB. A
+collection run on its own has no budget database, and SharedBudget.from_config returns None.
+The database keeps SQLite's default rollback journal, so it may be shared by hosts over a network share
+(WAL needs shared memory on a single host).
+"""
+
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Budget names, capacity is configured per name in execution.BUDGETS
+JOB_BUDGET = "ripple1d_jobs"
+RASTER_BUDGET = "raster_tasks"
+
+
+class SharedBudget:
+    """
+    Counting semaphore across processes, backed by a SQLite database.
+    """
+
+    def __init__(self, db_path: str, name: str, capacity: int, holder: str, timeout: float = 30, poll_wait: float = 1):
+        """
+        Args:
+            db_path: Budget database, shared by all processes of the batch
+            name: Budget name, each name is a separate semaphore
+            capacity: Maximum number of leases held at once, across all holders
+            holder: Identifies the leases of this process, e.g. the collection id
+            timeout: SQLite connection timeout in seconds
+            poll_wait: Seconds between attempts when the budget is exhausted
+        """
+        self.db_path = db_path
+        self.name = name
+        self.capacity = capacity
+        self.holder = str(holder)
+        self.timeout = timeout
+        self.poll_wait = poll_wait
+        self.init_db(db_path, timeout)
+
+    @classmethod
+    def from_config(cls, config: dict, name: str, holder: str) -> "SharedBudget | None":
+        """
+        Get the named budget of the batch this process runs in.
+
+        Returns:
+            SharedBudget, or None when not run by a concurrent batch or the budget capacity is not set
+        """
+        db_path = config["execution"].get("SHARED_BUDGET_DB", "")
+        capacity = (config["execution"].get("BUDGETS") or {}).get(name, 0)
+        if not db_path or not capacity:
+            return None
+        return cls(db_path, name, capacity, holder, config["database"]["DB_CONN_TIMEOUT"])
+
+    @staticmethod
+    def init_db(db_path: str, timeout: float = 30) -> None:
+        """Create the leases table."""
+        conn = sqlite3.connect(db_path, timeout=timeout)
+        try:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS budget_leases (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    budget TEXT NOT NULL,
+                    holder TEXT NOT NULL,
+                    acquired_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS budget_leases_budget_idx ON budget_leases (budget);")
+            conn.commit()
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _get_connection(self):
+        # Autocommit mode, transactions are opened explicitly with BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def try_acquire(self) -> int | None:
+        """
+        Take a lease if the budget allows it, without waiting.
+
+        Returns:
+            Lease id, or None if the budget is exhausted
+        """
+        with self._get_connection() as conn:
+            # Take the write lock before counting, so two processes can't both take the last lease
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                (in_use,) = conn.execute("SELECT COUNT(*) FROM budget_leases WHERE budget = ?", (self.name,)).fetchone()
+                if in_use >= self.capacity:
+                    conn.execute("ROLLBACK")
+                    return None
+                cursor = conn.execute(
+                    "INSERT INTO budget_leases (budget, holder) VALUES (?, ?)",
+                    (self.name, self.holder),
+                )
+                conn.execute("COMMIT")
+                return cursor.lastrowid
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def acquire(self) -> int:
+        """
+        Take a lease, waiting until the budget allows it.
+
+        Returns:
+            Lease id
+        """
+        while (lease_id := self.try_acquire()) is None:
+            time.sleep(self.poll_wait)
+        return lease_id
+
+    def release(self, lease_id: int) -> None:
+        """Return a lease."""
+        with self._get_connection() as conn:
+            conn.execute("DELETE FROM budget_leases WHERE id = ?", (lease_id,))
+
+    @contextmanager
+    def lease(self):
+        """Hold a lease for the duration of the block."""
+        lease_id = self.acquire()
+        try:
+            yield lease_id
+        finally:
+            self.release(lease_id)
+
+    @staticmethod
+    def release_holder(db_path: str, holder: str, timeout: float = 30) -> int:
+        """
+        Return all leases of a holder, in every budget. Used by run_batch when a collection process exits.
+
+        Returns:
+            Number of leases released
+        """
+        conn = sqlite3.connect(db_path, timeout=timeout)
+        try:
+            cursor = conn.execute("DELETE FROM budget_leases WHERE holder = ?", (str(holder),))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
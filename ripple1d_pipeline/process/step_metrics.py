@@ -0,0 +1,111 @@
+import logging
+import math
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from ..setup.database import Database
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    """Nearest-rank percentile (q in 0-100) of values, None if there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+class StepSpan:
+    """
+    Timing and entity counts of one run of a pipeline step, written as a row of the step_metrics table.
+
+    Phases (e.g. submit, wait, retry) are timed with phase(), counts per status are set in counts (retried
+    jobs are counted apart from the entities) and job durations, in minutes, in job_durations.
+    """
+
+    def __init__(self, step_name: str, step_kind: str):
+        self.step_name = step_name
+        self.step_kind = step_kind
+        self.start_time = datetime.now()
+        self.end_time = None
+        self.phases = {}
+        self.counts = {}
+        self.job_durations = []
+        self.step_status = "running"
+        self.error_message = None
+        self._t_start = time.perf_counter()
+        self._duration = None
+
+    @contextmanager
+    def phase(self, name: str):
+        """Add the time spent in the block to phase name."""
+        t_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - t_start
+
+    def end(self, error: BaseException | None = None) -> None:
+        self._duration = time.perf_counter() - self._t_start
+        self.end_time = datetime.now()
+        self.step_status = "failed" if error is not None else "completed"
+        self.error_message = str(error) if error is not None else None
+
+    def row(self) -> dict:
+        """Column values of the step_metrics row."""
+        return {
+            "step_name": self.step_name,
+            "step_kind": self.step_kind,
+            "step_status": self.step_status,
+            "start_time": self.start_time.isoformat(sep=" ", timespec="seconds"),
+            "end_time": self.end_time.isoformat(sep=" ", timespec="seconds") if self.end_time else None,
+            "duration_s": self._duration,
+            "submit_s": self.phases.get("submit"),
+            "wait_s": self.phases.get("wait"),
+            "entities": (
+                sum(count for status, count in self.counts.items() if status != "retried") if self.counts else None
+            ),
+            "succeeded": self.counts.get("succeeded"),
+            "failed": self.counts.get("failed"),
+            "not_accepted": self.counts.get("not_accepted"),
+            "unknown": self.counts.get("unknown"),
+            "skipped": self.counts.get("skipped"),
+            "retried": self.counts.get("retried"),
+            "retry_s": self.phases.get("retry"),
+            "job_p50_min": percentile(self.job_durations, 50),
+            "job_p95_min": percentile(self.job_durations, 95),
+            "job_max_min": max(self.job_durations) if self.job_durations else None,
+            "error_message": self.error_message,
+        }
+
+
+@contextmanager
+def record_step(database: Database | None, step_name: str, step_kind: str = "local"):
+    """
+    Time the block as a span of step_name and write it to the step_metrics table, also when the block raises.
+    Writing the span never fails the step. Nothing is written when database is None or step metrics are off.
+
+    Args:
+        database: Collection database
+        step_name: Processing step name, e.g. "load_conflation"
+        step_kind: "api" for steps run as Ripple1d jobs, "local" for steps run by the pipeline itself
+
+    Yields:
+        StepSpan to set counts, job durations and phases on
+    """
+    span = StepSpan(step_name, step_kind)
+    try:
+        yield span
+    except BaseException as e:
+        span.end(e)
+        raise
+    else:
+        span.end()
+    finally:
+        if database is not None and database.step_metrics:
+            try:
+                database.insert_step_metrics(span.row())
+            except Exception as e:
+                logger.warning(f"Could not record step metrics of {step_name}: {e}")
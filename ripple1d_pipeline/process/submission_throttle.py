@@ -0,0 +1,99 @@
+"""
+Admission control of Ripple1d job submissions, shared by all the steps submitting through a JobClient.
+
+Submissions take tokens from a bucket refilled at an adaptive rate (AIMD): each job accepted in less than
+the latency target adds to the rate, each sign of back-pressure (a slow acceptance, a 429/5xx response, a
+refused or timed out connection) cuts it by a factor, once per cooldown. The rate so settles just below
+what the server can take, which keeps its Huey queue fed without flooding it.
+
+Submissions refused for back-pressure are resubmitted at the throttled rate instead of counting as failed
+attempts, so no entity ends not_accepted because the server was momentarily saturated.
+
+Off by default (ENABLED False): submissions are then sent as fast as possible, as before the throttle.
+"""
+
+import logging
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class SubmissionThrottle:
+    """
+    Thread safe token bucket with an AIMD rate, in submissions per second.
+    """
+
+    def __init__(self, settings: dict):
+        """
+        Args:
+            settings: submission_throttle config section
+        """
+        self.enabled = settings.get("ENABLED", False)
+        self.min_rate = settings.get("MIN_RATE", 0.1)
+        self.max_rate = settings.get("MAX_RATE", 50)
+        self.rate = min(max(settings.get("INITIAL_RATE", 5), self.min_rate), self.max_rate)
+        self.increase = settings.get("ADDITIVE_INCREASE", 0.5)
+        self.decrease = settings.get("MULTIPLICATIVE_DECREASE", 0.5)
+        self.burst = settings.get("BURST", 5)
+        self.latency_target = settings.get("LATENCY_TARGET_SECONDS", 2)
+        self.cooldown = settings.get("DECREASE_COOLDOWN_SECONDS", 5)
+        self.backpressure_statuses = set(settings.get("BACKPRESSURE_STATUS_CODES", [429, 500, 502, 503, 504]))
+        self.max_wait_seconds = settings.get("MAX_WAIT_MINUTES", 10) * 60
+        self._tokens = float(self.burst)
+        self._refill_time = time.monotonic()
+        self._decrease_time = float("-inf")
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict) -> "SubmissionThrottle":
+        return cls(config.get("submission_throttle", {}))
+
+    def acquire(self) -> None:
+        """Wait for a submission token."""
+        if not self.enabled:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._refill_time) * self.rate)
+                self._refill_time = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def is_backpressure(self, response: requests.Response | None, error: Exception | None = None) -> bool:
+        """Whether a refused submission means the server is saturated, rather than the job being invalid."""
+        if not self.enabled:
+            return False
+        if response is not None:
+            return response.status_code in self.backpressure_statuses
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+    def accepted(self, latency: float) -> None:
+        """Adapt the rate to a job accepted after latency seconds."""
+        if not self.enabled:
+            return
+        if latency > self.latency_target:
+            self.backpressure(f"job accepted in {latency:.1f} s")
+            return
+        with self._lock:
+            self.rate = min(self.rate + self.increase, self.max_rate)
+
+    def backpressure(self, reason: str) -> None:
+        """Cut the rate, at most once per cooldown, as responses to the same saturation arrive together."""
+        if not self.enabled:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if now - self._decrease_time < self.cooldown:
+                return
+            self._decrease_time = now
+            self.rate = max(self.rate * self.decrease, self.min_rate)
+            self._tokens = min(self._tokens, 0.0)
+            rate = self.rate
+        logger.info(f"Ripple1d server back-pressure ({reason}), submissions throttled to {rate:.2f}/s")
@@ -0,0 +1,165 @@
+"""
+Job timeouts learned from the run times of earlier jobs.
+
+The run time of each successful job is kept in the job_run_times table of a history database shared by the
+collections of the fleet (the monitoring database by default), with the ras length of its reach. Once a step
+has enough history, the timeout of a job is a high quantile of the step's run times, with a margin, scaled
+by the ras length of the job's reach relative to the step's median: long reaches get proportionally more
+time, short reaches are not left hanging for the time of the longest. Run times are normalized by the same
+scale before taking the quantile, so the quantile is that of a median-length reach.
+
+Steps with too little history fall back to the static timeout of the step. Jobs without ras length (model
+steps, reaches missing conflation metrics) get the timeout of a median length reach. Only successful jobs are
+learned from, jobs cut off by their timeout never are, so the history underestimates slow jobs: a learned
+timeout is never below MIN_STATIC_FRACTION of the step's static timeout.
+"""
+
+import logging
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+from .step_metrics import percentile
+
+logger = logging.getLogger(__name__)
+
+
+class TimeoutPolicy:
+    """
+    Per-step job timeouts, in minutes, learned from the job_run_times history.
+    """
+
+    def __init__(self, settings: dict, history_db: str | None, ripple1d_version: str, collection_id: str):
+        """
+        Args:
+            settings: timeouts config section
+            history_db: Run time history database, None to use static timeouts only
+            ripple1d_version: Only run times of this Ripple1d version are learned from
+            collection_id: Collection the recorded run times come from
+        """
+        self.adaptive = settings.get("ADAPTIVE", False) and bool(history_db)
+        self.history_db = history_db
+        self.ripple1d_version = ripple1d_version
+        self.collection_id = str(collection_id)
+        self.min_samples = settings.get("MIN_SAMPLES", 50)
+        self.quantile = settings.get("QUANTILE", 0.99)
+        self.margin = settings.get("MARGIN", 2.0)
+        self.min_scale = settings.get("MIN_SCALE", 0.5)
+        self.max_scale = settings.get("MAX_SCALE", 5)
+        self.min_minutes = settings.get("MIN_MINUTES", 3)
+        self.min_static_fraction = settings.get("MIN_STATIC_FRACTION", 1.0)
+        self.max_minutes = settings.get("MAX_MINUTES", 480)
+        self.history_window = settings.get("HISTORY_WINDOW", 5000)
+        self.timeout = settings.get("DB_CONN_TIMEOUT", 30)
+        # Step -> (median ras length, quantile of normalized run times), None when the step has too little history
+        self._models = {}
+        if self.adaptive:
+            try:
+                self.init_db()
+            except sqlite3.Error as e:
+                logger.warning(f"Job run time history {history_db} not available, static timeouts used: {e}")
+                self.adaptive = False
+
+    @classmethod
+    def from_config(cls, config: dict, collection_id: str) -> "TimeoutPolicy":
+        settings = {**config.get("timeouts", {}), "DB_CONN_TIMEOUT": config["database"]["DB_CONN_TIMEOUT"]}
+        history_db = settings.get("HISTORY_DB_PATH") or config["paths"].get("MONITORING_DB_PATH") or None
+        return cls(settings, history_db, config["RIPPLE1D_VERSION"], collection_id)
+
+    @contextmanager
+    def _get_connection(self):
+        conn = sqlite3.connect(self.history_db, timeout=self.timeout)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def init_db(self) -> None:
+        """Create the job_run_times table."""
+        with self._get_connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS job_run_times (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    process_name TEXT NOT NULL,
+                    ripple1d_version TEXT,
+                    collection_id TEXT,
+                    ras_length REAL,
+                    run_min REAL NOT NULL,
+                    record_time TIMESTAMP
+                );
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS job_run_times_process_idx ON job_run_times (process_name, ripple1d_version);"
+            )
+            conn.commit()
+
+    def _scale(self, ras_length: float | None, median_length: float | None) -> float:
+        if not ras_length or not median_length:
+            return 1.0
+        return min(max(ras_length / median_length, self.min_scale), self.max_scale)
+
+    def _model(self, process_name: str) -> tuple[float | None, float] | None:
+        """Learn, once per policy, the median ras length and run time quantile of a step."""
+        if process_name in self._models:
+            return self._models[process_name]
+        model = None
+        try:
+            with self._get_connection() as conn:
+                samples = conn.execute(
+                    "SELECT ras_length, run_min FROM job_run_times WHERE process_name = ? AND ripple1d_version = ? "
+                    "ORDER BY id DESC LIMIT ?",
+                    (process_name, self.ripple1d_version, self.history_window),
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read the job run time history of {process_name}: {e}")
+            samples = []
+        if len(samples) >= self.min_samples:
+            median_length = percentile([length for length, _ in samples if length], 50)
+            normalized = [run_min / self._scale(length, median_length) for length, run_min in samples]
+            model = (median_length, percentile(normalized, self.quantile * 100))
+            logger.info(
+                f"{process_name} timeouts learned from {len(samples)} jobs: "
+                f"{self.margin * model[1]:.1f} minutes for a reach of median ras length {median_length}"
+            )
+        self._models[process_name] = model
+        return model
+
+    def timeout_for(self, process_name: str, ras_length: float | None, static_timeout: float) -> float:
+        """
+        Timeout in minutes of a job of process_name on a reach of ras_length, static_timeout while the step
+        has too little history. A learned timeout is at least min_static_fraction of static_timeout.
+        """
+        model = self._model(process_name) if self.adaptive else None
+        if model is None:
+            return static_timeout
+        median_length, normalized_quantile = model
+        minutes = self.margin * normalized_quantile * self._scale(ras_length, median_length)
+        floor = max(self.min_minutes, self.min_static_fraction * static_timeout)
+        return round(min(max(minutes, floor), max(self.max_minutes, floor)), 2)
+
+    def record(self, process_name: str, run_times: list[tuple[float | None, float]]) -> None:
+        """
+        Add the run times of successful jobs to the history.
+
+        Args:
+            process_name: Processing step name
+            run_times: (ras length or None, run time in minutes) of each job
+        """
+        if not self.adaptive or not run_times:
+            return
+        now = datetime.now().isoformat(sep=" ", timespec="seconds")
+        try:
+            with self._get_connection() as conn:
+                conn.executemany(
+                    "INSERT INTO job_run_times (process_name, ripple1d_version, collection_id, ras_length, run_min, "
+                    "record_time) VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (process_name, self.ripple1d_version, self.collection_id, length, run_min, now)
+                        for length, run_min in run_times
+                    ],
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not record the job run times of {process_name}: {e}")
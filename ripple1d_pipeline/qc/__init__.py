@@ -1,12 +1,17 @@
-import pandas as pd
+from ..lazy_imports import attach
 
-from .flows2fim import run_flows2fim
-from .jobs_report import create_failed_jobs_report, create_timedout_jobs_report
-from .purge import delete_reach_data
-from .utils import *
-
-# Allows displaying the full content in cells
-pd.set_option("display.max_colwidth", None)
-# Display all rows
-# pd.set_option('display.max_rows', None)
-pd.set_option("display.max_columns", None)
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    {
+        "run_flows2fim": "flows2fim",
+        "create_job_timeline_report": "job_timeline",
+        "get_job_timeline_df": "job_timeline",
+        "job_timeline_svg": "job_timeline",
+        "summarize_job_timeline": "job_timeline",
+        "create_failed_jobs_report": "jobs_report",
+        "create_timedout_jobs_report": "jobs_report",
+        "delete_reach_data": "purge",
+        "copy_qc_map": "utils",
+        "dismiss_timedout_jobs": "utils",
+    },
+)
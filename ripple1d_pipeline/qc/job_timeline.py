@@ -0,0 +1,154 @@
+import logging
+from html import escape
+
+import pandas as pd
+
+from ..setup.collection_data import CollectionData
+from .jobs_report import write_df_to_excel
+
+logger = logging.getLogger(__name__)
+
+JOB_TIMELINE_COLUMNS = [
+    "job_id",
+    "process_name",
+    "entity_id",
+    "endpoint",
+    "job_status",
+    "accept_time",
+    "start_time",
+    "finish_time",
+    "dismiss_time",
+    "queue_wait_min",
+    "run_min",
+]
+# Bar colors of the processes, in order of first job
+PALETTE = ["#1f77b4", "#ff7f0e", "#2ca02c", "#9467bd", "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf"]
+FAILED_COLOR = "#d62728"
+
+
+def get_job_timeline_df(database) -> pd.DataFrame:
+    """job_timeline table as a DataFrame, times parsed, ordered by accept time."""
+    df = pd.DataFrame(database.get_job_timeline(), columns=JOB_TIMELINE_COLUMNS)
+    for column in ("accept_time", "start_time", "finish_time", "dismiss_time"):
+        df[column] = pd.to_datetime(df[column], errors="coerce")
+    return df
+
+
+def summarize_job_timeline(df: pd.DataFrame, by: list[str] | None = None) -> pd.DataFrame:
+    """
+    Queue wait and run time statistics, in minutes.
+
+    Args:
+        df: Job timeline, from get_job_timeline_df
+        by: Columns to group by, ["process_name"] (default) per step, ["process_name", "entity_id"] per reach
+
+    Returns:
+        One row per group with the job count, p50/p95/max queue wait and run time, and the group's share of
+        queue wait in its total (queue wait + run) time. A high share means the server was saturated.
+    """
+    by = by or ["process_name"]
+    grouped = df.groupby(by, sort=False)
+    summary = grouped.agg(
+        jobs=("job_id", "count"),
+        failed=("job_status", lambda status: int((status == "failed").sum())),
+        queue_wait_p50=("queue_wait_min", "median"),
+        queue_wait_p95=("queue_wait_min", lambda values: values.quantile(0.95)),
+        queue_wait_max=("queue_wait_min", "max"),
+        run_p50=("run_min", "median"),
+        run_p95=("run_min", lambda values: values.quantile(0.95)),
+        run_max=("run_min", "max"),
+        queue_wait_total=("queue_wait_min", "sum"),
+        run_total=("run_min", "sum"),
+    )
+    summary["queue_share"] = summary["queue_wait_total"] / (summary["queue_wait_total"] + summary["run_total"])
+    return summary.round(3).reset_index()
+
+
+def job_timeline_svg(df: pd.DataFrame, width: int = 1400, row_height: float = 4, label_width: int = 220) -> str:
+    """
+    Gantt chart of the jobs, one row per job grouped by process, as SVG.
+
+    Each job is drawn as a pale bar from accept to start (queue wait) followed by a solid bar from start to
+    finish (run). Failed jobs are red. Jobs without start time are drawn as queue wait up to their dismissal.
+    """
+    df = df.dropna(subset=["accept_time"])
+    if df.empty:
+        return f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="40"><text y="25">No jobs</text></svg>'
+
+    origin = df["accept_time"].min()
+    end = pd.concat([df["accept_time"], df["start_time"], df["finish_time"], df["dismiss_time"]]).max()
+    total_min = max((end - origin).total_seconds() / 60, 1e-3)
+    plot_width = width - label_width - 20
+    header = 40
+
+    def x(time) -> float:
+        return label_width + (time - origin).total_seconds() / 60 / total_min * plot_width
+
+    def bar(x_start: float, x_end: float, y: float, fill: str, opacity: float, title: str) -> str:
+        return (
+            f'<rect x="{x_start:.1f}" y="{y:.1f}" width="{max(x_end - x_start, 0.5):.1f}" '
+            f'height="{row_height * 0.8:.1f}" fill="{fill}" fill-opacity="{opacity}"><title>{title}</title></rect>'
+        )
+
+    processes = list(dict.fromkeys(df["process_name"]))
+    height = header + len(df) * row_height + len(processes) * 34 + 20
+    parts = [
+        (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height:.0f}" '
+            'font-family="sans-serif" font-size="11">'
+        ),
+        (
+            f'<text x="10" y="16" font-size="13">{len(df)} jobs, {total_min:.1f} minutes from first accept, '
+            "pale: queue wait, solid: run, red: failed</text>"
+        ),
+    ]
+
+    # Time axis, about 10 ticks at a round number of minutes
+    step = next((s for s in (0.5, 1, 2, 5, 10, 15, 30, 60, 120, 240) if total_min / s <= 10), 480)
+    tick = 0.0
+    while tick <= total_min:
+        tick_x = label_width + tick / total_min * plot_width
+        parts.append(f'<line x1="{tick_x:.1f}" y1="{header - 6}" x2="{tick_x:.1f}" y2="{height}" stroke="#ddd"/>')
+        parts.append(f'<text x="{tick_x:.1f}" y="{header - 10}" text-anchor="middle">{tick:g} min</text>')
+        tick += step
+
+    y = header
+    for index, process_name in enumerate(processes):
+        color = PALETTE[index % len(PALETTE)]
+        jobs = df[df["process_name"] == process_name]
+        parts.append(f'<text x="10" y="{y + 14:.1f}" font-weight="bold">{escape(str(process_name))}</text>')
+        parts.append(f'<text x="10" y="{y + 27:.1f}">{len(jobs)} jobs</text>')
+        y += 34
+        for job in jobs.itertuples():
+            fill = FAILED_COLOR if job.job_status == "failed" else color
+            label = f"{escape(str(job.entity_id))} {job.job_id}"
+            queue_end = job.start_time if pd.notna(job.start_time) else job.dismiss_time
+            if pd.notna(queue_end):
+                wait = f"queue {job.queue_wait_min} min"
+                if pd.isna(job.start_time):
+                    wait = f"{job.job_status}, not started"
+                parts.append(bar(x(job.accept_time), x(queue_end), y, fill, 0.3, f"{label} {wait}"))
+            if pd.notna(job.start_time) and pd.notna(job.finish_time):
+                parts.append(bar(x(job.start_time), x(job.finish_time), y, fill, 1, f"{label} run {job.run_min} min"))
+            y += row_height
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+def create_job_timeline_report(collection: CollectionData, database) -> None:
+    """
+    Write the queue wait and run time statistics per step and per reach to the job timeline report, and the
+    Gantt chart of all jobs to job_timeline.svg.
+    """
+    df = get_job_timeline_df(database)
+    if df.empty:
+        logger.info("No job timeline recorded, no job timeline report")
+        return
+
+    write_df_to_excel(summarize_job_timeline(df), "steps", collection.job_timeline_report_path)
+    write_df_to_excel(
+        summarize_job_timeline(df, ["process_name", "entity_id"]), "reaches", collection.job_timeline_report_path
+    )
+    with open(collection.job_timeline_chart_path, "w") as svg_file:
+        svg_file.write(job_timeline_svg(df))
+    logger.info(f"Job timeline chart written to {collection.job_timeline_chart_path}")
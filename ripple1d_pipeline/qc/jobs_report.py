@@ -7,6 +7,12 @@ from ..setup.collection_data import CollectionData
 
 logger = logging.getLogger(__name__)
 
+# Allows displaying the full content in cells
+pd.set_option("display.max_colwidth", None)
+# Display all rows
+# pd.set_option('display.max_rows', None)
+pd.set_option("display.max_columns", None)
+
 
 def write_df_to_excel(df: pd.DataFrame, process_name: str, file_path: str) -> None:
     """
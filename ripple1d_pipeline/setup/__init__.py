@@ -1,6 +1,13 @@
-from .collection_data import CollectionData
-from .create_discharge_files import create_discharge_files
-from .create_src_models_gpkg import create_src_models_gpkg
-from .database import Database
-from .filter_nwm_reaches import filter_nwm_reaches
-from .stac_importer import STACImporter
+from ..lazy_imports import attach
+
+__getattr__, __dir__, __all__ = attach(
+    __name__,
+    {
+        "CollectionData": "collection_data",
+        "create_discharge_files": "create_discharge_files",
+        "create_src_models_gpkg": "create_src_models_gpkg",
+        "Database": "database",
+        "filter_nwm_reaches": "filter_nwm_reaches",
+        "STACImporter": "stac_importer",
+    },
+)
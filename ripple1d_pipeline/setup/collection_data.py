@@ -29,9 +29,14 @@ class CollectionData:
         self.submodels_dir = os.path.join(self.root_dir, "submodels")
         self.library_dir = os.path.join(self.root_dir, "library")
         self.extent_library_dir = os.path.join(self.root_dir, "library_extent")
+        self.extent_manifest_path = os.path.join(self.root_dir, "library_extent_manifest.sqlite")
+        self.extent_footprints_path = os.path.join(self.root_dir, "library_extent_footprints.gpkg")
+        self.mosaics_dir = os.path.join(self.root_dir, "mosaics")
         self.f2f_start_file = os.path.join(self.root_dir, "start_reaches.csv")
         self.failed_jobs_report_path = os.path.join(self.root_dir, "failed_jobs_report.xlsx")
         self.timedout_jobs_report_path = os.path.join(self.root_dir, "timedout_jobs_report.xlsx")
+        self.job_timeline_report_path = os.path.join(self.root_dir, "job_timeline_report.xlsx")
+        self.job_timeline_chart_path = os.path.join(self.root_dir, "job_timeline.svg")
         self.bridge_tile_index_path = self.config["paths"].get("BRIDGE_TILE_INDEX_PATH", "")
 
     def create_folders(self):
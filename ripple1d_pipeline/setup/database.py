@@ -7,6 +7,14 @@ from .collection_data import CollectionData
 
 logger = logging.getLogger(__name__)
 
+# Columns added to existing tables since collection databases were first created, as (table, column, type)
+ADDED_COLUMNS = [
+    ("processing", "ras_length", "REAL"),
+    ("step_metrics", "skipped", "INTEGER"),
+    ("step_metrics", "retried", "INTEGER"),
+    ("step_metrics", "retry_s", "REAL"),
+]
+
 
 class Database:
     """
@@ -19,6 +27,8 @@ class Database:
         self.source_models_dir = collection.source_models_dir  # Not used currently
         self.timeout = collection.config["database"]["DB_CONN_TIMEOUT"]
         self.submodels_dir = collection.submodels_dir
+        self.step_metrics = collection.config.get("metrics", {}).get("STEP_METRICS", True)
+        self.job_timeline = collection.config.get("metrics", {}).get("JOB_TIMELINE", False)
 
     @contextmanager
     def _get_connection(self):
@@ -245,6 +255,7 @@ class Database:
                     collection_id TEXT,
                     model_id TEXT,
                     eclipsed BOOL CHECK(eclipsed IN (0, 1)),
+                    ras_length REAL,
                     extract_submodel_job_id TEXT,
                     extract_submodel_status TEXT,
                     create_ras_terrain_job_id TEXT,
@@ -278,6 +289,8 @@ class Database:
                 """
             )
 
+            Database._create_run_tables(cursor)
+
             # # Create metrics table to store reach-specific metrics
             # cursor.execute(
             #     """
@@ -303,6 +316,126 @@ class Database:
         finally:
             connection.close()
 
+    @staticmethod
+    def _create_run_tables(cursor: sqlite3.Cursor) -> None:
+        """
+        Create the tables recording how the collection was processed (job endpoints, step metrics, job timeline
+        and attempts, bridge masked grids), which collections set up by an earlier version lack.
+        """
+        # Create job_endpoints table to store the Ripple1d endpoint each job was submitted to
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS job_endpoints (
+                job_id TEXT PRIMARY KEY,
+                endpoint TEXT
+            );
+        """
+        )
+
+        # Create step_metrics table to store one timing span per run of a processing step
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS step_metrics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                step_name TEXT,
+                step_kind TEXT CHECK(step_kind IN ('api','local')),
+                step_status TEXT,
+                start_time TIMESTAMP,
+                end_time TIMESTAMP,
+                duration_s REAL,
+                submit_s REAL,
+                wait_s REAL,
+                entities INTEGER,
+                succeeded INTEGER,
+                failed INTEGER,
+                not_accepted INTEGER,
+                unknown INTEGER,
+                skipped INTEGER,
+                retried INTEGER,
+                retry_s REAL,
+                job_p50_min REAL,
+                job_p95_min REAL,
+                job_max_min REAL,
+                error_message TEXT
+            );
+        """
+        )
+
+        # Create job_timeline table to store the lifecycle of each finished Ripple1d job
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS job_timeline (
+                job_id TEXT PRIMARY KEY,
+                process_name TEXT,
+                entity_id TEXT,
+                endpoint TEXT,
+                job_status TEXT,
+                accept_time TIMESTAMP,
+                start_time TIMESTAMP,
+                finish_time TIMESTAMP,
+                dismiss_time TIMESTAMP,
+                queue_wait_min REAL,
+                run_min REAL
+            );
+        """
+        )
+
+        cursor.execute(
+            """
+            CREATE INDEX IF NOT EXISTS job_timeline_process_name_idx ON job_timeline (process_name, entity_id);
+        """
+        )
+
+        # Create job_attempts table to store each attempt of the entities whose first job did not succeed
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS job_attempts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                process_name TEXT,
+                entity_id TEXT,
+                attempt INTEGER,
+                job_id TEXT,
+                job_status TEXT,
+                error_message TEXT,
+                retried BOOLEAN,
+                attempt_time TIMESTAMP
+            );
+        """
+        )
+
+        # Create bridge_masked_grids table to store the depth grids already bridge masked, with their size and
+        # mtime after masking, so masking is never applied twice to a grid
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bridge_masked_grids (
+                grid TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime_ns INTEGER,
+                modified BOOLEAN,
+                masked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """
+        )
+
+    @staticmethod
+    def migrate_db(collection: type[CollectionData]) -> None:
+        """
+        Bring the database of a collection set up by an earlier version up to date, creating the tables and
+        adding the columns introduced since. Does nothing on an up to date database.
+        """
+        connection = sqlite3.connect(collection.db_path, timeout=collection.config["database"]["DB_CONN_TIMEOUT"])
+        try:
+            cursor = connection.cursor()
+            for table, column, column_type in ADDED_COLUMNS:
+                columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table});")]
+                if columns and column not in columns:
+                    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type};")
+                    logger.info(f"Added column {column} to table {table} of {collection.db_path}")
+            Database._create_run_tables(cursor)
+            connection.commit()
+        finally:
+            connection.close()
+
     @staticmethod
     def insert_models(models_data: dict, collection: type[CollectionData]) -> None:
         """ """
@@ -349,6 +482,81 @@ class Database:
 
         self.executemany_dml_query(update_query, params)
 
+    def insert_job_endpoint(self, job_id: str, endpoint: str) -> None:
+        """
+        Records the Ripple1d endpoint a job was submitted to.
+        """
+        self.execute_dml_query(
+            "INSERT OR REPLACE INTO job_endpoints (job_id, endpoint) VALUES (?, ?);",
+            (job_id, endpoint),
+        )
+
+    def get_job_endpoint(self, job_id: str) -> str | None:
+        """
+        Returns the Ripple1d endpoint a job was submitted to, None if not recorded.
+        """
+        rows = self.execute_select_query("SELECT endpoint FROM job_endpoints WHERE job_id = ?;", (job_id,))
+        return rows[0][0] if rows else None
+
+    def insert_step_metrics(self, metrics: dict) -> None:
+        """
+        Records a step span, metrics maps step_metrics columns to values.
+        """
+        columns = ", ".join(metrics)
+        placeholders = ", ".join("?" for _ in metrics)
+        self.execute_dml_query(
+            f"INSERT INTO step_metrics ({columns}) VALUES ({placeholders});",
+            tuple(metrics.values()),
+        )
+
+    def insert_job_timeline(self, rows: list[tuple]) -> None:
+        """
+        Records job lifecycles, rows in job_timeline column order. A job already recorded is replaced.
+        """
+        self.executemany_dml_query(
+            "INSERT OR REPLACE INTO job_timeline VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);",
+            rows,
+        )
+
+    def insert_job_attempts(self, rows: list[tuple]) -> None:
+        """
+        Records job attempts, rows of (process_name, entity_id, attempt, job_id, job_status, error_message,
+        retried, attempt_time).
+        """
+        self.executemany_dml_query(
+            "INSERT INTO job_attempts (process_name, entity_id, attempt, job_id, job_status, error_message, retried, "
+            "attempt_time) VALUES (?, ?, ?, ?, ?, ?, ?, ?);",
+            rows,
+        )
+
+    def get_bridge_masked_grids(self) -> dict[str, tuple[int, int]]:
+        """
+        Returns depth grid (path relative to the library) -> (size, mtime_ns) of the grids already bridge masked.
+        """
+        rows = self.execute_select_query("SELECT grid, size, mtime_ns FROM bridge_masked_grids;")
+        return {grid: (size, mtime_ns) for grid, size, mtime_ns in rows}
+
+    def insert_bridge_masked_grids(self, rows: list[tuple]) -> None:
+        """
+        Records bridge masked depth grids, rows of (grid, size, mtime_ns, modified). A grid already recorded is
+        replaced.
+        """
+        self.executemany_dml_query(
+            "INSERT OR REPLACE INTO bridge_masked_grids (grid, size, mtime_ns, modified, masked_at) "
+            "VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP);",
+            rows,
+        )
+
+    def get_job_timeline(self, process_name: str | None = None) -> list[tuple]:
+        """
+        Returns job_timeline rows, of one process if given, ordered by accept time.
+        """
+        if process_name is None:
+            return self.execute_select_query("SELECT * FROM job_timeline ORDER BY accept_time;")
+        return self.execute_select_query(
+            "SELECT * FROM job_timeline WHERE process_name = ? ORDER BY accept_time;", (process_name,)
+        )
+
     def update_model_id_and_eclipsed(self, data: dict, model_id: str) -> None:
         """
         Updates the model_id and eclipsed status in the processing table
@@ -364,6 +572,25 @@ class Database:
             eclipsed = value["eclipsed"] == True
             self.execute_dml_query(update_query, (model_id, eclipsed, key))
 
+    def update_ras_lengths(self, reach_lengths: list[tuple[int, float]]) -> None:
+        """
+        Updates the ras length of reaches, from the conflation metrics of the model they are conflated to.
+        """
+        self.executemany_dml_query(
+            "UPDATE processing SET ras_length = ? WHERE reach_id = ?;",
+            [(length, reach_id) for reach_id, length in reach_lengths],
+        )
+
+    def get_ras_lengths(self, reach_ids: list[int]) -> dict[int, float]:
+        """
+        Returns reach id -> ras length of the given reaches that have one.
+        """
+        rows = self.execute_select_query(
+            "SELECT reach_id, ras_length FROM processing WHERE ras_length IS NOT NULL AND ras_length > 0;"
+        )
+        wanted = set(reach_ids)
+        return {reach_id: length for reach_id, length in rows if reach_id in wanted}
+
     def get_valid_reaches(self) -> list[tuple[int, int]]:
         """
         Get reaches that are not eclipsed by joining the network and processing tables.
@@ -495,6 +722,20 @@ class Database:
         """
         return self.execute_select_query(query)
 
+    def get_completed_entities(self, process_name: str, process_table: str = "processing") -> dict:
+        """
+        Retrieves entities whose process_name job already succeeded, to resume a collection.
+        Steps record "succeeded", the ikwse steps "successful", both count.
+
+        Returns:
+            Dict of entity id -> job id
+        """
+        completed = {}
+        for status in ("succeeded", "successful"):
+            for entity_id, job_id, _ in self.get_entities_by_process_and_status(process_name, status, process_table):
+                completed[entity_id] = job_id
+        return completed
+
     def update_table_with_job_status(self, process_table: str, process_name: str, job_status, entity):
 
         query = f"""
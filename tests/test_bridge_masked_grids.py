@@ -0,0 +1,57 @@
+"""Checkpoint of the depth grids already bridge masked."""
+
+import os
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from ripple1d_pipeline.setup.database import Database
+
+
+@pytest.fixture
+def collection(tmp_path):
+    # Collection database set up by an earlier version, without the bridge_masked_grids table
+    db_path = str(tmp_path / "collection.gpkg")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE processing (reach_id INTEGER PRIMARY KEY)")
+    conn.commit()
+    conn.close()
+    return SimpleNamespace(
+        db_path=db_path,
+        stac_collection_id="collection_a",
+        source_models_dir=str(tmp_path / "source_models"),
+        submodels_dir=str(tmp_path / "submodels"),
+        config={"database": {"DB_CONN_TIMEOUT": 5}},
+    )
+
+
+def test_masked_grids_recorded(collection):
+    Database.migrate_db(collection)
+    database = Database(collection)
+    assert database.get_bridge_masked_grids() == {}
+
+    database.insert_bridge_masked_grids([("10/z_0_0/1.tif", 100, 1, True), ("10/z_0_0/2.tif", 200, 2, False)])
+    # Masked again after create_fim_lib rewrote it
+    database.insert_bridge_masked_grids([("10/z_0_0/1.tif", 110, 3, True)])
+
+    assert database.get_bridge_masked_grids() == {"10/z_0_0/1.tif": (110, 3), "10/z_0_0/2.tif": (200, 2)}
+
+
+def test_rewritten_grid_not_masked(tmp_path):
+    pytest.importorskip("osgeo")
+    from ripple1d_pipeline.process.bridge_processor import is_masked, masked_grid_entry
+
+    library_dir = tmp_path / "library"
+    depth_path = library_dir / "10" / "z_0_0" / "1.tif"
+    depth_path.parent.mkdir(parents=True)
+    depth_path.write_bytes(b"masked depth")
+    grid, size, mtime_ns = masked_grid_entry(depth_path, library_dir)
+    assert grid == "10/z_0_0/1.tif"
+
+    masked = {grid: (size, mtime_ns)}
+    assert is_masked(depth_path, library_dir, masked)
+
+    os.utime(depth_path, ns=(mtime_ns, mtime_ns + 10**9))
+    assert not is_masked(depth_path, library_dir, masked)
+    assert not is_masked(depth_path, library_dir, {})
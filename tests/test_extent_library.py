@@ -0,0 +1,87 @@
+"""Extent TIFs of the native engine match those of the gdal_cli engine."""
+
+import shutil
+
+import numpy as np
+import pytest
+
+gdal = pytest.importorskip("osgeo.gdal")
+
+from ripple1d_pipeline.process.extent_library import (  # noqa: E402
+    EXTENT_NODATA,
+    create_extent_tif,
+    create_extent_tif_native,
+    depth_to_extent,
+)
+
+DEPTH_NODATA = -9999.0
+
+
+def write_depth_tif(path, depth):
+    ds = gdal.GetDriverByName("GTiff").Create(str(path), depth.shape[1], depth.shape[0], 1, gdal.GDT_Float32)
+    ds.SetGeoTransform((1000.0, 3.0, 0.0, 2000.0, 0.0, -3.0))
+    ds.SetProjection("EPSG:5070")
+    band = ds.GetRasterBand(1)
+    band.SetNoDataValue(DEPTH_NODATA)
+    band.WriteArray(depth)
+    ds = None
+
+
+def read_tif(path):
+    ds = gdal.Open(str(path))
+    band = ds.GetRasterBand(1)
+    result = band.ReadAsArray(), band.GetNoDataValue(), ds.GetGeoTransform()
+    ds = None
+    return result
+
+
+@pytest.fixture
+def depth_tif(tmp_path):
+    rng = np.random.default_rng(0)
+    depth = rng.uniform(-2, 5, size=(64, 80)).astype(np.float32)
+    depth[:, :10] = 0
+    depth[5:20, 30:50] = DEPTH_NODATA
+    path = tmp_path / "depth" / "10_12.tif"
+    path.parent.mkdir()
+    write_depth_tif(path, depth)
+    return path, depth
+
+
+def test_native_extent_values(depth_tif, tmp_path):
+    tif_path, depth = depth_tif
+    create_extent_tif_native(tif_path, tmp_path)
+
+    extent, nodata, geotransform = read_tif(tmp_path / tif_path.name)
+    assert nodata == EXTENT_NODATA
+    assert geotransform == (1000.0, 3.0, 0.0, 2000.0, 0.0, -3.0)
+    np.testing.assert_array_equal(extent, depth_to_extent(depth, DEPTH_NODATA))
+    assert set(np.unique(extent)) == {0, 1, EXTENT_NODATA}
+
+
+@pytest.mark.skipif(shutil.which("gdal_calc") is None, reason="gdal_calc not on PATH")
+def test_native_matches_gdal_cli(depth_tif, tmp_path):
+    tif_path, _ = depth_tif
+    native_dir, cli_dir, tmp_dir = tmp_path / "native", tmp_path / "gdal_cli", tmp_path / "tmp"
+    for path in (native_dir, cli_dir, tmp_dir):
+        path.mkdir()
+
+    create_extent_tif_native(tif_path, native_dir)
+    create_extent_tif(tif_path, tmp_dir, cli_dir)
+
+    native, native_nodata, native_gt = read_tif(native_dir / tif_path.name)
+    cli, cli_nodata, cli_gt = read_tif(cli_dir / tif_path.name)
+    assert native_nodata == cli_nodata
+    assert native_gt == cli_gt
+    np.testing.assert_array_equal(native, cli)
+
+
+def test_existing_extent_kept(depth_tif, tmp_path):
+    tif_path, _ = depth_tif
+    dest_tif = tmp_path / tif_path.name
+    dest_tif.write_bytes(b"existing")
+
+    create_extent_tif_native(tif_path, tmp_path)
+    assert dest_tif.read_bytes() == b"existing"
+
+    create_extent_tif_native(tif_path, tmp_path, overwrite=True)
+    assert read_tif(dest_tif)[1] == EXTENT_NODATA
@@ -0,0 +1,81 @@
+"""Extent manifest planning and orphan removal."""
+
+import os
+
+import pytest
+
+from ripple1d_pipeline.process.extent_manifest import ExtentManifest, file_hash, plan_extent_updates, remove_orphans
+
+
+def write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def manifest_entry(library_dir, tif_path):
+    st = tif_path.stat()
+    source = tif_path.relative_to(library_dir).as_posix()
+    return (source, st.st_size, st.st_mtime_ns, file_hash(tif_path), source)
+
+
+@pytest.fixture
+def library(tmp_path):
+    library_dir = tmp_path / "library"
+    tifs = [write(library_dir / "10" / "z_0_0" / f"{i}.tif", f"depth {i}".encode()) for i in range(3)]
+    return library_dir, tifs
+
+
+def test_plan_new_library(library, tmp_path):
+    library_dir, tifs = library
+    manifest = ExtentManifest(str(tmp_path / "manifest.sqlite"))
+
+    to_check, orphans, unchanged = plan_extent_updates(tifs, library_dir, manifest.load())
+    assert to_check == [(tif, None) for tif in tifs]
+    assert orphans == []
+    assert unchanged == 0
+
+
+def test_plan_unchanged_changed_and_orphans(library, tmp_path):
+    library_dir, tifs = library
+    manifest = ExtentManifest(str(tmp_path / "manifest.sqlite"))
+    gone = write(library_dir / "11" / "z_0_0" / "0.tif", b"removed later")
+    manifest.upsert([manifest_entry(library_dir, tif) for tif in tifs + [gone]])
+    recorded_hash = file_hash(tifs[1])
+
+    # Rewritten in place, e.g. by bridge masking, with a distinct mtime
+    write(tifs[1], b"masked depth 1")
+    st = tifs[1].stat()
+    os.utime(tifs[1], ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    gone.unlink()
+
+    to_check, orphans, unchanged = plan_extent_updates(tifs, library_dir, manifest.load())
+    assert to_check == [(tifs[1], recorded_hash)]
+    assert orphans == [("11/z_0_0/0.tif", "11/z_0_0/0.tif")]
+    assert unchanged == 2
+
+
+def test_upsert_replaces_entry(library, tmp_path):
+    library_dir, tifs = library
+    manifest = ExtentManifest(str(tmp_path / "manifest.sqlite"))
+    source, size, mtime_ns, digest, output = manifest_entry(library_dir, tifs[0])
+    manifest.upsert([(source, size, mtime_ns, "stale", output)])
+    manifest.upsert([(source, size, mtime_ns, digest, output)])
+
+    assert manifest.load() == {source: (size, mtime_ns, digest, output)}
+
+
+def test_remove_orphans(library, tmp_path):
+    library_dir, tifs = library
+    extent_dir = tmp_path / "library_extent"
+    manifest = ExtentManifest(str(tmp_path / "manifest.sqlite"))
+    manifest.upsert([manifest_entry(library_dir, tif) for tif in tifs])
+    orphan_extent = write(extent_dir / "10" / "z_0_0" / "0.tif", b"extent 0")
+    kept_extent = write(extent_dir / "10" / "z_0_0" / "1.tif", b"extent 1")
+
+    # The extent of the second orphan is already gone
+    remove_orphans(manifest, [("10/z_0_0/0.tif", "10/z_0_0/0.tif"), ("10/z_0_0/2.tif", "10/z_0_0/2.tif")], extent_dir)
+
+    assert not orphan_extent.exists()
+    assert kept_extent.exists()
+    assert list(manifest.load()) == ["10/z_0_0/1.tif"]
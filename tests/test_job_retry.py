@@ -0,0 +1,49 @@
+"""RetryPolicy classification of failed jobs and backoff."""
+
+from ripple1d_pipeline.process.job_retry import ERROR_LOOKUP_FAILED, RetryPolicy
+
+
+def test_retries_off_by_default():
+    policy = RetryPolicy({})
+    assert policy.max_attempts == 1
+    assert not policy.enabled
+    assert RetryPolicy({"MAX_ATTEMPTS": 3}).enabled
+
+
+def test_transient_errors_retryable():
+    policy = RetryPolicy({"MAX_ATTEMPTS": 3})
+    assert policy.is_retryable_error("sqlite3.OperationalError: database is locked")
+    assert policy.is_retryable_error("PermissionError: [WinError 32] The process cannot access the file")
+    assert policy.is_retryable_error("pywintypes.com_error: (-2147023170, 'The remote procedure call failed.')")
+    assert policy.is_retryable_error("ConnectionResetError: connection reset by peer")
+
+
+def test_other_errors_not_retryable():
+    policy = RetryPolicy({"MAX_ATTEMPTS": 3})
+    assert not policy.is_retryable_error("ValueError: cross section geometry is invalid")
+    assert not policy.is_retryable_error("No error message")
+    assert not policy.is_retryable_error("")
+    assert not policy.is_retryable_error(None)
+
+
+def test_failed_error_lookup_not_retryable():
+    policy = RetryPolicy({"MAX_ATTEMPTS": 3})
+    error = f"{ERROR_LOOKUP_FAILED}. Error: HTTPConnectionPool(host='localhost', port=80): connection refused"
+    assert not policy.is_retryable_error(error)
+
+
+def test_non_retryable_patterns_win():
+    policy = RetryPolicy({"MAX_ATTEMPTS": 3, "NON_RETRYABLE_ERRORS": ["Geometry"]})
+    assert not policy.is_retryable_error("TimeoutError while writing geometry")
+    assert policy.is_retryable_error("TimeoutError while writing the plan")
+
+
+def test_custom_retryable_patterns():
+    policy = RetryPolicy({"MAX_ATTEMPTS": 3, "RETRYABLE_ERRORS": ["Disk Full"]})
+    assert policy.is_retryable_error("OSError: disk full")
+    assert not policy.is_retryable_error("database is locked")
+
+
+def test_backoff():
+    policy = RetryPolicy({"BACKOFF_SECONDS": 30, "BACKOFF_FACTOR": 2, "MAX_BACKOFF_SECONDS": 100})
+    assert [policy.backoff(attempt) for attempt in (1, 2, 3, 4)] == [30, 60, 100, 100]
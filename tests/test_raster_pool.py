@@ -0,0 +1,68 @@
+"""RasterWorkerPool streams, and drops the tasks of a stage that stopped consuming its results."""
+
+import sqlite3
+import time
+
+import pytest
+
+from ripple1d_pipeline.process.raster_pool import RasterWorkerPool
+from ripple1d_pipeline.process.shared_budget import RASTER_BUDGET, SharedBudget
+
+
+def touch_worker(args):
+    marker_dir, i = args
+    time.sleep(0.02)
+    (marker_dir / f"{i}.done").touch()
+    return i
+
+
+def stage_tasks(marker_dir, count, stage):
+    for i in range(count):
+        yield (touch_worker, (marker_dir, f"{stage}_{i}"), stage)
+
+
+def consume_then_fail(pool, tasks, fail_after):
+    with pytest.raises(RuntimeError):
+        for n, _ in enumerate(pool.run(tasks), start=1):
+            if n == fail_after:
+                raise RuntimeError("stage failed")
+
+
+def held_leases(db_path):
+    conn = sqlite3.connect(db_path)
+    (count,) = conn.execute("SELECT COUNT(*) FROM budget_leases").fetchone()
+    conn.close()
+    return count
+
+
+def test_results_of_all_tasks(tmp_path):
+    with RasterWorkerPool(2) as pool:
+        results = sorted(result for _, result in pool.run(stage_tasks(tmp_path, 10, "stage1")))
+    assert results == sorted(f"stage1_{i}" for i in range(10))
+
+
+def test_abandoned_tasks_dropped(tmp_path):
+    with RasterWorkerPool(2) as pool:
+        consume_then_fail(pool, stage_tasks(tmp_path, 200, "stage1"), fail_after=4)
+        # The next stage runs on the restarted pool, and is not queued behind the failed one
+        assert len(list(pool.run(stage_tasks(tmp_path, 5, "stage2")))) == 5
+    assert len(list(tmp_path.glob("stage1_*.done"))) < 200
+
+
+def test_budget_leases_released_on_failure(tmp_path):
+    db_path = str(tmp_path / "budget.sqlite")
+    budget = SharedBudget(db_path, RASTER_BUDGET, 2, "collection_a", poll_wait=0.01)
+    t_start = time.monotonic()
+    with RasterWorkerPool(2, budget=budget) as pool:
+        consume_then_fail(pool, stage_tasks(tmp_path, 50, "stage1"), fail_after=4)
+        assert held_leases(db_path) == 0
+        assert len(list(pool.run(stage_tasks(tmp_path, 5, "stage2")))) == 5
+    assert time.monotonic() - t_start < 10
+    assert held_leases(db_path) == 0
+
+
+def test_size_from_config():
+    config = {"execution": {"OPTIMUM_PARALLEL_PROCESS_COUNT": 4}}
+    assert RasterWorkerPool.from_config(config).processes == 4
+    config["execution"]["RASTER_POOL_MULTIPLIER"] = 1.5
+    assert RasterWorkerPool.from_config(config).processes == 6
@@ -0,0 +1,38 @@
+"""Output checks of completed steps on resume."""
+
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+import yaml
+
+from ripple1d_pipeline.process.ikwse_step import ikwse_outputs_exist
+
+DEFAULT_CONFIG = Path(__file__).parent.parent / "ripple1d_pipeline" / "default_config.yaml"
+
+
+@pytest.fixture
+def collection(tmp_path):
+    with open(DEFAULT_CONFIG) as f:
+        config = yaml.safe_load(f)
+    config["paths"] = {"TERRAIN_SOURCE_URL": ""}
+    return SimpleNamespace(
+        submodels_dir=str(tmp_path / "submodels"),
+        library_dir=str(tmp_path / "library"),
+        source_models_dir=str(tmp_path / "source_models"),
+        config=config,
+    )
+
+
+def test_ikwse_outputs(collection):
+    reach_dir = Path(collection.submodels_dir) / "101"
+    reach_dir.mkdir(parents=True)
+    assert not ikwse_outputs_exist(collection, 101)
+
+    (reach_dir / "101.p03.hdf").touch()
+    assert not ikwse_outputs_exist(collection, 101)
+
+    # Rating curve database written by ikwse_create_rating_curves_db
+    (reach_dir / "101.db").touch()
+    assert ikwse_outputs_exist(collection, 101)
+    assert not ikwse_outputs_exist(collection, 102)
@@ -0,0 +1,63 @@
+"""SharedBudget leases across holders of one budget database."""
+
+import pytest
+
+from ripple1d_pipeline.process.shared_budget import JOB_BUDGET, RASTER_BUDGET, SharedBudget
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "budget.sqlite")
+
+
+def test_capacity_shared_by_holders(db_path):
+    first = SharedBudget(db_path, JOB_BUDGET, 2, "collection_a")
+    second = SharedBudget(db_path, JOB_BUDGET, 2, "collection_b")
+
+    lease = first.try_acquire()
+    assert lease is not None
+    assert second.try_acquire() is not None
+    assert first.try_acquire() is None
+    assert second.try_acquire() is None
+
+    first.release(lease)
+    assert second.try_acquire() is not None
+
+
+def test_budgets_are_separate(db_path):
+    jobs = SharedBudget(db_path, JOB_BUDGET, 1, "collection_a")
+    rasters = SharedBudget(db_path, RASTER_BUDGET, 1, "collection_a")
+
+    assert jobs.try_acquire() is not None
+    assert rasters.try_acquire() is not None
+    assert jobs.try_acquire() is None
+
+
+def test_lease_released_on_exit(db_path):
+    budget = SharedBudget(db_path, JOB_BUDGET, 1, "collection_a", poll_wait=0.01)
+
+    with pytest.raises(RuntimeError), budget.lease():
+        assert budget.try_acquire() is None
+        raise RuntimeError("step failed")
+    assert budget.try_acquire() is not None
+
+
+def test_release_holder(db_path):
+    crashed = SharedBudget(db_path, JOB_BUDGET, 3, "collection_a")
+    other = SharedBudget(db_path, JOB_BUDGET, 3, "collection_b")
+    crashed.try_acquire()
+    crashed.try_acquire()
+    other.try_acquire()
+
+    assert SharedBudget.release_holder(db_path, "collection_a") == 2
+    assert other.try_acquire() is not None
+    assert other.try_acquire() is not None
+    assert other.try_acquire() is None
+
+
+def test_from_config():
+    config = {"execution": {"SHARED_BUDGET_DB": "", "BUDGETS": {JOB_BUDGET: 4}}, "database": {"DB_CONN_TIMEOUT": 5}}
+    assert SharedBudget.from_config(config, JOB_BUDGET, "collection_a") is None
+
+    config["execution"]["SHARED_BUDGET_DB"] = "budget.sqlite"
+    assert SharedBudget.from_config(config, RASTER_BUDGET, "collection_a") is None
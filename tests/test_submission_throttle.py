@@ -0,0 +1,73 @@
+"""AIMD rate of the submission throttle."""
+
+from types import SimpleNamespace
+
+import requests
+
+from ripple1d_pipeline.process.submission_throttle import SubmissionThrottle
+
+
+def make_throttle(**settings):
+    settings = {
+        "ENABLED": True,
+        "INITIAL_RATE": 4,
+        "MIN_RATE": 1,
+        "MAX_RATE": 5,
+        "ADDITIVE_INCREASE": 0.5,
+        "MULTIPLICATIVE_DECREASE": 0.5,
+        "LATENCY_TARGET_SECONDS": 2,
+        "DECREASE_COOLDOWN_SECONDS": 60,
+        **settings,
+    }
+    return SubmissionThrottle(settings)
+
+
+def test_additive_increase_up_to_max():
+    throttle = make_throttle()
+    throttle.accepted(0.1)
+    assert throttle.rate == 4.5
+    for _ in range(5):
+        throttle.accepted(0.1)
+    assert throttle.rate == 5
+
+
+def test_multiplicative_decrease_once_per_cooldown():
+    throttle = make_throttle()
+    throttle.backpressure("503 Service Unavailable")
+    assert throttle.rate == 2
+    # Responses to the same saturation arrive together, only the first one cuts the rate
+    throttle.backpressure("503 Service Unavailable")
+    assert throttle.rate == 2
+
+    throttle._decrease_time -= throttle.cooldown
+    throttle.backpressure("503 Service Unavailable")
+    assert throttle.rate == 1
+    throttle._decrease_time -= throttle.cooldown
+    throttle.backpressure("503 Service Unavailable")
+    assert throttle.rate == 1
+
+
+def test_slow_acceptance_is_backpressure():
+    throttle = make_throttle()
+    throttle.accepted(5.0)
+    assert throttle.rate == 2
+
+
+def test_is_backpressure():
+    throttle = make_throttle()
+    assert throttle.is_backpressure(SimpleNamespace(status_code=429))
+    assert throttle.is_backpressure(SimpleNamespace(status_code=503))
+    assert not throttle.is_backpressure(SimpleNamespace(status_code=400))
+    assert throttle.is_backpressure(None, requests.ConnectionError("connection refused"))
+    assert throttle.is_backpressure(None, requests.Timeout("read timed out"))
+    assert not throttle.is_backpressure(None, requests.TooManyRedirects("redirects"))
+
+
+def test_disabled_by_default():
+    throttle = SubmissionThrottle({})
+    assert not throttle.enabled
+    rate = throttle.rate
+    throttle.accepted(0.1)
+    throttle.backpressure("503 Service Unavailable")
+    assert throttle.rate == rate
+    assert not throttle.is_backpressure(SimpleNamespace(status_code=503))
@@ -0,0 +1,63 @@
+"""Timeouts learned from the job run time history."""
+
+import pytest
+
+from ripple1d_pipeline.process.timeout_policy import TimeoutPolicy
+
+STEP = "create_fim_lib"
+
+
+def make_policy(history_db, **settings):
+    settings = {"ADAPTIVE": True, "MIN_SAMPLES": 4, "QUANTILE": 1.0, "MARGIN": 2.0, "MIN_MINUTES": 0.1, **settings}
+    return TimeoutPolicy(settings, history_db, "0.10.0", "collection_a")
+
+
+@pytest.fixture
+def history_db(tmp_path):
+    history_db = str(tmp_path / "monitoring.sqlite")
+    # 10 minutes per 100 of ras length, median length 100
+    make_policy(history_db).record(STEP, [(100, 10.0), (200, 20.0), (50, 5.0), (100, 10.0)])
+    return history_db
+
+
+def test_scaled_by_ras_length(history_db):
+    policy = make_policy(history_db, MIN_STATIC_FRACTION=0)
+
+    assert policy.timeout_for(STEP, 100, 60) == 20.0
+    assert policy.timeout_for(STEP, 200, 60) == 40.0
+    # Jobs without ras length get the timeout of a median length reach
+    assert policy.timeout_for(STEP, None, 60) == 20.0
+
+
+def test_scale_clamped(history_db):
+    policy = make_policy(history_db, MIN_STATIC_FRACTION=0, MIN_SCALE=0.5, MAX_SCALE=5)
+
+    assert policy.timeout_for(STEP, 10, 60) == 10.0
+    assert policy.timeout_for(STEP, 10_000, 60) == 100.0
+
+
+def test_clamped_to_static_fraction_and_max(history_db):
+    assert make_policy(history_db).timeout_for(STEP, 100, 60) == 60.0
+
+    policy = make_policy(history_db, MIN_STATIC_FRACTION=0.5, MAX_MINUTES=50)
+    assert policy.timeout_for(STEP, 100, 60) == 30.0
+    assert policy.timeout_for(STEP, 200, 60) == 40.0
+    assert policy.timeout_for(STEP, 10_000, 60) == 50.0
+
+    # MAX_MINUTES below the static floor never cuts a timeout below the floor
+    policy = make_policy(history_db, MIN_STATIC_FRACTION=0.5, MAX_MINUTES=20)
+    assert policy.timeout_for(STEP, 10_000, 60) == 30.0
+
+
+def test_static_without_enough_history(history_db):
+    assert make_policy(history_db, MIN_SAMPLES=5).timeout_for(STEP, 100, 60) == 60
+    assert make_policy(history_db).timeout_for("run_iknown_wse", 100, 60) == 60
+    # Run times of another Ripple1d version are not learned from
+    other_version = TimeoutPolicy({"ADAPTIVE": True, "MIN_SAMPLES": 4}, history_db, "0.9.0", "collection_a")
+    assert other_version.timeout_for(STEP, 100, 60) == 60
+
+
+def test_static_when_not_adaptive(history_db):
+    policy = TimeoutPolicy({}, history_db, "0.10.0", "collection_a")
+    assert not policy.adaptive
+    assert policy.timeout_for(STEP, 100, 60) == 60
@@ -0,0 +1,82 @@
+"""WorkQueue claims, completion and reclaim of stale claims."""
+
+import sqlite3
+
+import pytest
+from work_queue import WorkQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return WorkQueue(str(tmp_path / "monitoring.sqlite"), timeout=5, stale_after_s=900, max_attempts=2)
+
+
+def expire_heartbeat(queue, collection):
+    """Age a claim past stale_after_s, as if its host stopped sending heartbeats."""
+    conn = sqlite3.connect(queue.db_path)
+    conn.execute(
+        "UPDATE work_queue SET heartbeat_time = '2000-01-01 00:00:00+00:00' WHERE collection_id = ?", (collection,)
+    )
+    conn.commit()
+    conn.close()
+
+
+def queue_row(queue, collection):
+    conn = sqlite3.connect(queue.db_path)
+    row = conn.execute(
+        "SELECT queue_status, claimed_by, attempts FROM work_queue WHERE collection_id = ?", (collection,)
+    ).fetchone()
+    conn.close()
+    return row
+
+
+def test_claims_in_queue_order(queue):
+    assert queue.enqueue(["c1", "c2"]) == 2
+    assert queue.enqueue(["c2", "c3"]) == 1
+
+    assert queue.claim("host_a") == "c1"
+    assert queue.claim("host_b") == "c2"
+    assert queue.claim("host_a") == "c3"
+    assert queue.claim("host_b") is None
+    assert queue_row(queue, "c2") == ("claimed", "host_b", 1)
+
+
+def test_complete(queue):
+    queue.enqueue(["c1"])
+    queue.claim("host_a")
+
+    queue.complete("c1", "host_a", "successful")
+    assert queue_row(queue, "c1")[0] == "successful"
+    assert queue.claim("host_b") is None
+
+
+def test_stale_claim_reclaimed(queue):
+    queue.enqueue(["c1"])
+    queue.claim("host_a")
+    assert queue.heartbeat("c1", "host_a")
+    expire_heartbeat(queue, "c1")
+
+    assert queue.claim("host_b") == "c1"
+    assert queue_row(queue, "c1") == ("claimed", "host_b", 2)
+    # The host that lost the claim can no longer renew it or record its outcome
+    assert not queue.heartbeat("c1", "host_a")
+    queue.complete("c1", "host_a", "failed")
+    assert queue_row(queue, "c1")[0] == "claimed"
+
+
+def test_stale_claim_failed_after_max_attempts(queue):
+    queue.enqueue(["c1"])
+    for host in ("host_a", "host_b"):
+        assert queue.claim(host) == "c1"
+        expire_heartbeat(queue, "c1")
+
+    assert queue.claim("host_c") is None
+    assert queue_row(queue, "c1") == ("failed", None, 2)
+
+
+def test_fresh_claim_not_reclaimed(queue):
+    queue.enqueue(["c1"])
+    queue.claim("host_a")
+
+    assert queue.claim("host_b") is None
+    assert queue_row(queue, "c1") == ("claimed", "host_a", 1)